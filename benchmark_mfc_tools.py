@@ -0,0 +1,271 @@
+import argparse, csv, json, os, random, shutil, sys, time, tracemalloc
+import peak_memory as PM
+import praatmfc as MFC
+import wavfiles as WAV
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Time the MFC and merge tools on synthetic corpora of different sizes, and compare the times and memory use with stored baselines')
+parser.add_argument('--scales', default='1000,10000,100000,1000000', help='comma-separated numbers of stimuli')
+parser.add_argument('--tools', default='all', help='comma-separated tools to run (default: all of them, see TOOLS)')
+parser.add_argument('--workdir', default='benchmark_fixtures', help='where to make (and keep) the synthetic corpora')
+parser.add_argument('--baselines', default='benchmark_baselines.json', help='the baseline file to compare with')
+parser.add_argument('--save_baselines', default='False', help='whether to save this run as the new baselines')
+parser.add_argument('--tolerance', default=0.25, help='how much slower or bigger than the baseline counts as a regression (0.25 = 25%%)')
+parser.add_argument('--seed', default=1, help='the random seed for the synthetic corpora')
+args = parser.parse_args()
+
+#EXAMPLE
+# python benchmark_mfc_tools.py --scales 1000,10000 --save_baselines True   (on the lab machine, before a change)
+# python benchmark_mfc_tools.py --scales 1000,10000                         (after the change: regressions are listed at the end)
+
+scripts_directory = os.path.dirname(os.path.abspath(__file__))
+scales = [int(s) for s in args.scales.split(',')]
+tolerance = float(args.tolerance)
+seed = int(args.seed)
+
+RATERS = ['Jeff', 'Griffin', 'Quynh']
+RESPONSES = ['A', 'B', 'NA']
+WORDS = ['SOUTH', 'MOUTH', 'HOUSE', 'ABOUT', 'OUT', 'DOWN', 'TOWN', 'AROUND', 'NOW', 'HOW', 'COW', 'LOUD', 'CLOUD', 'PROUD', 'FOUND', 'SOUND']
+TIMESTAMP = '2024Jun12_10h30m33'
+
+# TOOLS: name, script, arguments ({mfc}, {responses} etc. are fixture paths)
+TOOLS = [
+	('splitMFC_max', 'splitMFC.py', ['--mfc', '{mfc}', '--max', '{max}']),
+	('splitMFC_word', 'splitMFC.py', ['--mfc', '{mfc}', '--word', 'True']),
+	('group_mfc_clips', 'group_mfc_clips.py', ['--input', '{mfc}']),
+	('subset_mfc_by_responses', 'subset_mfc_by_responses.py', ['--mfc', '{mfc}', '--csv', '{responses_Jeff}', '--response', 'NA', '--output', '{out}.praat']),
+	('subset_mfc_by_responses_batch', 'subset_mfc_by_responses.py', ['--batch', 'True', '--mfc', '{mfc}', '--csv', '{responses}', '--raters', ','.join(RATERS), '--output', '{out}_{{rater}}_{{response}}.praat']),
+	('mfc_pipeline', 'mfc_pipeline.py', ['--mfc', '{mfc}', '--stages', 'filter,group,shuffle,split', '--csv', '{responses}', '--response', 'NA', '--seed', '1', '--max', '{max}', '--output', '{out}.praat']),
+	('make_editor_mfc', 'make_editor_mfc.py', ['--timestamp', TIMESTAMP, '--max', '{max}', '--gap', '0.01']),
+	('combine_utf8', 'combine_one_script_outs.py', ['--inputs', '{out1}', '{out2}', '--out', '{out}.csv']),
+	('combine_utf16', 'combine_one_script_outs.py', ['--inputs', '{out1}', '{out2_utf16}', '--out', '{out}.csv']),
+]
+
+if args.tools == 'all':
+	tools = TOOLS
+else:
+	tools = [t for t in TOOLS if t[0] in args.tools.split(',')]
+
+# SYNTHETIC CORPORA
+
+MFC_TOP = ['"ooTextFile"\n', '"ExperimentMFC 5"\n', 'stimuliAreSounds? <yes>\n', 'stimulusFileNameHead = "clips_'+TIMESTAMP+'/"\n', 'stimulusFileNameTail = ".wav"\n',
+	'stimulusCarrierBefore = ""\n', 'stimulusCarrierAfter = ""\n', 'stimulusInitialSilenceDuration = 0.25 seconds\n', 'stimulusMedialSilenceDuration = 0\n']
+MFC_BOTTOM = ['numberOfReplicationsPerStimulus = 1\n', 'breakAfterEvery = 0\n', 'randomize = <PermuteBalancedNoDoublets>\n\n',
+	'startText = "Please code the following sound clips"\n\n', 'runText = "Which category?"\n\n', 'pauseText = "Please take a break. Click to proceed."\n\n',
+	'endText = "Done.  You can close this window now and go click to save the results."\n\n', 'maximumNumberOfReplays = 1000\n\n',
+	'replayButton = 0.1 0.9 0.27 0.42 "Replay" ""\n', 'okButton     = 0.00 0.00 0.00 0.00 "" ""\n', 'oopsButton   = 0.1 0.9 0.11 0.26 "Go back" ""\n',
+	'responsesAreSounds? <no> "" "" "" "" 0 0\n', 'numberOfDifferentResponses = 3\n',
+	'    0.1 0.495 0.60 0.85 "A" 40 "" "A"\n', '    0.505 0.9 0.60 0.85 "B" 40 "" "B"\n',
+	'    0.1 0.9 0.44 0.59 "N/A (wrong sound or other problem)" 40 "" "NA"\n', 'numberOfGoodnessCategories = 0\n']
+
+BASE_HEADER = ['speaker', 'textgrid', 'sound', 'phonetier', 'word_id', 'token_id', 'leftword', 'word', 'rightword', 'phone', 'phonestart', 'phoneend', 'left2', 'left1', 'left', 'right', 'right1', 'right2', 'speech_overlap']
+FORMANT_HEADER = ['total_formants', 'F1_25', 'F2_25', 'F3_25', 'F1_50', 'F2_50', 'F3_50', 'F1_75', 'F2_75', 'F3_75', 'clip_start', 'clip_end', 'stimulus']
+
+def synthetic_tokens(n, rng):
+	# n tokens spread over recordings of about 500 tokens, like a one_script run with clips
+	t = 0.0
+	for i in range(n):
+		recording = i // 500
+		if i % 500 == 0:
+			t = rng.uniform(0, 5)
+		t += rng.uniform(0.5, 4)
+		word = rng.choice(WORDS)
+		yield ('s%02d' % (recording % 40), 's%02d_rec%04d' % (recording % 40, recording), round(t, 3), word)
+
+def clip_name(sound, clip_start, word):
+	timestring = ('%.15g' % clip_start).replace('.', '_')
+	if clip_start == round(clip_start):
+		timestring = timestring+'_0'
+	return sound+'_'+timestring+'_'+word
+
+def make_fixtures(n, directory):
+
+	done_path = os.path.join(directory, 'fixtures_done.txt')
+	clip_directory = os.path.join(directory, 'clips_'+TIMESTAMP)
+	if os.path.exists(done_path) and os.path.isdir(clip_directory):
+		return
+	os.makedirs(directory, exist_ok=True)
+	rng = random.Random(seed * 1000003 + n)
+	tokens = list(synthetic_tokens(n, rng))
+
+	rows = [(clip_name(sound, clip_start, word), word) for speaker, sound, clip_start, word in tokens]
+	MFC.writestimuli(os.path.join(directory, 'one_script_out_'+TIMESTAMP+'_MFC.praat'), MFC_TOP, MFC_BOTTOM, len(rows), rows)
+
+	# a 20 ms clip for every stimulus (for make_editor_mfc.py). they are all
+	# the same, so they are hard links to one file where the file system allows it
+	os.makedirs(clip_directory, exist_ok=True)
+	clip_path = os.path.join(directory, 'clip.wav')
+	noise = b''.join([rng.randrange(-3000, 3000).to_bytes(2, 'little', signed=True) for i in range(320)])
+	WAV.write_parts(clip_path, WAV.pcm16_fmt_chunk(1, 16000), [noise])
+	for name, word in rows:
+		path = os.path.join(clip_directory, name+'.wav')
+		if os.path.exists(path):
+			continue
+		try:
+			os.link(clip_path, path)
+		except OSError:
+			shutil.copyfile(clip_path, path)
+
+	for rater in RATERS:
+		with open(os.path.join(directory, 'responses_'+rater+'.csv'), 'w') as f:
+			f.write('subject,stimulus,response,reactionTime\n')
+			for name, word in rows:
+				f.write(rater+','+name+','+rng.choice(RESPONSES)+','+str(round(rng.uniform(0.4, 3), 3))+'\n')
+
+	# two one_script outputs that share 10% of their tokens, the second also as utf-16
+	half = n // 2
+	overlap = n // 10
+	for filename, part in [('out1.csv', tokens[:half+overlap]), ('out2.csv', tokens[half:])]:
+		with open(os.path.join(directory, filename), 'w', newline='') as f:
+			writer = csv.writer(f, lineterminator='\n')
+			writer.writerow(BASE_HEADER+FORMANT_HEADER)
+			for speaker, sound, clip_start, word in part:
+				phone_start = round(clip_start + 0.15, 3)
+				formants = [str(round(rng.gauss(m, m/10), 1)) for m in [700, 1400, 2500]*3]
+				writer.writerow([speaker, sound, sound, '2', sound+'_2_'+word+'_'+'%.3f' % (clip_start+0.1), sound+'_2_'+word+'_AW1_'+'%.3f' % phone_start,
+					'THE', word, 'AND', 'AW1', '%.3f' % phone_start, '%.3f' % (phone_start+0.12), 'S', '"#"', 'S', 'TH', '"#"', 'DH', '', '5'] + formants + ['%.15g' % clip_start, '%.15g' % (clip_start+0.5), clip_name(sound, clip_start, word)])
+	with open(os.path.join(directory, 'out2.csv'), encoding='utf-8') as f, open(os.path.join(directory, 'out2_utf16.csv'), 'w', encoding='utf-16') as out:
+		for line in f:
+			out.write(line)
+
+	with open(done_path, 'w') as f:
+		f.write(str(n)+'\n')
+
+# MEASUREMENTS
+
+def run_tool(name, script, tool_args, directory):
+	# wall time and peak memory (MB) of the tool as a separate process, and whether it worked
+	output_path = os.path.join(directory, 'tool_output_'+name+'.txt')
+	with open(output_path, 'w') as output:
+		seconds, peak, returncode = PM.run([sys.executable, os.path.join(scripts_directory, script)] + tool_args, directory, output)
+	if returncode != 0:
+		print('FAILED:', script, ' '.join(tool_args), '(see', output_path+')')
+	return (seconds, peak, returncode == 0)
+
+def measure(function):
+	tracemalloc.start()
+	start = time.time()
+	result = function()
+	seconds = time.time() - start
+	peak = tracemalloc.get_traced_memory()[1] / (1024*1024)
+	tracemalloc.stop()
+	return (result, seconds, peak)
+
+def measure_stages(directory):
+	# the praatmfc stages one at a time, in this process
+	mfc_path = os.path.join(directory, 'one_script_out_'+TIMESTAMP+'_MFC.praat')
+	results = []
+	script, seconds, peak = measure(lambda: MFC.MFCScript(mfc_path))
+	results.append(('stage_read', seconds, peak))
+	selected, seconds, peak = measure(lambda: script.mark([stimulus for subject, stimulus, response, rt in MFC.read_responses(os.path.join(directory, 'responses_Jeff.csv')) if response == 'NA']))
+	results.append(('stage_read_responses', seconds, peak))
+	rows, seconds, peak = measure(lambda: list(MFC.select_rows(script.rows(), script, selected)))
+	results.append(('stage_select', seconds, peak))
+	rows, seconds, peak = measure(lambda: list(MFC.group_rows(script.rows())))
+	results.append(('stage_group', seconds, peak))
+	rows, seconds, peak = measure(lambda: MFC.shuffle_rows(script.rows(), 1))
+	results.append(('stage_shuffle', seconds, peak))
+	sets, seconds, peak = measure(lambda: MFC.split_rows(rows, by_word=True))
+	results.append(('stage_split_word', seconds, peak))
+	sets, seconds, peak = measure(lambda: MFC.split_rows(rows, 1000))
+	results.append(('stage_split_max', seconds, peak))
+	with open(os.devnull, 'w') as devnull:
+		stdout = sys.stdout
+		sys.stdout = devnull
+		result, seconds, peak = measure(lambda: script.write(os.path.join(directory, 'stage_write.praat')))
+		sys.stdout = stdout
+	results.append(('stage_write', seconds, peak))
+	return results
+
+def fixture_paths(directory):
+	return {'mfc': 'one_script_out_'+TIMESTAMP+'_MFC.praat', 'responses': 'responses_*.csv', 'responses_Jeff': 'responses_Jeff.csv',
+		'out1': 'out1.csv', 'out2': 'out2.csv', 'out2_utf16': 'out2_utf16.csv', 'out': 'bench_out', 'max': '1000'}
+
+def clean_outputs(directory):
+	# keep only the fixtures (and what each tool printed, for when it failed),
+	# so that every tool sees the same directory
+	fixtures = set(fixture_paths(directory).values()) | set(['responses_'+r+'.csv' for r in RATERS]) | set(['fixtures_done.txt', 'clip.wav', 'clips_'+TIMESTAMP])
+	for filename in os.listdir(directory):
+		if not filename in fixtures and not filename.startswith('tool_output_'):
+			os.remove(os.path.join(directory, filename))
+
+# RUN THE BENCHMARKS
+
+print('\n########################################')
+print('Benchmarking', len(tools), 'tools and the praatmfc stages at', ', '.join([str(s) for s in scales]), 'stimuli')
+print('########################################')
+
+results = []
+failures = []
+for n in scales:
+	directory = os.path.join(args.workdir, str(n))
+	start = time.time()
+	make_fixtures(n, directory)
+	clean_outputs(directory)
+	print('\n'+str(n), 'stimuli (fixtures in', directory+', made in', round(time.time()-start, 1), 'seconds)')
+
+	paths = fixture_paths(directory)
+	for name, script, tool_args in tools:
+		seconds, peak, succeeded = run_tool(name, script, [a.format(**paths) for a in tool_args], directory)
+		clean_outputs(directory)
+		if not succeeded:
+			# a failed run isn't a timing
+			failures.append(name+'@'+str(n))
+			continue
+		results.append({'name': name, 'stimuli': n, 'seconds': round(seconds, 3), 'peak_mb': round(peak, 1)})
+		print('  %-32s %9.3f s %9.1f MB' % (name, seconds, peak))
+
+	for name, seconds, peak in measure_stages(directory):
+		clean_outputs(directory)
+		results.append({'name': name, 'stimuli': n, 'seconds': round(seconds, 3), 'peak_mb': round(peak, 1)})
+		print('  %-32s %9.3f s %9.1f MB' % (name, seconds, peak))
+
+# COMPARE WITH (OR SAVE) THE BASELINES
+
+results_filename = 'benchmark_results_'+time.strftime('%Y%b%d_%Hh%Mm%S')+'.csv'
+with open(results_filename, 'w', newline='') as f:
+	writer = csv.DictWriter(f, ['name', 'stimuli', 'seconds', 'peak_mb'], lineterminator='\n')
+	writer.writeheader()
+	writer.writerows(results)
+
+baselines = {}
+if os.path.exists(args.baselines):
+	with open(args.baselines) as f:
+		baselines = json.load(f)
+
+regressions = []
+for result in results:
+	key = result['name']+'@'+str(result['stimuli'])
+	if not key in baselines:
+		continue
+	baseline = baselines[key]
+	# very short times are mostly noise, so a regression also has to be 0.1 seconds or more
+	if result['seconds'] > baseline['seconds']*(1+tolerance) and result['seconds'] - baseline['seconds'] >= 0.1:
+		regressions.append((key, 'seconds', baseline['seconds'], result['seconds']))
+	if result['peak_mb'] > baseline['peak_mb']*(1+tolerance) and result['peak_mb'] - baseline['peak_mb'] >= 1:
+		regressions.append((key, 'peak_mb', baseline['peak_mb'], result['peak_mb']))
+
+if args.save_baselines == 'True':
+	for result in results:
+		baselines[result['name']+'@'+str(result['stimuli'])] = {'seconds': result['seconds'], 'peak_mb': result['peak_mb'], 'python': sys.version.split()[0], 'saved': time.strftime('%Y-%m-%d')}
+	with open(args.baselines, 'w') as f:
+		json.dump(baselines, f, indent=1, sort_keys=True)
+
+print('\n########################################')
+print('wrote', results_filename)
+if args.save_baselines == 'True':
+	print('saved', len(results), 'baselines to', args.baselines)
+elif baselines == {}:
+	print('no baselines in', args.baselines, '(make them with --save_baselines True)')
+elif regressions == []:
+	print('no regressions compared with', args.baselines)
+else:
+	print(len(regressions), 'REGRESSIONS compared with', args.baselines+':')
+	for key, measurement, before, after in regressions:
+		print('  '+key, measurement, before, '->', after)
+if failures != []:
+	print(len(failures), 'tools FAILED (and were left out):', ', '.join(failures))
+print('########################################\n')
+
+if failures != [] or (regressions != [] and args.save_baselines != 'True'):
+	sys.exit(1)
@@ -1,85 +1,130 @@
+import argparse, csv
 
-import argparse, os
-
-parser = argparse.ArgumentParser(description='combine two one_script output files into one file')
+parser = argparse.ArgumentParser(description='combine one_script output files into one file')
 parser.add_argument('--in1', default='[none listed]', help='the first file')
 parser.add_argument('--in2', default='[none listed]', help='the second file')
+parser.add_argument('--inputs', nargs='+', default=[], help='any number of files to combine, in order (instead of --in1 and --in2)')
+parser.add_argument('--keep', default='last', help='which copy of a duplicated token to keep: last (default) or first')
 parser.add_argument('--out', default='[none listed]', help='what you want to call the output file')
 args = parser.parse_args()
 
-print ('\n########################################')
-print ('Preparing to combine:', args.in1, 'and', args.in2, 'to make', args.out, '...')
-	
-output1 = []
-output2 = []
-tokens2 = []
+#EXAMPLE
+# python combine_one_script_outs.py --inputs one_script_out_2024Jun1*.csv --keep last --out one_script_out_combined.csv
+
+if args.inputs == []:
+	input_files = [args.in1, args.in2]
+else:
+	input_files = args.inputs
+
+if not args.keep in ['first', 'last']:
+	parser.error('--keep should be first or last')
+
+def detect_encoding(filepath):
+	# one_script output is utf-8, but files that have been through Praat's
+	# table tools or a spreadsheet are sometimes utf-16
+	with open(filepath, 'rb') as f:
+		start = f.read(1024)
+	if start.startswith(b'\xef\xbb\xbf'):
+		return 'utf-8-sig'
+	if start.startswith(b'\xff\xfe') or start.startswith(b'\xfe\xff'):
+		return 'utf-16'
+	if b'\x00' in start:
+		if start[0:1] == b'\x00':
+			return 'utf-16-be'
+		return 'utf-16-le'
+	return 'utf-8'
+
+def read_rows(filepath, encoding):
+	# yields the header and then every row, with blank and incomplete rows as None
+	with open(filepath, newline='', encoding=encoding) as f:
+		reader = csv.reader(f)
+		header = next(reader)
+		yield header
+		for row in reader:
+			if len(row) < len(header):
+				yield None
+			else:
+				yield row
 
+print ('\n########################################')
+print ('Preparing to combine:', ', '.join(input_files), 'to make', args.out, '...')
+
+header = None
+token_id_position = None
+skipped_files = []
+encodings = [detect_encoding(filepath) for filepath in input_files]
+
+# FIRST PASS (ONLY NEEDED IF THE LAST COPY WINS): FIND WHERE THE LAST COPY OF
+# EACH TOKEN IS (WHICH FILE, AND WHICH ROW OF IT)
+last_copy = {}
+if args.keep == 'last':
+	for n, filepath in enumerate(input_files):
+		rows = read_rows(filepath, encodings[n])
+		file_header = next(rows)
+		if header == None:
+			header = file_header
+			token_id_position = header.index('token_id')
+		elif file_header != header:
+			continue
+		for i, row in enumerate(rows):
+			if row != None:
+				last_copy[row[token_id_position]] = (n, i)
+
+# SECOND PASS: STREAM THE ROWS TO THE OUTPUT FILE
+written = set()
+lines_read = []
 blank_incomplete = 0
 duplicate = 0
-
-with open(args.in2) as f:
-	lines2 = f.readlines()
-
-if '\x00' in lines2[0]:
-	args.in2_utf8 = args.in2[:-4]+'_utf-8.csv'
-	print ('in2 is utf-16... making a utf-8 copy:', args.in2_utf8)
-	os.system('iconv -f UTF-16 -t UTF-8 '+args.in2+' > '+args.in2_utf8)
-
-	with open(args.in2_utf8) as f:
-		lines2 = f.readlines()
-
-
-header = lines2.pop(0)
-header_list = header.split(',')
-token_id_position = header_list.index('token_id')
-
-for line in lines2:
-	split_line = line.split(',')
-	if len(split_line) < len(header_list):
-		if line.strip() == '':
-			print ('...skipping a blank line in the second file')
-			blank_incomplete += 1
-		else:
-			print ('...skipping an incomplete line in the second file:', line.strip())
-			blank_incomplete += 1
-	else:
-		token_id = split_line[token_id_position]
-		tokens2.append(token_id)
-		output2.append(line)
-		
-with open(args.in1) as f:
-	lines1 = f.readlines()
-
-if '\x00' in lines1[0]:
-	args.in1_utf8 = args.in1[:-4]+'_utf-8.csv'
-	print ('in1 is utf-16... making a utf-8 copy:', args.in1_utf8)
-	os.system('iconv -f UTF-16 -t UTF-8 '+args.in1+' > '+args.in1_utf8)
-
-	with open(args.in1_utf8) as f:
-		lines2 = f.readlines()
-
-
-for line in lines1:
-	split_line = line.split(',')
-	if len(split_line) > token_id_position:
-		token_id = split_line[token_id_position]
-		if token_id in tokens2:
-			print ('...skipping token', token_id, 'in the first file because it is in the second file')
-			duplicate += 1
-		elif len(split_line) < len(header_list):
-			print ('...skipping an incomplete line in the first file:', line.strip())
-			blank_incomplete += 1
-		else:
-			output1.append(line)
-
-with open(args.out, 'w') as f:
-	for line in output1+output2:
-		f.write(line)
-
-print ('read', args.in1, ':', len(lines1), 'lines (excluding header)')
-print ('read', args.in2, ':', len(lines2)-1, 'lines (excluding header)')
+lines_written = 0
+
+with open(args.out, 'w', newline='') as out:
+	writer = csv.writer(out, lineterminator='\n')
+	for n, filepath in enumerate(input_files):
+		if encodings[n].startswith('utf-16'):
+			print ('...reading', filepath, 'as', encodings[n])
+		rows = read_rows(filepath, encodings[n])
+		file_header = next(rows)
+		if header == None:
+			header = file_header
+			token_id_position = header.index('token_id')
+		elif file_header != header:
+			print ('...skipping', filepath, 'because its columns are different from', input_files[0])
+			skipped_files.append(filepath)
+			lines_read.append(0)
+			continue
+		if n == 0:
+			writer.writerow(header)
+
+		file_lines = 0
+		for i, row in enumerate(rows):
+			file_lines += 1
+			if row == None:
+				print ('...skipping a blank or incomplete line in', filepath)
+				blank_incomplete += 1
+				continue
+			token_id = row[token_id_position]
+			if args.keep == 'last' and last_copy[token_id] != (n, i):
+				if last_copy[token_id][0] == n:
+					print ('...skipping token', token_id, 'in', filepath, 'because it is repeated later in the file')
+				else:
+					print ('...skipping token', token_id, 'in', filepath, 'because it is in a later file')
+				duplicate += 1
+			elif args.keep == 'first' and token_id in written:
+				print ('...skipping token', token_id, 'in', filepath, 'because it is in an earlier file')
+				duplicate += 1
+			elif token_id in written:
+				print ('...skipping a repeated token', token_id, 'in', filepath)
+				duplicate += 1
+			else:
+				writer.writerow(row)
+				written.add(token_id)
+				lines_written += 1
+		lines_read.append(file_lines)
+
+for filepath, file_lines in zip(input_files, lines_read):
+	print ('read', filepath, ':', file_lines, 'lines (excluding header)')
 print ('skipped', duplicate, 'lines and', blank_incomplete, 'blank or incomplete lines')
-print ('wrote', args.out, ':', len(output1)+len(output2)-1, 'lines (excluding header)')
+if skipped_files != []:
+	print ('skipped', len(skipped_files), 'files with different columns')
+print ('wrote', args.out, ':', lines_written, 'lines (excluding header)')
 print ('########################################\n')
-
-
@@ -0,0 +1,19 @@
+import argparse, glob, os
+import prototypes as P
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Compile prototypes csv files into binary bundles that load without parsing (they are also compiled automatically the first time they are used)')
+parser.add_argument('--prototypes', default='*_prototypes.csv', help='the prototypes csv file(s) to compile')
+parser.add_argument('--force', default='False', help='whether to recompile bundles that are already up to date')
+args = parser.parse_args()
+
+#EXAMPLE
+# python compile_prototypes.py --prototypes ral_prototypes.csv
+
+for prototypes_path in sorted(glob.glob(args.prototypes)):
+	if args.force == 'True':
+		path = P.compile_bundle(prototypes_path)
+	else:
+		path = P.load(prototypes_path).path
+	prototypes = P.read_bundle(path)
+	print('compiled', prototypes_path, 'to', path, '('+str(len(prototypes)), 'phones,', len(prototypes.params), 'parameters,', os.path.getsize(path), 'bytes)')
@@ -0,0 +1,339 @@
+import math
+import numpy as np
+
+# formant contours as a matrix: Y[token, point] are the measurements of one
+# formant at the measurement points (F1_20, F1_25, ... in one_script output),
+# and x[point] is the normalized time of each point (-0.5 to 0.5), as in the
+# normtime column that findFunctions (formant_functions.r) uses.
+#
+# fit_formant() gives the same values as findFunctionsForOneToken for every
+# token at once: tokens with the same defined points share one x, so the DCT
+# and polynomial fits for all of them are one matrix product, and the
+# logistic fits (optim's BFGS in R) run side by side for a chunk of tokens.
+
+FUNCTION_COLUMNS = ['constant', 'linear', 'quadratic', 'cubic', 'constant_raw', 'linear_raw', 'quadratic_raw', 'cubic_raw',
+	'inflection_time', 'extreme1_time', 'extreme2_time', 'extreme1_freq', 'extreme2_freq',
+	'baseline', 'peak', 'crossover', 'slope', 'delta', 'DCT0', 'DCT1', 'DCT2', 'DCT3',
+	'logistic_energy', 'logistic_R.squared', 'poly_R.squared0', 'poly_R.squared1', 'poly_R.squared2', 'poly_R.squared',
+	'DCT_R.squared0', 'DCT_R.squared1', 'DCT_R.squared2', 'DCT_R.squared3', 'DCT_R.squared4', 'DCT_R.squared5',
+	'C1_slope', 'C2_slope', 'DCT1tran_R.squared', 'DCT3tran_R.squared', '20', '70', '80', 'DCT20', 'DCT70', 'DCT80']
+LOGISTIC_COLUMNS = ['baseline', 'peak', 'crossover', 'slope']
+
+# findFunctionsForOneToken needs more than 5 defined measurements
+MIN_POINTS = 6
+
+def normtime(percents):
+	return np.asarray(percents, dtype=float) / 100 - 0.5
+
+def bark(f):
+	return (26.81/(1+1960/f))-0.53
+
+def interpolate_missing(Y):
+	# fills undefined measurements between two defined ones by linear
+	# interpolation along the contour (undefined ones at the ends stay undefined)
+	Y = np.array(Y, dtype=float)
+	missing = np.isnan(Y)
+	for t in np.nonzero(missing.any(axis=1) & ~missing.all(axis=1))[0]:
+		defined = np.nonzero(~missing[t])[0]
+		inside = np.arange(defined[0], defined[-1]+1)
+		Y[t, inside] = np.interp(inside, defined, Y[t, defined])
+	return Y
+
+def dct(Y):
+	# the unnormalized DCT-II of each row (dct() in the dtt package)
+	n = Y.shape[1]
+	k = np.arange(n)
+	return Y @ np.cos(np.pi/n * np.outer(k + 0.5, k))
+
+def inverse_dct(coefs, n, degree):
+	# invertDCT: the contour from the first degree+1 coefficients of each row
+	k = np.arange(n)
+	basis = np.cos(np.pi/n * np.outer(np.arange(1, degree+1), k + 0.5))
+	return (0.5 * coefs[:, :1] + coefs[:, 1:degree+1] @ basis) * (2/n)
+
+def r_squared(Y, predicted):
+	# getRsquared, which weights the points 1, 2, ..., n
+	w = np.arange(1, Y.shape[1]+1)
+	ss_tot = ((Y - Y.mean(axis=1, keepdims=True))**2 * w).sum(axis=1)
+	ss_res = ((Y - predicted)**2 * w).sum(axis=1)
+	with np.errstate(invalid='ignore', divide='ignore'):
+		return 1 - ss_res/ss_tot
+
+def interpolation_matrix(x, points, clamp):
+	# M such that Y @ M is approxfun(x, y) at the points for every row, with
+	# rule=2 if clamp (the end values outside x) or rule=1 (nan outside x)
+	M = np.zeros((len(x), len(points)))
+	for p, point in enumerate(points):
+		if point <= x[0] or point >= x[-1]:
+			if clamp or point == x[0] or point == x[-1]:
+				M[0 if point <= x[0] else -1, p] = 1
+			else:
+				M[:, p] = np.nan
+			continue
+		i = np.searchsorted(x, point, side='right') - 1
+		w = (point - x[i]) / (x[i+1] - x[i])
+		M[i, p] = 1 - w
+		M[i+1, p] = w
+	return M
+
+def orthogonal_polynomials(x, degree=3):
+	# the columns of poly(x, degree): orthonormal, orthogonal to the constant,
+	# each with a positive leading coefficient
+	V = np.vander(x - x.mean(), degree+1, increasing=True)
+	Q, R = np.linalg.qr(V)
+	Q = Q * np.sign(np.diag(R))
+	return Q[:, 1:]
+
+def fit_linear(x, Y):
+
+	# the polynomial and DCT parts of findFunctionsForOneToken for rows of Y
+	# that all have their measurements at the times in x
+	n = len(x)
+	fit = {}
+	Q = orthogonal_polynomials(x)
+	orth = np.column_stack([Y.mean(axis=1), Y @ Q])
+	V = np.vander(x, 4, increasing=True)
+	raw = Y @ np.linalg.pinv(V).T
+	for c, name in enumerate(['constant', 'linear', 'quadratic', 'cubic']):
+		fit[name] = orth[:, c]
+		fit[name+'_raw'] = raw[:, c]
+
+	# extrema and inflection point from the derivatives of the raw polynomial
+	# (polyroot, keeping the real part of complex roots)
+	a0, a1, a2 = raw[:, 1], 2*raw[:, 2], 3*raw[:, 3]
+	with np.errstate(invalid='ignore', divide='ignore'):
+		root = np.sqrt((a1*a1 - 4*a2*a0).astype(complex))
+		extrema = np.sort(np.real(np.column_stack([(-a1 - root)/(2*a2), (-a1 + root)/(2*a2)])), axis=1)
+		fit['inflection_time'] = -2*raw[:, 2] / (6*raw[:, 3])
+	extrema = np.minimum(x.max(), np.maximum(x.min(), extrema))
+	fit['extreme1_time'] = extrema[:, 0]
+	fit['extreme2_time'] = extrema[:, 1]
+	for e in [0, 1]:
+		fit['extreme'+str(e+1)+'_freq'] = (raw * extrema[:, e:e+1]**np.arange(4)).sum(axis=1)
+
+	predicted = np.repeat(orth[:, :1], n, axis=1)
+	for d in range(4):
+		if d > 0:
+			predicted = predicted + np.outer(orth[:, d], Q[:, d-1])
+		fit['poly_R.squared'+(str(d) if d < 3 else '')] = r_squared(Y, predicted)
+
+	coefs = dct(Y)
+	for d in range(4):
+		fit['DCT'+str(d)] = coefs[:, d]
+	for d in range(6):
+		fit['DCT_R.squared'+str(d)] = r_squared(Y, inverse_dct(coefs, n, d))
+
+	fit['C1_slope'] = np.zeros(len(Y))
+	fit['C2_slope'] = np.zeros(len(Y))
+	# the transition fits are switched off in findFunctionsForOneToken, which
+	# leaves them as the identity function
+	fit['DCT1tran_R.squared'] = r_squared(Y, np.repeat(x[None, :], len(Y), axis=0))
+	fit['DCT3tran_R.squared'] = fit['DCT1tran_R.squared']
+
+	points = [-0.3, 0.2, 0.3]
+	at_points = Y @ interpolation_matrix(x, points, clamp=False)
+	dct_at_points = inverse_dct(coefs, n, 3) @ interpolation_matrix(x, points, clamp=True)
+	for p, name in enumerate(['20', '70', '80']):
+		fit[name] = at_points[:, p]
+		fit['DCT'+name] = dct_at_points[:, p]
+	return fit
+
+# LOGISTIC FITS
+
+def logistic(P, x):
+	# logistic() for each row of parameters (baseline, peak, crossover, slope)
+	baseline, peak, crossover, slope = [P[:, i:i+1] for i in range(4)]
+	with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+		values = (peak-baseline) / (1 + np.exp(4 * slope / (peak-baseline) * (crossover-x))) + baseline
+	values = np.where(slope == 0, baseline, values)
+	bad = np.isnan(values)
+	if bad.any():
+		with np.errstate(invalid='ignore', divide='ignore'):
+			means = np.where(bad, 0, values).sum(axis=1, keepdims=True) / (~bad).sum(axis=1, keepdims=True)
+		values = np.where(bad, means, values)
+	return values
+
+def penalized_sum_of_squares(P, x, Y, data_range):
+	# sum.of.squares.with.parameter.penalty (with data_range = range(cbind(x, y)))
+	difference = Y - logistic(P, x)
+	sos = (difference * difference).sum(axis=1)
+	middle = data_range.mean(axis=1)
+	width = data_range[:, 1] - data_range[:, 0]
+	sos = sos * (1+4*P[:, 2]**2)
+	sos = sos * (1+4*(P[:, 3]/10000)**2)
+	sos = sos * (1+4*(np.abs(P[:, 0]-middle)/width)**2)
+	sos = sos * (1+4*(np.abs(P[:, 1]-middle)/width)**2)
+	return sos
+
+def logistic_start(x, Y):
+	# the starting values in fitLogistic
+	crossover = np.full(len(Y), (x.min() + x.max()) / 2)
+	with np.errstate(invalid='ignore'):
+		baseline = Y[:, x < crossover[0]].mean(axis=1)
+		peak = Y[:, x > crossover[0]].mean(axis=1)
+	slope = (peak-baseline) / (x.max() - x.min())
+	return np.column_stack([baseline, peak, crossover, slope])
+
+def vmmin(fn, b, maxit=100, reltol=1.490116119384765625e-8, abstol=-math.inf, ndeps=1e-3):
+
+	# optim(method='BFGS') without a gradient function: R's vmmin with central
+	# differences, run for each row of b side by side. fn(B, rows) gives the
+	# objective for the parameters B of the given rows. returns the
+	# parameters, the objective values and a mask of the rows where R's optim
+	# would have stopped with an error (a value or a difference that isn't finite)
+	stepredn, acctol, reltest = 0.2, 0.0001, 10.0
+	T, n = b.shape
+	b = b.copy()
+	all_rows = np.arange(T)
+
+	def gradient(rows):
+		g = np.zeros((len(rows), n))
+		for i in range(n):
+			up = b[rows].copy()
+			up[:, i] += ndeps
+			down = b[rows].copy()
+			down[:, i] -= ndeps
+			g[:, i] = (fn(up, rows) - fn(down, rows)) / (2*ndeps)
+		return g
+
+	f = fn(b, all_rows)
+	failed = ~np.isfinite(f)
+	Fmin = f.copy()
+	g = np.zeros((T, n))
+	g[~failed] = gradient(all_rows[~failed])
+	failed |= ~np.isfinite(g).all(axis=1)
+	gradcount = np.ones(T, dtype=int)
+	iteration = np.ones(T, dtype=int)
+	ilast = gradcount.copy()
+	count = np.zeros(T, dtype=int)
+	B = np.repeat(np.eye(n)[None], T, axis=0)
+	active = ~failed
+
+	while active.any():
+		rows = np.nonzero(active)[0]
+		reset = rows[ilast[rows] == gradcount[rows]]
+		B[reset] = np.eye(n)
+		X = b[rows].copy()
+		c = g[rows].copy()
+		t = -np.einsum('tij,tj->ti', B[rows], c)
+		gradproj = (t * c).sum(axis=1)
+
+		# uphill: reset unless it has just been reset
+		up = gradproj >= 0
+		count[rows[up]] = np.where(ilast[rows[up]] == gradcount[rows[up]], n, 0)
+		ilast[rows[up]] = gradcount[rows[up]]
+
+		# downhill: backtrack from a step of 1 until the point is acceptable or doesn't change
+		down = np.nonzero(~up)[0]
+		steplength = np.ones(len(rows))
+		accpoint = np.zeros(len(rows), dtype=bool)
+		searching = down
+		while len(searching) > 0:
+			r = rows[searching]
+			b[r] = X[searching] + steplength[searching, None] * t[searching]
+			count[r] = (reltest + X[searching] == reltest + b[r]).sum(axis=1)
+			moved = searching[count[r] < n]
+			if len(moved) > 0:
+				f[rows[moved]] = fn(b[rows[moved]], rows[moved])
+				accepted = np.isfinite(f[rows[moved]]) & (f[rows[moved]] <= Fmin[rows[moved]] + gradproj[moved] * steplength[moved] * acctol)
+				accpoint[moved] = accepted
+				steplength[moved[~accepted]] *= stepredn
+			searching = searching[(count[rows[searching]] < n) & ~accpoint[searching]]
+
+		r = rows[down]
+		enough = (f[r] > abstol) & (np.abs(f[r] - Fmin[r]) > reltol * (np.abs(Fmin[r]) + reltol))
+		count[r[~enough]] = n
+		Fmin[r[~enough]] = f[r[~enough]]
+		progress = down[count[r] < n]
+		if len(progress) > 0:
+			p = rows[progress]
+			Fmin[p] = f[p]
+			g[p] = gradient(p)
+			failed[p] |= ~np.isfinite(g[p]).all(axis=1)
+			gradcount[p] += 1
+			iteration[p] += 1
+			tp = steplength[progress, None] * t[progress]
+			cp = g[p] - c[progress]
+			D1 = (tp * cp).sum(axis=1)
+			update = D1 > 0
+			ilast[p[~update]] = gradcount[p[~update]]
+			if update.any():
+				u = p[update]
+				tu, cu, D1u = tp[update], cp[update], D1[update]
+				Xu = np.einsum('tij,tj->ti', B[u], cu)
+				D2 = 1 + (Xu * cu).sum(axis=1) / D1u
+				B[u] += (D2[:, None, None] * tu[:, :, None] * tu[:, None, :] - Xu[:, :, None] * tu[:, None, :] - tu[:, :, None] * Xu[:, None, :]) / D1u[:, None, None]
+		no_progress = r[(count[r] >= n) & (ilast[r] < gradcount[r])]
+		count[no_progress] = 0
+		ilast[no_progress] = gradcount[no_progress]
+
+		restart = rows[gradcount[rows] - ilast[rows] > 2*n]
+		ilast[restart] = gradcount[restart]
+		active[rows] = ~failed[rows] & (iteration[rows] < maxit) & ((count[rows] != n) | (ilast[rows] != gradcount[rows]))
+
+	return (b, Fmin, failed)
+
+def fit_logistic(x, Y, start=None):
+
+	# fitLogistic for rows of Y that all have their measurements at the times
+	# in x. start can give other starting values (nan rows where there are
+	# none), which are used instead of the usual ones when they fit better
+	data_range = np.column_stack([np.minimum(Y.min(axis=1), x.min()), np.maximum(Y.max(axis=1), x.max())])
+	def fn(P, rows):
+		return penalized_sum_of_squares(P, x, Y[rows], data_range[rows])
+
+	P = logistic_start(x, Y)
+	if start is not None:
+		given = ~np.isnan(start).any(axis=1)
+		with np.errstate(invalid='ignore'):
+			better = given & (fn(np.where(given[:, None], start, P), np.arange(len(Y))) < fn(P, np.arange(len(Y))))
+		P[better] = start[better]
+	P, energy, failed = vmmin(fn, P)
+	P[failed] = np.nan
+	energy[failed] = np.nan
+	fit = {name: P[:, i] for i, name in enumerate(LOGISTIC_COLUMNS)}
+	fit['delta'] = P[:, 1] - P[:, 0]
+	fit['logistic_energy'] = energy
+	fit['logistic_R.squared'] = r_squared(Y, logistic(P, x))
+	return fit
+
+def fit_chunk(x, Y, start=None):
+	# all of the findFunctions columns for rows with the same measurement times
+	fit = fit_linear(x, Y)
+	fit.update(fit_logistic(x, Y, start))
+	return np.column_stack([fit[name] for name in FUNCTION_COLUMNS])
+
+def fit_formant(x, Y, start=None, pool=None, chunk_size=2000):
+
+	# the findFunctions columns (FUNCTION_COLUMNS) for every row of Y, with
+	# nan for rows with fewer than MIN_POINTS defined measurements. rows with
+	# the same defined measurements are fit together, in chunks of chunk_size
+	# rows, which run in the pool (a concurrent.futures executor) if there is one
+	x = np.asarray(x, dtype=float)
+	Y = np.asarray(Y, dtype=float)
+	results = np.full((len(Y), len(FUNCTION_COLUMNS)), np.nan)
+	defined = ~np.isnan(Y)
+	patterns, pattern_codes = np.unique(defined, axis=0, return_inverse=True)
+	pattern_codes = pattern_codes.reshape(-1)
+
+	jobs = []
+	for p, pattern in enumerate(patterns):
+		if pattern.sum() < MIN_POINTS:
+			continue
+		rows = np.nonzero(pattern_codes == p)[0]
+		for first in range(0, len(rows), chunk_size):
+			chunk = rows[first:first+chunk_size]
+			chunk_start = None if start is None else start[chunk]
+			arguments = (x[pattern], Y[np.ix_(chunk, pattern)], chunk_start)
+			if pool == None:
+				results[chunk] = fit_chunk(*arguments)
+			else:
+				jobs.append((chunk, pool.submit(fit_chunk, *arguments)))
+	for chunk, job in jobs:
+		results[chunk] = job.result()
+	return results
+
+def dct_columns(Y, coefficients=4):
+	# dct_all_formants: the first DCT coefficients of each row divided by the
+	# number of points, after interpolating undefined measurements
+	return dct(interpolate_missing(Y))[:, :coefficients] / Y.shape[1]
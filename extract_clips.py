@@ -0,0 +1,197 @@
+import argparse, csv, math, os, time
+from concurrent.futures import ThreadPoolExecutor
+import praatmfc as MFC
+import textgrids as TG
+import wavfiles as WAV
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Extract clips, clip TextGrids and an MFC script for the tokens in a match list, like the clips(), phone_clips(), trigrams() and mfc() operations of one_script')
+parser.add_argument('--matches', default='[none listed]', help='a match list made by textgrid_matches.py')
+parser.add_argument('--operation', default='clips()', help='clips(...), phone_clips(...), trigrams(...) or mfc(...), with the same arguments as in one_script')
+parser.add_argument('--jobs', default=os.cpu_count(), help='how many clips to write at once')
+parser.add_argument('--index', default='', help='a TextGrid index made by textgrid_matches.py (otherwise the TextGrids are read again)')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/extract_clips.py --matches one_script_matches_2024Jun12_10h30m33.csv --operation 'mfc(categories=vocalized/ambiguous/non-vocalized)'
+# (this makes one_script_out_<datestamp>.csv, clips_<datestamp>/ and one_script_out_<datestamp>_MFC.praat, like one_script does)
+
+start_time = time.time()
+jobs = int(args.jobs)
+
+# PARSE THE OPERATION LIKE parseOperations AND parseArgs
+if '(' in args.operation:
+	operation, arg_string = args.operation.split('(', 1)
+else:
+	operation, arg_string = args.operation, ''
+arg_string = arg_string.replace(')', '').replace(', ', ',')
+operation_args = {}
+for arg in arg_string.split(','):
+	if arg != '':
+		var, val = (arg.split('=') + [''])[:2]
+		operation_args[var] = val
+
+if not operation in ['clips', 'phone_clips', 'trigrams', 'mfc']:
+	parser.error('the operation should be clips(), phone_clips(), trigrams() or mfc()')
+
+def true_string(value):
+	return value.replace('"', '').replace("''", '') in ['T', 'True', 'TRUE', 'true']
+
+kind = operation
+pad = 0.0 if operation == 'phone_clips' else 0.1
+sanitize = 1
+scale_peak = 0
+categories = 'A B'
+show_words = 'True'
+if operation == 'mfc':
+	scale_peak = 1
+	kind = 'clips'
+	if true_string(operation_args.get('trigrams', '')):
+		kind = 'trigrams'
+	elif true_string(operation_args.get('segments', '')):
+		kind = 'phone_clips'
+		pad = 0.0
+
+for var, val in operation_args.items():
+	if var == 'pad' and not (operation == 'mfc' and kind != 'clips'):
+		pad = float(val)
+	elif var == 'sanitize':
+		sanitize = float(val)
+	elif var == 'scale':
+		scale_peak = float(val)
+	elif var == 'categories':
+		categories = val.replace('/', ' ').replace('"', '')
+	elif var == 'show_words':
+		show_words = val.replace('"', '').replace("''", '')
+	elif var in ['rate', 'filter_low', 'filter_high', 'spectrograms']:
+		print('skipped argument', var, '(clips keep the sampling rate of the recording and are not filtered: use one_script for this)')
+	elif not var in ['pad', 'trigrams', 'segments']:
+		print('skipped unknown argument', var)
+
+datestamp = time.strftime('%Y%b%d_%Hh%Mm%S')
+outfile = 'one_script_out_'+datestamp+'.csv'
+clip_path = 'clips_'+datestamp
+os.makedirs(clip_path, exist_ok=True)
+
+def praat_round(x):
+	return math.floor(1000*x + 0.5)/1000
+
+def praat_format(x):
+	return '%.15g' % x
+
+def time_value(value):
+	if value == TG.UNDEFINED:
+		return None
+	return float(value)
+
+def clip_times(match):
+	# the clip start and end times and the words for the MFC script, as in the procedures
+	if kind == 'phone_clips':
+		return (praat_round(float(match['phone_start']) - pad), praat_round(float(match['phone_end']) + pad), match['word'], match['word'])
+	if kind == 'clips':
+		return (praat_round(float(match['word_start']) - pad), praat_round(float(match['word_end']) + pad), match['word'], match['word'])
+
+	word_start = float(match['word_start'])
+	word_end = float(match['word_end'])
+	lastword_start = time_value(match['lastword_start'])
+	nextword_end = time_value(match['nextword_end'])
+	if lastword_start == None:
+		start, word1 = word_start, ''
+	elif match['leftword'] in ['', '{SL}', 'sp'] and word_start - lastword_start > 1:
+		start, word1 = word_start - 1, '{SL}'
+	else:
+		start, word1 = lastword_start, match['leftword']
+	if nextword_end == None:
+		end, word3 = word_end, ''
+	elif match['rightword'] in ['', '{SL}', 'sp'] and nextword_end - word_end > 1:
+		end, word3 = word_end + 1, '{SL}'
+	else:
+		end, word3 = nextword_end, match['rightword']
+	return (praat_round(start), praat_round(end), word1+'_'+match['word']+'_'+word3, word1+' '+match['word']+' '+word3)
+
+def clip_name(match, clip_start, word_for_filename):
+	timestring = praat_format(clip_start).replace('.', '_')
+	if clip_start == round(clip_start):
+		timestring = timestring+'_0'
+	if sanitize == 1:
+		for character in ['{', '}', '<', '>', '[', ']', ' ']:
+			word_for_filename = word_for_filename.replace(character, '')
+	return match['sound']+'_'+timestring+'_'+word_for_filename
+
+def write_clip(wav, tiers, name, clip_start, clip_end):
+	WAV.write_clip(os.path.join(clip_path, name+'.wav'), wav, clip_start, clip_end, scale_peak == 1)
+	TG.write_textgrid(os.path.join(clip_path, name+'.TextGrid'), [tier.extract_part(clip_start, clip_end) for tier in tiers])
+
+with open(args.matches, newline='') as f:
+	matches = list(csv.DictReader(f))
+
+index = None
+if args.index != '':
+	index = TG.TextGridIndex(args.index)
+
+# GROUP THE TOKENS BY RECORDING, SO EACH WAV FILE AND TEXTGRID IS OPENED ONCE
+recordings = []
+for n, match in enumerate(matches):
+	if recordings == [] or recordings[-1][0] != (match['wav_file'], match['tg_file']):
+		recordings.append(((match['wav_file'], match['tg_file']), []))
+	recordings[-1][1].append(n)
+
+print('\n########################################')
+print('Extracting', len(matches), 'clips from', len(set([r[0] for r in recordings])), 'recordings to', clip_path, 'with', jobs, 'threads')
+
+stimuli = [None] * len(matches)
+other_rates = set()
+with ThreadPoolExecutor(max_workers=jobs) as pool:
+	for (wav_path, tg_path), tokens in recordings:
+		wav = WAV.WavFile(wav_path)
+		if wav.rate != 44100:
+			other_rates.add(wav.rate)
+		if index != None and os.path.abspath(tg_path) in index.documents:
+			tiers = index.tiers(tg_path)
+		else:
+			tiers = TG.read_textgrid(tg_path)
+		futures = []
+		for n in tokens:
+			clip_start, clip_end, word_for_filename, word_for_mfc = clip_times(matches[n])
+			name = clip_name(matches[n], clip_start, word_for_filename)
+			stimuli[n] = (clip_start, clip_end, name, word_for_mfc)
+			futures.append(pool.submit(write_clip, wav, tiers, name, clip_start, clip_end))
+		for future in futures:
+			future.result()
+		wav.close()
+
+with open(outfile, 'w') as out:
+	out.write(','.join(TG.MATCH_HEADER+['clip_start', 'clip_end', 'stimulus'])+'\n')
+	for match, (clip_start, clip_end, name, word_for_mfc) in zip(matches, stimuli):
+		out.write(','.join([match[column] for column in TG.MATCH_HEADER]+[praat_format(clip_start), praat_format(clip_end), name])+'\n')
+
+# MAKE THE MFC SCRIPT LIKE makeMFCscript
+if operation == 'mfc' and len(matches) > 0:
+	labels = [c.replace('_', ' ') for c in TG.parse_string(categories)]
+	left_margin = 0.10
+	right_margin = 0.90
+	button_width = (right_margin - left_margin - 0.01*(len(labels)-1)) / len(labels)
+	top = ['"ooTextFile"\n', '"ExperimentMFC 5"\n', 'stimuliAreSounds? <yes>\n', 'stimulusFileNameHead = "'+clip_path+'/"\n', 'stimulusFileNameTail = ".wav"\n',
+		'stimulusCarrierBefore = ""\n', 'stimulusCarrierAfter = ""\n', 'stimulusInitialSilenceDuration = 0.25 seconds\n', 'stimulusMedialSilenceDuration = 0\n']
+	bottom = ['numberOfReplicationsPerStimulus = 1\n', 'breakAfterEvery = 0\n', 'randomize = <PermuteBalancedNoDoublets>\n\n',
+		'startText = "Please code the following sound clips"\n\n', 'runText = "Which category?"\n\n', 'pauseText = "Please take a break. Click to proceed."\n\n',
+		'endText = "Done.  You can close this window now and go click to save the results."\n\n', 'maximumNumberOfReplays = 1000\n\n',
+		'replayButton = '+praat_format(left_margin)+' '+praat_format(right_margin)+' 0.27 0.42 "Replay" ""\n', 'okButton     = 0.00 0.00 0.00 0.00 "" ""\n',
+		'oopsButton   = '+praat_format(left_margin)+' '+praat_format(right_margin)+' 0.11 0.26 "Go back" ""\n', 'responsesAreSounds? <no> "" "" "" "" 0 0\n',
+		'numberOfDifferentResponses = '+str(len(labels)+1)+'\n']
+	for n, label in enumerate(labels):
+		button_left = praat_round(left_margin + n*(button_width+0.01))
+		button_right = praat_round(button_left + button_width)
+		bottom.append('    '+praat_format(button_left)+' '+praat_format(button_right)+' 0.60 0.85 "'+label+'" 40 "" "'+label+'"\n')
+	bottom.append('    '+praat_format(left_margin)+' '+praat_format(right_margin)+' 0.44 0.59 "N/A (wrong sound or other problem)" 40 "" "NA"\n')
+	bottom.append('numberOfGoodnessCategories = 0\n')
+	if true_string(show_words):
+		rows = [(name, word_for_mfc) for clip_start, clip_end, name, word_for_mfc in stimuli]
+	else:
+		rows = [(name, '') for clip_start, clip_end, name, word_for_mfc in stimuli]
+	MFC.writestimuli(outfile.replace('.csv', '')+'_MFC.praat', top, bottom, len(rows), rows)
+
+print('wrote', outfile, 'in', round(time.time()-start_time, 2), 'seconds')
+if len(other_rates) > 0:
+	print('NOTE: clips keep the sampling rate of their recording (', ', '.join([str(r) for r in sorted(other_rates)]), 'Hz ), where one_script would resample them to 44100 Hz')
+print('########################################\n')
@@ -0,0 +1,146 @@
+import argparse, csv, multiprocessing, os, re, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import contours as C
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Fit polynomial, DCT and logistic functions to the formant contours in one_script output, like findFunctions and dct_all_formants in formant_functions.r')
+parser.add_argument('--input', default='[none listed]', help='one_script output with formant measurements at several time points (F1_20, F1_25, ...)')
+parser.add_argument('--formants', default='F1,F2,F3', help='the formants to fit')
+parser.add_argument('--measurements', default='[none listed]', help='comma-separated measurement points to use, e.g. 20,25,30 (default: all of them)')
+parser.add_argument('--bark', default='False', help='whether to convert the frequencies to Bark first')
+parser.add_argument('--output_type', default='functions', help='functions (a row of coefficients for each token, like findFunctions) or dct (the input with DCT columns added, like dct_all_formants)')
+parser.add_argument('--coefficients', default=4, help='dct: how many DCT coefficients to add')
+parser.add_argument('--jobs', default=os.cpu_count(), help='how many processes to fit the logistic functions with')
+parser.add_argument('--warm_start', default='[none listed]', help='functions: an earlier output of this script, whose logistic parameters are used as starting values for the same tokens')
+parser.add_argument('--output', default='', help='what to call the output file')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/fit_formant_contours.py --input one_script_out_2024Jul27_12h34m56.csv
+# python /phon/scripts/fit_formant_contours.py --input one_script_out_2024Jul27_12h34m56.csv --output_type dct --bark True --measurements 20,25,30,35,40,45,50,55,60,65,70,75,80
+# (the second one adds the Fb1DCT0 ... Fb3DCT3 columns that one_script_formant_optimization.r makes with dct_all_formants)
+
+start_time = time.time()
+formants = args.formants.split(',')
+jobs = int(args.jobs)
+
+if args.output == '':
+	output_filename = args.input.replace('.csv', '')+'_'+args.output_type+'.csv'
+else:
+	output_filename = args.output
+
+def to_float(value):
+	if value in ['--undefined--', 'NA', '']:
+		return float('nan')
+	try:
+		return float(value)
+	except ValueError:
+		return float('nan')
+
+def formant_name(formant):
+	# Bark columns are called Fb1 etc., as in bark_all_formants
+	if args.bark == 'True':
+		return formant.replace('F', 'Fb', 1)
+	return formant
+
+with open(args.input, newline='') as f:
+	header = next(csv.reader(f))
+
+# THE MEASUREMENT COLUMNS OF EACH FORMANT, IN TIME ORDER
+measurement_columns = {}
+for formant in formants:
+	points = []
+	for c, name in enumerate(header):
+		m = re.match('^'+formant+r'_(\d+(?:\.\d+)?)$', name)
+		if m and (args.measurements == '[none listed]' or m.group(1) in args.measurements.split(',')):
+			points.append((float(m.group(1)), c))
+	if len(points) < C.MIN_POINTS:
+		parser.error(args.input+' has '+str(len(points))+' '+formant+' measurement columns, and the functions need at least '+str(C.MIN_POINTS))
+	measurement_columns[formant] = sorted(points)
+
+# READ THE MEASUREMENTS
+rows = []
+Y = {formant: [] for formant in formants}
+with open(args.input, newline='') as f:
+	reader = csv.reader(f)
+	next(reader)
+	for row in reader:
+		if len(row) < len(header):
+			row = row + [''] * (len(header) - len(row))
+		for formant in formants:
+			Y[formant].append([to_float(row[c]) for pct, c in measurement_columns[formant]])
+		rows.append(row)
+for formant in formants:
+	Y[formant] = np.array(Y[formant], dtype=float).reshape(len(rows), len(measurement_columns[formant]))
+	if args.bark == 'True':
+		with np.errstate(divide='ignore', invalid='ignore'):
+			Y[formant] = C.bark(Y[formant])
+
+print('\n########################################')
+print('Fitting', ', '.join(formants), 'contours for', len(rows), 'tokens from', args.input)
+
+def format_value(value, undefined):
+	if np.isnan(value):
+		return undefined
+	return '%.15g' % value
+
+if args.output_type == 'dct':
+	coefficients = int(args.coefficients)
+	columns = []
+	for formant in formants:
+		columns.append(C.dct_columns(Y[formant], coefficients))
+	with open(output_filename, 'w', newline='') as out:
+		writer = csv.writer(out, lineterminator='\n')
+		writer.writerow(header + [formant_name(formant)+'DCT'+str(k) for formant in formants for k in range(coefficients)])
+		for r, row in enumerate(rows):
+			writer.writerow(row[:len(header)] + [format_value(v, '--undefined--') for values in columns for v in values[r]])
+
+elif args.output_type == 'functions':
+	# starting values for the logistic fits from an earlier run
+	starts = {formant: None for formant in formants}
+	if args.warm_start != '[none listed]':
+		if not 'token_id' in header:
+			parser.error(args.input+' has no token_id column to match with '+args.warm_start)
+		with open(args.warm_start, newline='') as f:
+			reader = csv.DictReader(f, restval='')
+			earlier_header = reader.fieldnames if reader.fieldnames != None else []
+			missing = [name for name in ['token_id'] + [formant_name(formant)+'_'+p for formant in formants for p in C.LOGISTIC_COLUMNS] if not name in earlier_header]
+			if missing != []:
+				parser.error(args.warm_start+' has no '+', '.join(missing)+' column'+('s' if len(missing) > 1 else '')+' (it should be functions output of this script, with the same --formants and --bark)')
+			earlier = {row['token_id']: row for row in reader}
+		token_ids = [row[header.index('token_id')] for row in rows]
+		for formant in formants:
+			names = [formant_name(formant)+'_'+p for p in C.LOGISTIC_COLUMNS]
+			starts[formant] = np.array([[to_float(earlier[t][name]) if t in earlier else float('nan') for name in names] for t in token_ids], dtype=float).reshape(len(rows), 4)
+		print('...starting from the logistic parameters in', args.warm_start, 'for', sum([t in earlier for t in token_ids]), 'tokens')
+
+	# logistic fits in a process pool (forked, so the workers don't run this
+	# script again), or in this process with --jobs 1
+	if jobs <= 1:
+		pool = None
+	elif 'fork' in multiprocessing.get_all_start_methods():
+		pool = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'))
+	else:
+		pool = ThreadPoolExecutor(max_workers=jobs)
+	results = {}
+	for formant in formants:
+		x = C.normtime([pct for pct, c in measurement_columns[formant]])
+		results[formant] = C.fit_formant(x, Y[formant], starts[formant], pool)
+	if pool != None:
+		pool.shutdown()
+
+	id_columns = [c for c in ['token_id', 'speaker', 'word', 'phone'] if c in header]
+	with open(output_filename, 'w', newline='') as out:
+		writer = csv.writer(out, lineterminator='\n')
+		writer.writerow(id_columns + [formant_name(formant)+'_'+name for formant in formants for name in C.FUNCTION_COLUMNS])
+		for r, row in enumerate(rows):
+			writer.writerow([row[header.index(c)] for c in id_columns] + [format_value(v, 'NA') for formant in formants for v in results[formant][r]])
+	for formant in formants:
+		print('...', int((~np.isnan(results[formant][:, 0])).sum()), 'tokens have enough', formant, 'measurements to fit')
+
+else:
+	parser.error('the output_type should be functions or dct')
+
+print('wrote', output_filename, 'in', round(time.time()-start_time, 2), 'seconds')
+print('########################################\n')
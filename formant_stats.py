@@ -0,0 +1,505 @@
+import csv, math, os, re
+import numpy as np
+
+# streaming statistics for the formant optimization passes in
+# formant_functions.r (findVowelMeans, findCovarianceMatrices,
+# choose_candidates_with_B2_50 and optimize_within_speaker).
+#
+# a Moments table keeps, for each key (e.g. a speaker, phone and candidate):
+#   rows[k]                 how many rows were added
+#   col_n[k, j], col_sum[k, j]  how many values of parameter j were defined, and their sum
+#   n[k], mean[k], M2[k]    the rows with every parameter defined: their count,
+#                           mean and co-moment (sum of outer products of deviations)
+# so means (with na.rm=TRUE, as in colMeans) and covariance matrices (of the
+# complete rows, as in cov(na.omit(...))) come from the table, and adding or
+# removing rows only touches the keys of those rows.
+
+STORE_VERSION = 1
+
+class Moments:
+
+	def __init__(self, params):
+		self.params = list(params)
+		self.keys = []
+		self.key_index = {}
+		p = len(self.params)
+		self.rows = np.zeros(0)
+		self.col_n = np.zeros((0, p))
+		self.col_sum = np.zeros((0, p))
+		self.n = np.zeros(0)
+		self.mean = np.zeros((0, p))
+		self.M2 = np.zeros((0, p, p))
+
+	def __len__(self):
+		return len(self.keys)
+
+	def codes(self, keys):
+		# the code of each key, adding the keys that aren't in the table yet
+		new_keys = []
+		for key in keys:
+			if not key in self.key_index:
+				self.key_index[key] = len(self.keys) + len(new_keys)
+				new_keys.append(key)
+		if new_keys != []:
+			k, p = len(new_keys), len(self.params)
+			self.keys += new_keys
+			self.rows = np.concatenate([self.rows, np.zeros(k)])
+			self.col_n = np.concatenate([self.col_n, np.zeros((k, p))])
+			self.col_sum = np.concatenate([self.col_sum, np.zeros((k, p))])
+			self.n = np.concatenate([self.n, np.zeros(k)])
+			self.mean = np.concatenate([self.mean, np.zeros((k, p))])
+			self.M2 = np.concatenate([self.M2, np.zeros((k, p, p))])
+		return np.array([self.key_index[key] for key in keys], dtype=np.int64)
+
+	def add(self, codes, X):
+		self.update(codes, X, 1)
+
+	def remove(self, codes, X):
+		self.update(codes, X, -1)
+
+	def update(self, codes, X, sign):
+		codes = np.asarray(codes, dtype=np.int64)
+		X = np.asarray(X, dtype=float).reshape(len(codes), len(self.params))
+		if len(codes) == 0:
+			return
+		u, rows, col_n, col_sum, n, mean, M2 = group_moments(codes, X)
+		self.rows[u] += sign * rows
+		self.col_n[u] += sign * col_n
+		self.col_sum[u] += sign * col_sum
+		if sign > 0:
+			self.n[u], self.mean[u], self.M2[u] = merge_moments((self.n[u], self.mean[u], self.M2[u]), (n, mean, M2))
+		else:
+			self.n[u], self.mean[u], self.M2[u] = unmerge_moments((self.n[u], self.mean[u], self.M2[u]), (n, mean, M2))
+
+	def combine(self, groups):
+		# a Moments table with one key for each group of keys (groups maps each
+		# new key to a list of codes), without going back to the rows
+		combined = Moments(self.params)
+		combined.codes(list(groups.keys()))
+		if len(groups) == 0:
+			return combined
+		source = np.concatenate([np.asarray(codes, dtype=np.int64) for codes in groups.values()])
+		target = np.repeat(np.arange(len(groups)), [len(codes) for codes in groups.values()])
+		np.add.at(combined.rows, target, self.rows[source])
+		np.add.at(combined.col_n, target, self.col_n[source])
+		np.add.at(combined.col_sum, target, self.col_sum[source])
+		np.add.at(combined.n, target, self.n[source])
+		sums = np.zeros_like(combined.mean)
+		np.add.at(sums, target, self.n[source][:, None] * self.mean[source])
+		with np.errstate(invalid='ignore', divide='ignore'):
+			combined.mean = np.where(combined.n[:, None] > 0, sums / combined.n[:, None], 0)
+		d = self.mean[source] - combined.mean[target]
+		np.add.at(combined.M2, target, self.M2[source] + self.n[source][:, None, None] * d[:, :, None] * d[:, None, :])
+		return combined
+
+	def column_means(self, na_rm=True):
+		# colMeans(na.rm=TRUE), or (with na_rm=False) nan for a parameter with any undefined value, like mean()
+		with np.errstate(invalid='ignore', divide='ignore'):
+			means = self.col_sum / self.col_n
+		if not na_rm:
+			means = np.where(self.col_n < self.rows[:, None], np.nan, means)
+		return means
+
+	def covariance(self):
+		with np.errstate(invalid='ignore', divide='ignore'):
+			return self.M2 / (self.n - 1)[:, None, None]
+
+	def arrays(self, prefix):
+		return {prefix+'keys': np.array(['\t'.join([str(k) for k in key]) for key in self.keys], dtype=str), prefix+'rows': self.rows, prefix+'col_n': self.col_n,
+			prefix+'col_sum': self.col_sum, prefix+'n': self.n, prefix+'mean': self.mean, prefix+'M2': self.M2}
+
+	def load_arrays(self, saved, prefix, key_types):
+		self.keys = [tuple([t(v) for t, v in zip(key_types, str(key).split('\t'))]) for key in saved[prefix+'keys']]
+		self.key_index = {key: k for k, key in enumerate(self.keys)}
+		for name in ['rows', 'col_n', 'col_sum', 'n', 'mean', 'M2']:
+			setattr(self, name, saved[prefix+name].copy())
+
+def group_moments(codes, X):
+	# the moments of the rows of X for each code (sorted codes, then one value per code)
+	order = np.argsort(codes, kind='stable')
+	codes = codes[order]
+	X = X[order]
+	starts = np.concatenate([[0], np.nonzero(codes[1:] != codes[:-1])[0] + 1])
+	u = codes[starts]
+	rows = np.diff(np.concatenate([starts, [len(codes)]])).astype(float)
+	defined = ~np.isnan(X)
+	col_n = np.add.reduceat(defined.astype(float), starts, axis=0)
+	col_sum = np.add.reduceat(np.where(defined, X, 0), starts, axis=0)
+
+	p = X.shape[1]
+	n = np.zeros(len(u))
+	mean = np.zeros((len(u), p))
+	M2 = np.zeros((len(u), p, p))
+	complete = defined.all(axis=1)
+	if complete.any():
+		group = np.cumsum(np.concatenate([[0], codes[1:] != codes[:-1]]))[complete]
+		Xc = X[complete]
+		n += np.bincount(group, minlength=len(u))
+		for j in range(p):
+			mean[:, j] = np.bincount(group, weights=Xc[:, j], minlength=len(u))
+		with np.errstate(invalid='ignore', divide='ignore'):
+			mean = np.where(n[:, None] > 0, mean / n[:, None], 0)
+		d = Xc - mean[group]
+		for i in range(p):
+			for j in range(i, p):
+				M2[:, i, j] = M2[:, j, i] = np.bincount(group, weights=d[:, i]*d[:, j], minlength=len(u))
+	return (u, rows, col_n, col_sum, n, mean, M2)
+
+def merge_moments(a, b):
+	# the moments of two sets of rows together (Chan et al.'s pairwise update)
+	na, ma, M2a = a
+	nb, mb, M2b = b
+	n = na + nb
+	delta = mb - ma
+	with np.errstate(invalid='ignore', divide='ignore'):
+		share = np.where(n > 0, nb / n, 0)
+		cross = np.where(n > 0, na * nb / n, 0)
+	mean = ma + delta * share[:, None]
+	M2 = M2a + M2b + delta[:, :, None] * delta[:, None, :] * cross[:, None, None]
+	return (n, mean, M2)
+
+def unmerge_moments(total, b):
+	# the moments of the rows of total that aren't in b
+	n, m, M2 = total
+	nb, mb, M2b = b
+	na = n - nb
+	with np.errstate(invalid='ignore', divide='ignore'):
+		ma = np.where(na[:, None] > 0, (n[:, None]*m - nb[:, None]*mb) / na[:, None], 0)
+		cross = np.where(n > 0, na * nb / n, 0)
+	delta = mb - ma
+	M2a = np.where(na[:, None, None] > 0, M2 - M2b - delta[:, :, None] * delta[:, None, :] * cross[:, None, None], 0)
+	return (na, ma, M2a)
+
+# THE OPTIMIZATION PASSES
+
+def inverse_covariance(moments, k):
+	# the inverse of a covariance matrix, or None where R's solve() would stop
+	# (too few rows, or a reciprocal condition number below .Machine$double.eps)
+	if moments.n[k] < 2:
+		return None
+	cov = moments.M2[k] / (moments.n[k] - 1)
+	if not np.isfinite(cov).all():
+		return None
+	try:
+		if 1 / np.linalg.cond(cov, 1) < np.finfo(float).eps:
+			return None
+		return np.linalg.inv(cov)
+	except np.linalg.LinAlgError:
+		return None
+
+def mahalanobis(X, center, inv_cov):
+	d = X - center
+	return np.einsum('ti,ij,tj->t', d, inv_cov, d)
+
+def best_per_token(values, tokens):
+	# as.numeric(value==min(value)[1]) for each token: 1 for the lowest value
+	# (all of them if there is a tie), and nan for every row of a token with an undefined value
+	order = np.argsort(tokens, kind='stable')
+	sorted_tokens = tokens[order]
+	starts = np.concatenate([[0], np.nonzero(sorted_tokens[1:] != sorted_tokens[:-1])[0] + 1])
+	lowest = np.minimum.reduceat(values[order], starts)
+	group = np.cumsum(np.concatenate([[0], sorted_tokens[1:] != sorted_tokens[:-1]]))
+	token_lowest = np.empty(len(values))
+	token_lowest[order] = lowest[group]
+	return np.where(np.isnan(token_lowest), np.nan, (values == token_lowest).astype(float))
+
+def choose_bandwidths(values, candidates, fixed='max_formant'):
+	# choose_bandwidths: values maps each phone or speaker to its mean log
+	# B2_50 for each candidate it has, in order. as in R, the best candidate is
+	# the one in the same position of candidates as the lowest mean (nan if
+	# there is no such position), and best_centered is relative to the mean
+	# best candidate
+	best = {}
+	for what in sorted(values.keys()):
+		v = np.array(values[what], dtype=float)
+		if np.isnan(v).all():
+			best[what] = float('nan')
+			continue
+		i = int(np.nonzero(v == np.nanmin(v))[0][0])
+		best[what] = candidates[i] if i < len(candidates) else float('nan')
+	mean_best = np.mean(list(best.values())) if len(best) > 0 else float('nan')
+	if fixed == 'max_formant':
+		centered = {what: float(np.round(2*(b - mean_best))/2) for what, b in best.items()}
+	else:
+		centered = {what: float(b - np.round(mean_best, -2)) for what, b in best.items()}
+	return (best, centered)
+
+def candidate_window(initial_candidate, unfixed_range, fixed='max_formant'):
+	# the five candidates that optimize_within_speaker compares for a speaker
+	# and phone (as in R, the top of the range is checked against the highest
+	# candidate minus 1 for both kinds of candidate)
+	low, high = unfixed_range
+	initial_candidate = max(initial_candidate, min(initial_candidate, high), low)
+	step = 100 if fixed == 'total_formants' else 0.5
+	if initial_candidate < low + 2*step:
+		middle = low + 2*step
+	elif initial_candidate > high - 1:
+		middle = high - 2*step
+	else:
+		middle = initial_candidate
+	return [middle + step*k for k in [-2, -1, 0, 1, 2]]
+
+def optimize_phone(tokens, candidate, mdist, X, candidates, max_iterations=20):
+
+	# the optimize_within_speaker loop for the rows of one speaker and phone:
+	# starting from the candidate with the lowest mdist, find the mean and
+	# covariance of the chosen rows, choose again by Mahalanobis distance
+	# from them, and repeat until nothing changes. the statistics of the
+	# chosen rows are updated with just the rows whose choice changed.
+	# returns the window mask, the new distances and choices for the rows in
+	# the window, and the number of iterations
+	window = np.isin(candidate, candidates)
+	tokens, X = tokens[window], X[window]
+	if len(tokens) == 0:
+		return (window, np.zeros(0), np.zeros(0), 0)
+	current = best_per_token(mdist[window], tokens)
+	new_mdist = np.full(len(tokens), np.nan)
+
+	chosen = Moments(range(X.shape[1]))
+	code = chosen.codes([0])[0]
+	chosen.add(np.full(int((current == 1).sum()), code), X[current == 1])
+	iterations = 1
+	change_rate = 1
+	while change_rate > 0 and iterations < max_iterations + 1:
+		inv_cov = inverse_covariance(chosen, code)
+		if inv_cov is None:
+			break
+		new_mdist = mahalanobis(X, chosen.column_means()[code], inv_cov)
+		new = best_per_token(new_mdist, tokens)
+		changes = (new != current) & ~np.isnan(new) & ~np.isnan(current)
+		dropped = (current == 1) & (new != 1)
+		added = (new == 1) & (current != 1)
+		chosen.remove(np.full(int(dropped.sum()), code), X[dropped])
+		chosen.add(np.full(int(added.sum()), code), X[added])
+		current = new
+		iterations += 1
+		change_rate = changes.sum() / len(current)
+	return (window, new_mdist, current, iterations - 1)
+
+def optimize_speaker(data, initial_candidates, unfixed_range, fixed='max_formant'):
+	# optimize_within_speaker for one speaker's rows (a dict of arrays from
+	# FormantStore.speaker_data): initial_candidates maps each phone to
+	# best_by_ph + the speaker's best_centered. returns new_mdist, new_best
+	# and a line of notes for each phone
+	n_rows = len(data['candidate'])
+	# token_ids are only unique within a file
+	tokens = np.char.add(np.char.add(data['file_code'].astype(str), ':'), data['token'])
+	new_mdist = np.full(n_rows, np.nan)
+	new_best = np.full(n_rows, np.nan)
+	notes = []
+	for phone in sorted(set(data['phone'])):
+		rows = np.nonzero(data['phone'] == phone)[0]
+		initial = initial_candidates.get(phone, float('nan'))
+		if math.isnan(initial):
+			notes.append(phone+': no initial candidate')
+			continue
+		candidates = candidate_window(initial, unfixed_range, fixed)
+		window, mdist, best, iterations = optimize_phone(tokens[rows], data['candidate'][rows], data['mdist'][rows], data['X'][rows], candidates)
+		new_best[rows] = 0
+		new_mdist[rows[window]] = mdist
+		new_best[rows[window]] = best
+		notes.append(phone+': n='+str(int((best == 1).sum()))+'; candidates: '+' '.join(['%g' % c for c in candidates])+'; '+str(iterations)+' iterations')
+	return (new_mdist, new_best, notes)
+
+# THE STORE
+
+def to_float(value):
+	if value == '--undefined--':
+		return float('nan')
+	try:
+		return float(value)
+	except ValueError:
+		return float('nan')
+
+def read_candidates(path, speaker_col, phone_col, unfixed, params):
+
+	# the rows of one_script output made with formants(keep_all=1): with
+	# keep_all=1, only the first candidate row of a token has the columns of
+	# the operations before formants(), and the other rows start the formant
+	# columns right after the basic token information. params can include
+	# log_X for the natural log of column X. allophone0 is the phone without
+	# stress digits, as in one_script_formant_optimization.r
+	with open(path, newline='') as f:
+		reader = csv.reader(f)
+		header = next(reader)
+		n_base = header.index('speech_overlap') + 1 if 'speech_overlap' in header else header.index('right2') + 1
+		formant_start = header.index('total_formants')
+		def relative_column(name):
+			if not name in header:
+				raise ValueError(path+' has no '+name+' column')
+			return header.index(name) - formant_start
+		log_scale = np.array([p.startswith('log_') and not p in header for p in params], dtype=bool)
+		param_columns = [relative_column(p[4:] if log else p) for p, log in zip(params, log_scale)]
+		unfixed_column = relative_column(unfixed)
+		mdist_column = relative_column('mdist')
+		token_column = header.index('token_id')
+		speaker_column = header.index(speaker_col)
+		derive_phone = phone_col == 'allophone0' and not phone_col in header
+		phone_column = header.index('phone' if derive_phone else phone_col)
+
+		data = {'speaker': [], 'token': [], 'phone': [], 'candidate': [], 'mdist': [], 'X': []}
+		last_token_id = None
+		for row in reader:
+			if len(row) <= max(token_column, speaker_column, phone_column):
+				continue
+			block = formant_start if row[token_column] != last_token_id else n_base
+			last_token_id = row[token_column]
+			def value(c):
+				return to_float(row[block+c]) if block+c < len(row) else float('nan')
+			if math.isnan(value(unfixed_column)):
+				continue
+			data['speaker'].append(row[speaker_column])
+			data['token'].append(row[token_column])
+			data['phone'].append(re.sub('[012]', '', row[phone_column]) if derive_phone else row[phone_column])
+			data['candidate'].append(value(unfixed_column))
+			data['mdist'].append(value(mdist_column))
+			data['X'].append([value(c) for c in param_columns])
+	data['X'] = np.array(data['X'], dtype=float).reshape(len(data['token']), len(params))
+	with np.errstate(divide='ignore', invalid='ignore'):
+		data['X'][:, log_scale] = np.log(data['X'][:, log_scale])
+	return data
+
+class FormantStore:
+
+	# a directory with the candidate rows of every speaker (one .npz file
+	# per speaker) and store.npz, which has the list of input files and a
+	# Moments table for each speaker, phone and candidate. files that are
+	# already in the store are only read again if their size or modification
+	# time changes, and then only their speakers' statistics are updated.
+
+	def __init__(self, path, params, speaker_col='speaker', phone_col='allophone0', unfixed='total_formants'):
+		self.path = path
+		self.params = list(params)
+		self.speaker_col = speaker_col
+		self.phone_col = phone_col
+		self.unfixed = unfixed
+		self.files = []
+		self.file_size = []
+		self.file_mtime = []
+		self.speakers = []
+		self.signatures = []
+		self.moments = Moments(self.params)
+		if os.path.exists(os.path.join(path, 'store.npz')):
+			self.load()
+
+	def settings(self):
+		return '\t'.join([str(STORE_VERSION), self.speaker_col, self.phone_col, self.unfixed] + self.params)
+
+	def load(self):
+		with np.load(os.path.join(self.path, 'store.npz')) as saved:
+			if str(saved['settings']) != self.settings():
+				# made with other columns: start again
+				return
+			self.files = [str(f) for f in saved['files']]
+			self.file_size = [int(s) for s in saved['file_size']]
+			self.file_mtime = [int(m) for m in saved['file_mtime']]
+			self.speakers = [str(s) for s in saved['speakers']]
+			self.signatures = [str(s) for s in saved['signatures']]
+			self.moments.load_arrays(saved, 'moments_', [str, str, float])
+
+	def save(self):
+		os.makedirs(self.path, exist_ok=True)
+		store_path = os.path.join(self.path, 'store.npz')
+		temp_path = store_path + '.' + str(os.getpid()) + '.npz'
+		np.savez(temp_path, settings=self.settings(), files=np.array(self.files, dtype=str), file_size=np.array(self.file_size, dtype=np.int64),
+			file_mtime=np.array(self.file_mtime, dtype=np.int64), speakers=np.array(self.speakers, dtype=str), signatures=np.array(self.signatures, dtype=str),
+			**self.moments.arrays('moments_'))
+		os.replace(temp_path, store_path)
+
+	def speaker_path(self, speaker):
+		return os.path.join(self.path, 'speaker_%05d.npz' % self.speakers.index(speaker))
+
+	def speaker_data(self, speaker):
+		empty = {'file_code': np.zeros(0, dtype=np.int32), 'token': np.zeros(0, dtype=str), 'phone': np.zeros(0, dtype=str), 'candidate': np.zeros(0),
+			'mdist': np.zeros(0), 'X': np.zeros((0, len(self.params))), 'new_mdist': np.zeros(0), 'new_best': np.zeros(0)}
+		if not speaker in self.speakers or not os.path.exists(self.speaker_path(speaker)):
+			return empty
+		with np.load(self.speaker_path(speaker)) as saved:
+			return {name: saved[name] for name in empty}
+
+	def save_speaker_data(self, speaker, data):
+		os.makedirs(self.path, exist_ok=True)
+		path = self.speaker_path(speaker)
+		temp_path = path + '.' + str(os.getpid()) + '.npz'
+		np.savez(temp_path, **data)
+		os.replace(temp_path, path)
+
+	def moment_codes(self, speaker, data):
+		return self.moments.codes([(speaker, p, c) for p, c in zip(data['phone'], data['candidate'])])
+
+	def ingest(self, filepath):
+
+		# adds a one_script output file (or replaces its rows if it changed)
+		# and returns the speakers whose rows changed, or None if the file is
+		# already in the store and hasn't changed
+		key = os.path.abspath(filepath)
+		stat = os.stat(key)
+		replacing = key in self.files
+		if replacing:
+			f = self.files.index(key)
+			if self.file_size[f] == stat.st_size and self.file_mtime[f] == stat.st_mtime_ns:
+				return None
+			self.file_size[f] = stat.st_size
+			self.file_mtime[f] = stat.st_mtime_ns
+		else:
+			f = len(self.files)
+			self.files.append(key)
+			self.file_size.append(stat.st_size)
+			self.file_mtime.append(stat.st_mtime_ns)
+
+		rows = read_candidates(filepath, self.speaker_col, self.phone_col, self.unfixed, self.params)
+		speaker_rows = {}
+		for i, speaker in enumerate(rows['speaker']):
+			speaker_rows.setdefault(speaker, []).append(i)
+		changed = set(speaker_rows.keys())
+		# speakers that had rows from this file before
+		if replacing:
+			for speaker in self.speakers:
+				if not speaker in changed and f in self.speaker_data(speaker)['file_code']:
+					changed.add(speaker)
+
+		for speaker in sorted(changed):
+			if not speaker in self.speakers:
+				self.speakers.append(speaker)
+				self.signatures.append('')
+			data = self.speaker_data(speaker)
+			old = data['file_code'] == f
+			self.moments.remove(self.moment_codes(speaker, {name: data[name][old] for name in ['phone', 'candidate']}), data['X'][old])
+			data = {name: data[name][~old] for name in data}
+			new = speaker_rows.get(speaker, [])
+			added = {'file_code': np.full(len(new), f, dtype=np.int32), 'token': np.array([rows['token'][i] for i in new], dtype=str),
+				'phone': np.array([rows['phone'][i] for i in new], dtype=str), 'candidate': np.array([rows['candidate'][i] for i in new], dtype=float),
+				'mdist': np.array([rows['mdist'][i] for i in new], dtype=float), 'X': np.array([rows['X'][i] for i in new], dtype=float).reshape(len(new), len(self.params)),
+				'new_mdist': np.full(len(new), np.nan), 'new_best': np.full(len(new), np.nan)}
+			self.moments.add(self.moment_codes(speaker, added), added['X'])
+			data = {name: np.concatenate([data[name], added[name]]) for name in data}
+			# the rows changed, so the speaker has to be optimized again
+			self.signatures[self.speakers.index(speaker)] = ''
+			self.save_speaker_data(speaker, data)
+		return sorted(changed)
+
+	def summaries(self, param='log_B2_50'):
+		# the mean of a parameter (nan if any row doesn't have it, like mean()
+		# in ddply) for each phone and candidate, and for each speaker and
+		# candidate, combined from the speaker x phone x candidate table
+		j = self.params.index(param)
+		by_phone = {}
+		by_speaker = {}
+		for k, (speaker, phone, candidate) in enumerate(self.moments.keys):
+			if self.moments.rows[k] > 0:
+				by_phone.setdefault((phone, candidate), []).append(k)
+				by_speaker.setdefault((speaker, candidate), []).append(k)
+		phone_means = self.moments.combine(by_phone).column_means(na_rm=False)[:, j]
+		speaker_means = self.moments.combine(by_speaker).column_means(na_rm=False)[:, j]
+		return (dict(zip(by_phone.keys(), phone_means)), dict(zip(by_speaker.keys(), speaker_means)))
+
+	def unfixed_range(self):
+		candidates = [c for (s, p, c), rows in zip(self.moments.keys, self.moments.rows) if rows > 0 and not math.isnan(c)]
+		return (min(candidates), max(candidates))
+
+def by_candidate(means):
+	# {(what, candidate): mean} to {what: [mean for each candidate, in order]}
+	values = {}
+	for (what, candidate) in sorted(means.keys()):
+		values.setdefault(what, []).append(means[(what, candidate)])
+	return values
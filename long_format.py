@@ -0,0 +1,276 @@
+import csv, io, json, os, re, zlib
+import numpy as np
+
+# a long-format dataset is a directory with two files:
+#   data.bin    compressed column blocks (each one an np.save array, compressed with zlib)
+#   index.json  the columns and, for each block, its phone, row counts and where each column is in data.bin
+# each block has the candidate rows of the tokens of one phone from one chunk of the wide file:
+#   tokens        one row per token and candidate, with every column of the wide file that isn't a measurement
+#   measurements  one row per token, candidate, parameter, formant and measurement point:
+#                 row (the token's row in the tokens table), parameter (F, B, A, P, T or FPr), formant,
+#                 x (1 for the first measurement point, as in long_format_formants), pct, t (seconds) and value
+# so reading some of the columns or phones only decompresses their blocks.
+# undefined measurements (--undefined--) are nan.
+
+DATASET_VERSION = 1
+MEASUREMENT_PATTERN = re.compile(r'^([FBAPT])(\d+)(Pr)?_(-?\d+)$')
+MEASUREMENT_COLUMNS = ['row', 'parameter', 'formant', 'x', 'pct', 't', 'value']
+UNDEFINED = ['--undefined--', '', 'NA']
+
+def measurement_columns(header):
+	# (header index, parameter, formant, pct) for each formant measurement column
+	columns = []
+	for c, name in enumerate(header):
+		m = MEASUREMENT_PATTERN.match(name)
+		if m:
+			columns.append((c, m.group(1) + (m.group(3) or ''), int(m.group(2)), int(m.group(4))))
+	return columns
+
+def to_floats(values):
+	# an array of strings as floats (nan for undefined values), or None if any of them isn't a number
+	values = np.asarray(values, dtype=str)
+	undefined = np.isin(values, UNDEFINED)
+	try:
+		return np.where(undefined, 'nan', values).astype(float)
+	except ValueError:
+		return None
+
+def pack(array, level):
+	buffer = io.BytesIO()
+	np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+	return zlib.compress(buffer.getvalue(), level)
+
+def unpack(data):
+	return np.load(io.BytesIO(zlib.decompress(data)), allow_pickle=False)
+
+class Converter:
+
+	# writes a dataset from the rows of a wide one_script output file, a chunk
+	# at a time: add_token() takes the csv rows of one token (one row, or one
+	# row for each candidate with formants(keep_all=1)), and flush() writes
+	# the tokens so far as one block per phone
+
+	def __init__(self, output_path, header, level=6, source=''):
+		self.path = output_path
+		self.header = header
+		self.level = level
+		self.source = source
+		self.measures = measurement_columns(header)
+		self.measure_index = [c for c, parameter, formant, pct in self.measures]
+		measured = set(self.measure_index)
+		self.token_index = [c for c in range(len(header)) if not c in measured]
+		self.token_columns = [header[c] for c in self.token_index] + ['candidate']
+		if 'speech_overlap' in header:
+			self.n_base = header.index('speech_overlap') + 1
+		elif 'right2' in header:
+			self.n_base = header.index('right2') + 1
+		else:
+			self.n_base = None
+		self.formant_start = header.index('total_formants') if 'total_formants' in header else None
+		self.phone_column = header.index('phone') if 'phone' in header else None
+		self.times = 'phonestart' in header and 'phoneend' in header
+
+		# the measurement point number of each measurement column, counting from 1 for each parameter and formant
+		self.x = np.zeros(len(self.measures), dtype=np.int16)
+		counts = {}
+		for i, (c, parameter, formant, pct) in enumerate(self.measures):
+			counts[(parameter, formant)] = counts.get((parameter, formant), 0) + 1
+			self.x[i] = counts[(parameter, formant)]
+
+		self.rows = []
+		self.candidates = []
+		self.blocks = []
+		self.n_tokens = 0
+		os.makedirs(output_path, exist_ok=True)
+		self.data = open(os.path.join(output_path, 'data.bin.' + str(os.getpid())), 'wb')
+
+	def align(self, rows):
+		# with keep_all=1, only the first candidate row of a token has the
+		# columns of the operations before formants(), the other rows start
+		# the formant columns right after the basic token information, and the
+		# last row has the columns of the operations after formants() (see
+		# best_only_row in select_formant_candidates.py). this puts every
+		# candidate's columns where the header says they are
+		first = rows[0]
+		if len(rows) == 1 or self.n_base == None or self.formant_start == None:
+			return [first + [''] * (len(self.header) - len(first))]
+		width = len(first) - self.formant_start
+		after = rows[-1][self.n_base+width:]
+		aligned = []
+		for i, row in enumerate(rows):
+			if i == 0:
+				full = first + after
+			else:
+				full = row[:self.n_base] + first[self.n_base:self.formant_start] + row[self.n_base:self.n_base+width] + after
+			aligned.append(full + [''] * (len(self.header) - len(full)))
+		return aligned
+
+	def add_token(self, rows):
+		aligned = self.align(rows)
+		self.rows += [row[:len(self.header)] for row in aligned]
+		self.candidates += list(range(len(aligned)))
+		self.n_tokens += 1
+
+	def pending(self):
+		return len(self.rows)
+
+	def write_column(self, array):
+		data = pack(array, self.level)
+		offset = self.data.tell()
+		self.data.write(data)
+		return [offset, len(data)]
+
+	def flush(self):
+		if self.rows == []:
+			return
+		table = np.array(self.rows, dtype=str)
+		candidates = np.array(self.candidates, dtype=np.int16)
+		self.rows = []
+		self.candidates = []
+		phones = table[:, self.phone_column] if self.phone_column != None else np.full(len(table), '', dtype=str)
+		values = to_floats(table[:, self.measure_index]) if self.measures != [] else np.zeros((len(table), 0))
+		if values is None:
+			# a column that looks like a measurement but has text in it: keep what is a number
+			values = np.array([[to_float(v) for v in row] for row in table[:, self.measure_index]], dtype=float)
+		if self.times:
+			phonestart = to_floats(table[:, self.header.index('phonestart')])
+			phoneend = to_floats(table[:, self.header.index('phoneend')])
+
+		parameters = np.array([parameter for c, parameter, formant, pct in self.measures], dtype=str)
+		formants = np.array([formant for c, parameter, formant, pct in self.measures], dtype=np.int8)
+		pcts = np.array([pct for c, parameter, formant, pct in self.measures], dtype=np.float32)
+
+		for phone in sorted(set(phones)):
+			rows = np.nonzero(phones == phone)[0]
+			block = {'phone': str(phone), 'tokens': {'rows': len(rows), 'columns': {}}, 'measurements': {'rows': len(rows) * len(self.measures), 'columns': {}}}
+			for name, c in zip(self.token_columns, self.token_index + [None]):
+				if c == None:
+					column = candidates[rows]
+				else:
+					column = to_floats(table[rows, c])
+					if column is None:
+						column = table[rows, c]
+				block['tokens']['columns'][name] = self.write_column(column)
+
+			n = len(self.measures)
+			long = {'row': np.repeat(np.arange(len(rows), dtype=np.int32), n), 'parameter': np.tile(parameters, len(rows)), 'formant': np.tile(formants, len(rows)),
+				'x': np.tile(self.x, len(rows)), 'pct': np.tile(pcts, len(rows)), 'value': values[rows].reshape(-1)}
+			if self.times:
+				start = np.repeat(phonestart[rows] if phonestart is not None else np.full(len(rows), np.nan), n)
+				end = np.repeat(phoneend[rows] if phoneend is not None else np.full(len(rows), np.nan), n)
+				long['t'] = start + long['pct'].astype(float) / 100 * (end - start)
+			for name in MEASUREMENT_COLUMNS:
+				if name in long:
+					block['measurements']['columns'][name] = self.write_column(long[name])
+			self.blocks.append(block)
+
+	def close(self):
+		self.flush()
+		self.data.close()
+		os.replace(os.path.join(self.path, 'data.bin.' + str(os.getpid())), os.path.join(self.path, 'data.bin'))
+		index = {'version': DATASET_VERSION, 'source': self.source, 'tokens': self.n_tokens,
+			'token_columns': self.token_columns, 'measurement_columns': [c for c in MEASUREMENT_COLUMNS if c != 't' or self.times], 'blocks': self.blocks}
+		temp_path = os.path.join(self.path, 'index.json.' + str(os.getpid()))
+		with open(temp_path, 'w') as f:
+			json.dump(index, f)
+		os.replace(temp_path, os.path.join(self.path, 'index.json'))
+
+def to_float(value):
+	if value in UNDEFINED:
+		return float('nan')
+	try:
+		return float(value)
+	except ValueError:
+		return float('nan')
+
+def convert(input_path, output_path, chunk_rows=5000, level=6):
+
+	# streams a wide one_script output file into a long-format dataset,
+	# holding at most about chunk_rows csv rows at a time (a token's
+	# candidate rows always go in the same chunk). returns the number of tokens
+	with open(input_path, newline='') as f:
+		reader = csv.reader(f)
+		header = next(reader)
+		converter = Converter(output_path, header, level, os.path.basename(input_path))
+		token_column = header.index('token_id') if 'token_id' in header else None
+		token_rows = []
+		last_token_id = None
+		for row in reader:
+			if row == []:
+				continue
+			token_id = row[token_column] if token_column != None and token_column < len(row) else None
+			if token_rows != [] and (token_id == None or token_id != last_token_id):
+				converter.add_token(token_rows)
+				token_rows = []
+				if converter.pending() >= chunk_rows:
+					converter.flush()
+			token_rows.append(row)
+			last_token_id = token_id
+		if token_rows != []:
+			converter.add_token(token_rows)
+		converter.close()
+	return converter.n_tokens
+
+class LongDataset:
+
+	def __init__(self, path):
+		self.path = path
+		with open(os.path.join(path, 'index.json')) as f:
+			self.index = json.load(f)
+		if self.index['version'] != DATASET_VERSION:
+			raise ValueError(path+' was made by a different version of long_format.py')
+		self.token_columns = self.index['token_columns']
+		self.measurement_columns = self.index['measurement_columns']
+		self.blocks = self.index['blocks']
+
+	def phones(self):
+		return sorted(set([block['phone'] for block in self.blocks]))
+
+	def read(self, columns=None, phones=None, table='measurements'):
+
+		# a dict of arrays with the given columns (default: all of them) for
+		# the given phones (default: all of them). with table='measurements',
+		# columns can also be token columns, which are repeated for each
+		# measurement of the token, and row is the token's row in what
+		# read(table='tokens') returns for the same phones. columns that are
+		# numbers in some blocks and text in others are returned as text
+		if table == 'tokens':
+			available = self.token_columns
+		else:
+			available = self.measurement_columns + self.token_columns
+		if columns == None:
+			columns = available
+		for name in columns:
+			if not name in available:
+				raise ValueError(self.path+' has no '+name+' column in its '+table+' table')
+		parts = {name: [] for name in columns}
+		with open(os.path.join(self.path, 'data.bin'), 'rb') as data:
+			def read_column(location):
+				data.seek(location[0])
+				return unpack(data.read(location[1]))
+			token_offset = 0
+			for block in self.blocks:
+				if phones != None and not block['phone'] in phones:
+					continue
+				token_row = None
+				for name in columns:
+					if name == 'row' and table == 'measurements':
+						parts[name].append(read_column(block[table]['columns'][name]) + token_offset)
+					elif table == 'tokens' or name in self.measurement_columns:
+						parts[name].append(read_column(block[table]['columns'][name]))
+					else:
+						if token_row is None:
+							token_row = read_column(block['measurements']['columns']['row'])
+						parts[name].append(read_column(block['tokens']['columns'][name])[token_row])
+				token_offset += block['tokens']['rows']
+		result = {}
+		for name in columns:
+			if any([p.dtype.kind == 'U' for p in parts[name]]):
+				parts[name] = [p if p.dtype.kind == 'U' else np.array([format_value(v) for v in p], dtype=str) for p in parts[name]]
+			result[name] = np.concatenate(parts[name]) if parts[name] != [] else np.zeros(0)
+		return result
+
+def format_value(value):
+	if np.isnan(value):
+		return '--undefined--'
+	return '%.15g' % value
@@ -1,84 +1,180 @@
-
 import argparse
 import os
+import praatmfc as MFC
+import textgrids as TG
+import wavfiles as WAV
 
 #PARSE ARGUMENTS
 parser = argparse.ArgumentParser(description='Make a praat script that will let you do MFC-like coding while looking at the editor')
 parser.add_argument('--timestamp', default='', help='the one_script timestamp')
+parser.add_argument('--max', default='[none listed]', help='the maximum number of clips in one session (like splitMFC.py)')
+parser.add_argument('--word', default='False', help='whether to make one session for each word (like splitMFC.py)')
+parser.add_argument('--gap', default=0.5, help='the silence between the clips in the session bundle (seconds)')
 args = parser.parse_args()
 
 #EXAMPLE
 # python /phon/scripts/make_editor_mfc.py --timestamp 2023Sep24_10h30m33
+# python /phon/scripts/make_editor_mfc.py --timestamp 2023Sep24_10h30m33 --max 200
+# (each session gets a bundle: one sound with all of its clips, a TextGrid with all of their tiers and a
+# stimulus tier, and a table of where each clip starts and ends. the editor opens the bundle once and
+# jumps from clip to clip. stimuli that are already in the results file are skipped, so if praat stops
+# you can run the session again to carry on where you left off.)
+
+max_per_session = None if args.max == '[none listed]' else int(args.max)
+gap = float(args.gap)
+
+def remove_bundle(bundle, bundle_name):
+	# an unfinished bundle is no use to anyone
+	bundle.file.close()
+	os.remove(bundle_name+'.wav')
+
+def write_bundle(bundle_name, clip_path, rows):
+
+	# lays the clips of each stimulus end to end with gap seconds of silence
+	# between them (a grouped stimulus plays all of its clips, so they go one
+	# after the other), and writes bundle_name.wav, .TextGrid and .tsv. each
+	# clip is copied into the bundle and closed before the next one is opened.
+	# rows can't be empty
+	bundle = None
+	tg_parts = []
+	stimulus_tier = TG.Tier('stimulus', 'IntervalTier', 0, 0)
+	index = []
+	n_samples = 0
+	for name, word in rows:
+		stimulus_start = None
+		for clip in name.split(','):
+			wav = WAV.WavFile(clip_path+clip+'.wav')
+			if bundle == None:
+				bundle = WAV.WavWriter(bundle_name+'.wav', wav.fmt_chunk)
+				sample_format = (wav.format, wav.channels, wav.rate, wav.bits)
+				rate = wav.rate
+				# 8-bit samples are unsigned, so their silence is 128
+				silence = (b'\x80' if wav.bits == 8 else b'\x00') * (wav.block_align * round(gap * rate))
+			elif (wav.format, wav.channels, wav.rate, wav.bits) != sample_format:
+				wav.close()
+				remove_bundle(bundle, bundle_name)
+				parser.error(clip_path+clip+'.wav does not have the same sampling rate and sample format as the other clips, so they cannot be bundled')
+			samples = wav.view[wav.data_offset : wav.data_offset + wav.n_samples*wav.block_align]
+			if not bundle.fits(len(silence) + len(samples)):
+				samples.release()
+				wav.close()
+				remove_bundle(bundle, bundle_name)
+				parser.error(bundle_name+'.wav would have more than 4 GB of samples, which a wav file cannot hold: use --max to make smaller sessions')
+			if n_samples > 0:
+				bundle.write(silence)
+				n_samples += len(silence) // wav.block_align
+			offset = n_samples / rate
+			if stimulus_start == None:
+				stimulus_start = offset
+			bundle.write(samples)
+			n_samples += wav.n_samples
+			duration = wav.duration
+			# the view has to be gone before the file is closed
+			samples.release()
+			wav.close()
+			if os.path.exists(clip_path+clip+'.TextGrid'):
+				tg_parts.append((offset, duration, TG.read_textgrid(clip_path+clip+'.TextGrid')))
+		stimulus_end = n_samples / rate
+		stimulus_tier.starts.append(stimulus_start)
+		stimulus_tier.ends.append(stimulus_end)
+		stimulus_tier.labels.append(name)
+		index.append((name, word, stimulus_start, stimulus_end))
+	bundle.close()
+
+	duration = n_samples / rate
+	TG.write_textgrid(bundle_name+'.TextGrid', TG.join_textgrids([(0, duration, [stimulus_tier])] + tg_parts, duration))
+	with open(bundle_name+'.tsv', 'w') as f:
+		f.write('stimulus\tword\tstart\tend\n')
+		for name, word, start, end in index:
+			f.write(name+'\t'+word+'\t'+TG.praat_number(start)+'\t'+TG.praat_number(end)+'\n')
+	return duration
 
 mfc_script_filenames = [i for i in os.listdir('./') if i.startswith('one_script_out_'+args.timestamp+'_MF') and i.endswith('.praat')]
 mfc_script_filenames.sort()
 
 for mfc_script_filename in mfc_script_filenames:
 
-	with open(mfc_script_filename) as f:
-		mfc_script_lines = f.readlines()
+	script = MFC.MFCScript(mfc_script_filename)
 
-	for i,line in enumerate(mfc_script_lines):
-		if line.startswith('numberOfDifferentResponses'):
-			first_button = i+1
-		if line.startswith('numberOfGoodnessCategories'):
-			non_button = i
+	buttons = ['"'+label+'"' for label in script.responses()]
 
-	buttons = []
-	for i in range(first_button, non_button):
-		buttons.append('"'+mfc_script_lines[i].split('"')[-2]+'"')
-
-	clip_path = mfc_script_lines[3].split('"')[1]
-	one_script_out_fn = 'one_script_out_'+args.timestamp+'.csv'
+	clip_path = script.header('stimulusFileNameHead').split('"')[1]
 	results_filename = 'editor_mfc_results_'+args.timestamp+'.csv'
 	dummy_subject = 'one_script_out_'+args.timestamp+'_MFC'
 
-	editor_mfc_script_filename = mfc_script_filename.replace('MFC', 'editor_mfc')
+	for suffix, rows in MFC.split_rows(script.rows(), max_per_session, args.word == 'True'):
+
+		editor_mfc_script_filename = mfc_script_filename.replace('MFC', 'editor_mfc')
+		if suffix != '':
+			editor_mfc_script_filename = editor_mfc_script_filename.replace('.praat', '_'+suffix+'.praat')
+		bundle_name = editor_mfc_script_filename.replace('.praat', '_bundle')
+		if rows == []:
+			print('skipped', editor_mfc_script_filename, 'because', mfc_script_filename, 'has no stimuli')
+			continue
+		duration = write_bundle(bundle_name, clip_path, rows)
 
-	with open(editor_mfc_script_filename, 'w') as f:
-		f.write('clip_path$ = "'+clip_path+'"\n')
-		f.write('one_script_out_path$ = "'+one_script_out_fn+'"\n')
-		f.write('results_filename$ = "'+results_filename+'"\n')
-		f.write('\n')
-		f.write('Read Table from comma-separated file: one_script_out_path$\n')
-		f.write('Rename: "one_script_out"\n')
-		f.write('n_wavs = Get number of rows\n')
-		f.write('\n')
-		f.write("filedelete 'results_filename$'\n")
-		f.write("fileappend 'results_filename$' subject,stimulus,response,notes'newline$'\n")
-		f.write('\n')
-		f.write('for i from 1 to n_wavs\n')
-		f.write('	selectObject: "Table one_script_out"\n')
-		f.write('	stimulus$ = Get value: i, "stimulus"\n')
-		f.write('	wav_filename$ = stimulus$ + ".wav"\n')
-		f.write('	tg_filename$ = stimulus$ + ".TextGrid"\n')
-		f.write('	Read from file: clip_path$+wav_filename$\n')
-		f.write('	Rename: "current_clip"\n')
-		f.write('	Read from file: clip_path$+tg_filename$\n')
-		f.write('	Rename: "current_clip"	\n')
-		f.write('\n')
-		f.write('	selectObject: "Sound current_clip"\n')
-		f.write('	clip_end = Get end time\n')
-		f.write('	plusObject: "TextGrid current_clip"\n')
-		f.write('	View & Edit\n')
-		f.write('\n')
-		f.write('	editor: "TextGrid current_clip"\n')
-		f.write('	Play: 0, clip_end\n')
-		f.write('\n')
-		f.write('	notes$ = ""\n')
-		f.write('	beginPause: "code token \'i\' of \'n_wavs\'"\n')
-		f.write('	sentence ("notes", notes$)\n')
-		f.write('	clicked = endPause: '+', '.join(buttons)+', '+str(len(buttons))+'\n')
-		f.write('\n')
-		f.write('	endeditor\n')
-		f.write('\n')
-		for i,b in enumerate(buttons):
-			f.write('	category'+str(i+1)+'$ = '+b+'\n')
-		f.write('\n')
-		f.write("	response$ = category'clicked'$\n")
-		f.write('\n')
-		f.write('	subject$ = "'+dummy_subject+'"\n')
-		f.write("	fileappend 'results_filename$' 'subject$','stimulus$','response$','notes$''newline$'\n")
-		f.write('	Remove\n')
-		f.write('endfor\n')
-		print('wrote', editor_mfc_script_filename)
+		with open(editor_mfc_script_filename, 'w') as f:
+			f.write('bundle$ = "'+bundle_name+'"\n')
+			f.write('results_filename$ = "'+results_filename+'"\n')
+			f.write('subject$ = "'+dummy_subject+'"\n')
+			f.write('\n')
+			f.write('Read Table from tab-separated file: bundle$+".tsv"\n')
+			f.write('Rename: "bundle_index"\n')
+			f.write('n_wavs = Get number of rows\n')
+			f.write('\n')
+			f.write('# read the whole session once, so there is nothing to wait for between tokens\n')
+			f.write('Read from file: bundle$+".wav"\n')
+			f.write('Rename: "bundle"\n')
+			f.write('Read from file: bundle$+".TextGrid"\n')
+			f.write('Rename: "bundle"\n')
+			f.write('\n')
+			f.write('# carry on where the last run stopped: skip the stimuli that are already in the results file\n')
+			f.write('if fileReadable(results_filename$)\n')
+			f.write('	results$ = readFile$(results_filename$)\n')
+			f.write('else\n')
+			f.write("	fileappend 'results_filename$' subject,stimulus,response,notes'newline$'\n")
+			f.write('	results$ = ""\n')
+			f.write('endif\n')
+			f.write('\n')
+			f.write('selectObject: "Sound bundle"\n')
+			f.write('plusObject: "TextGrid bundle"\n')
+			f.write('View & Edit\n')
+			f.write('\n')
+			f.write('for i from 1 to n_wavs\n')
+			f.write('	selectObject: "Table bundle_index"\n')
+			f.write('	stimulus$ = Get value: i, "stimulus"\n')
+			f.write('	clip_start = Get value: i, "start"\n')
+			f.write('	clip_end = Get value: i, "end"\n')
+			f.write('	if index(stimulus$, ",") > 0\n')
+			f.write('		stimulus_field$ = """" + stimulus$ + """"\n')
+			f.write('	else\n')
+			f.write('		stimulus_field$ = stimulus$\n')
+			f.write('	endif\n')
+			f.write('\n')
+			f.write('	if index(results$, newline$ + subject$ + "," + stimulus_field$ + ",") = 0\n')
+			f.write('		editor: "TextGrid bundle"\n')
+			f.write('		Zoom: clip_start, clip_end\n')
+			f.write('		Play: clip_start, clip_end\n')
+			f.write('\n')
+			f.write('		notes$ = ""\n')
+			f.write('		beginPause: "code token \'i\' of \'n_wavs\'"\n')
+			f.write('		sentence ("notes", notes$)\n')
+			f.write('		clicked = endPause: '+', '.join(buttons)+', '+str(len(buttons))+'\n')
+			f.write('\n')
+			f.write('		endeditor\n')
+			f.write('\n')
+			for i,b in enumerate(buttons):
+				f.write('		category'+str(i+1)+'$ = '+b+'\n')
+			f.write('\n')
+			f.write("		response$ = category'clicked'$\n")
+			f.write('		notes$ = replace$(notes$, ",", ";", 0)\n')
+			f.write('\n')
+			f.write("		fileappend 'results_filename$' 'subject$','stimulus_field$','response$','notes$''newline$'\n")
+			f.write('	endif\n')
+			f.write('endfor\n')
+			f.write('\n')
+			f.write('selectObject: "Sound bundle"\n')
+			f.write('plusObject: "TextGrid bundle"\n')
+			f.write('plusObject: "Table bundle_index"\n')
+			f.write('Remove\n')
+		print('wrote', editor_mfc_script_filename, 'and', bundle_name, '(.wav, .TextGrid, .tsv) with', len(rows), 'stimuli,', round(duration, 1), 'seconds')
@@ -0,0 +1,301 @@
+import hashlib, json, os, re, sqlite3, threading, time
+
+# a MeasurementCache is an sqlite database of one_script results, so that a
+# rerun with a changed operations string only measures what it doesn't have:
+#   audio        the sha256 of each wav or TextGrid file (re-hashed only if its size or modification time changes)
+#   recordings   the base columns of every token one_script found in a recording, keyed by
+#                the audio and TextGrid hashes, the file list row, phon_string, options, exclude and version
+#   results      the columns one operation wrote for one token (one row, or one row for each
+#                candidate with formants(keep_all=1)), keyed by the audio and TextGrid hashes,
+#                the file list row, the token's interval and base columns, the operation name,
+#                its normalized arguments and version (operations read other tiers and file
+#                list columns like gender, so a change to either means measuring again)
+#   headers      the columns each operation writes
+# every entry has its size and when it was last used, for evicting the least
+# recently used entries when the cache gets too big.
+#
+# the base columns are the first BASE_COLUMNS columns of one_script output
+# (speaker ... speech_overlap), which every operation follows.
+
+CACHE_VERSION = 2
+BASE_COLUMNS = 19
+
+# operations that write clips, TextGrids, matrices or MFC scripts as well as
+# columns: taking their columns from the cache would leave those files out
+FILE_OPERATIONS = ['clips', 'phone_clips', 'trigrams', 'mfc', 'mfcc']
+
+def split_operations(operations):
+	# the operations one_script runs, split the same way as parseOperations
+	if operations.strip() == '':
+		return []
+	parts = operations.split('),')
+	return [p.strip() + ('' if p.strip().endswith(')') else ')') for p in parts if p.strip() != '']
+
+def normalize_operation(operation):
+	# (name, arguments) with the arguments sorted, since one_script doesn't care about their order
+	if '(' in operation:
+		name, arg_string = operation.split('(', 1)
+	else:
+		name, arg_string = operation, ''
+	arg_string = arg_string.replace(')', '').replace(', ', ',')
+	args = sorted([a.strip() for a in arg_string.split(',') if a.strip() != ''])
+	return (name.strip(), ','.join(args))
+
+def writes_files(operations):
+	# whether one_script has to run the whole operations string to write its files
+	return any([normalize_operation(operation)[0] in FILE_OPERATIONS for operation in split_operations(operations)])
+
+def script_version(script_path):
+	# one_script_version$ from one_script.praat
+	with open(script_path, errors='replace') as f:
+		for line in f:
+			m = re.match(r'\s*one_script_version\$\s*=\s*"([^"]*)"', line)
+			if m:
+				return m.group(1)
+	return ''
+
+def digest(*parts):
+	return hashlib.sha256('\x1f'.join([str(p) for p in parts]).encode('utf-8')).hexdigest()
+
+def parse_size(size):
+	# 500M, 20G etc. as a number of bytes
+	size = str(size).strip().upper()
+	units = {'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+	if size[-1:] in units:
+		return int(float(size[:-1]) * units[size[-1]])
+	return int(float(size))
+
+class MeasurementCache:
+
+	def __init__(self, path):
+		self.path = path
+		os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+		# one connection shared by the threads of one_script_parallel.py
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(path, check_same_thread=False, timeout=60)
+		self.db.execute('PRAGMA journal_mode=WAL')
+		with self.lock, self.db:
+			self.db.execute('CREATE TABLE IF NOT EXISTS info (name TEXT PRIMARY KEY, value TEXT)')
+			self.db.execute('CREATE TABLE IF NOT EXISTS audio (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT)')
+			self.db.execute('CREATE TABLE IF NOT EXISTS recordings (key TEXT PRIMARY KEY, version TEXT, rows TEXT, size INTEGER, last_used REAL)')
+			self.db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, operation TEXT, args TEXT, version TEXT, rows TEXT, size INTEGER, last_used REAL)')
+			self.db.execute('CREATE TABLE IF NOT EXISTS headers (key TEXT PRIMARY KEY, operation TEXT, version TEXT, columns TEXT)')
+			self.db.execute('CREATE INDEX IF NOT EXISTS results_operation ON results (operation, version)')
+			self.db.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+			saved = self.db.execute("SELECT value FROM info WHERE name='version'").fetchone()
+			if saved != None and saved[0] != str(CACHE_VERSION):
+				# made by another version of this file: start again
+				for table in ['audio', 'recordings', 'results', 'headers']:
+					self.db.execute('DELETE FROM '+table)
+			self.db.execute("INSERT OR REPLACE INTO info VALUES ('version', ?)", (str(CACHE_VERSION),))
+
+	def close(self):
+		self.db.close()
+
+	def file_hash(self, path):
+		path = os.path.abspath(path)
+		stat = os.stat(path)
+		with self.lock:
+			saved = self.db.execute('SELECT size, mtime, hash FROM audio WHERE path=?', (path,)).fetchone()
+		if saved != None and saved[0] == stat.st_size and saved[1] == stat.st_mtime_ns:
+			return saved[2]
+		sha = hashlib.sha256()
+		with open(path, 'rb') as f:
+			for block in iter(lambda: f.read(2**20), b''):
+				sha.update(block)
+		with self.lock, self.db:
+			self.db.execute('INSERT OR REPLACE INTO audio VALUES (?, ?, ?, ?)', (path, stat.st_size, stat.st_mtime_ns, sha.hexdigest()))
+		return sha.hexdigest()
+
+	# RECORDINGS
+
+	def recording_key(self, wav_hash, textgrid_hash, file_list_row, query, version):
+		return digest(wav_hash, textgrid_hash, ','.join(file_list_row), query, version)
+
+	def get_tokens(self, key):
+		# the base columns of each token of a recording, or None
+		with self.lock, self.db:
+			saved = self.db.execute('SELECT rows FROM recordings WHERE key=?', (key,)).fetchone()
+			if saved == None:
+				return None
+			self.db.execute('UPDATE recordings SET last_used=? WHERE key=?', (time.time(), key))
+		return json.loads(saved[0])
+
+	def put_tokens(self, key, version, tokens):
+		rows = json.dumps(tokens)
+		with self.lock, self.db:
+			self.db.execute('INSERT OR REPLACE INTO recordings VALUES (?, ?, ?, ?, ?)', (key, version, rows, len(rows), time.time()))
+
+	# RESULTS
+
+	def result_key(self, wav_hash, textgrid_hash, file_list_row, base, operation, version):
+		# base is the token's base columns, which include its interval (phonestart, phoneend) and context
+		name, args = normalize_operation(operation)
+		return digest(wav_hash, textgrid_hash, ','.join(file_list_row), ','.join(base), name, args, version)
+
+	def get_results(self, keys):
+		# {key: rows} for the keys that are in the cache
+		found = {}
+		now = time.time()
+		with self.lock, self.db:
+			for first in range(0, len(keys), 500):
+				batch = keys[first:first+500]
+				marks = ','.join(['?'] * len(batch))
+				for key, rows in self.db.execute('SELECT key, rows FROM results WHERE key IN ('+marks+')', batch):
+					found[key] = json.loads(rows)
+				self.db.execute('UPDATE results SET last_used=? WHERE key IN ('+marks+')', [now] + batch)
+		return found
+
+	def put_results(self, entries, version):
+		# entries: (key, operation, rows)
+		now = time.time()
+		with self.lock, self.db:
+			for key, operation, rows in entries:
+				name, args = normalize_operation(operation)
+				text = json.dumps(rows)
+				self.db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)', (key, name, args, version, text, len(text), now))
+
+	# HEADERS
+
+	def get_header(self, operation, version):
+		name, args = normalize_operation(operation)
+		with self.lock:
+			saved = self.db.execute('SELECT columns FROM headers WHERE key=?', (digest(name, args, version),)).fetchone()
+		return None if saved == None else json.loads(saved[0])
+
+	def put_header(self, operation, version, columns):
+		name, args = normalize_operation(operation)
+		with self.lock, self.db:
+			self.db.execute('INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?)', (digest(name, args, version), name, version, json.dumps(columns)))
+
+	# HOUSEKEEPING
+
+	def size(self):
+		with self.lock:
+			return sum([self.db.execute('SELECT COALESCE(SUM(size), 0) FROM '+table).fetchone()[0] for table in ['recordings', 'results']])
+
+	def summary(self):
+		# (operation, arguments, version, entries, bytes) for each kind of result
+		with self.lock:
+			return self.db.execute('SELECT operation, args, version, COUNT(*), SUM(size) FROM results GROUP BY operation, args, version ORDER BY operation, args, version').fetchall()
+
+	def invalidate(self, operation=None, version=None):
+		# removes the results of an operation (by name, or name(arguments) for
+		# just those arguments) and/or a one_script version, and returns how many were removed
+		conditions = []
+		values = []
+		if operation != None:
+			if '(' in operation:
+				name, args = normalize_operation(operation)
+				conditions.append('operation=? AND args=?')
+				values += [name, args]
+			else:
+				conditions.append('operation=?')
+				values.append(operation)
+		if version != None:
+			conditions.append('version=?')
+			values.append(version)
+		if conditions == []:
+			return 0
+		where = ' AND '.join(conditions)
+		with self.lock, self.db:
+			removed = self.db.execute('DELETE FROM results WHERE '+where, values).rowcount
+			if operation == None:
+				removed += self.db.execute('DELETE FROM recordings WHERE version=?', (version,)).rowcount
+			# the columns of an operation might have changed too (headers are kept by operation name)
+			header_conditions = []
+			header_values = []
+			if operation != None:
+				header_conditions.append('operation=?')
+				header_values.append(normalize_operation(operation)[0])
+			if version != None:
+				header_conditions.append('version=?')
+				header_values.append(version)
+			self.db.execute('DELETE FROM headers WHERE '+' AND '.join(header_conditions), header_values)
+		return removed
+
+	def evict(self, max_bytes):
+		# removes the least recently used entries until the cache is at most max_bytes, and returns how many were removed
+		total = self.size()
+		removed = 0
+		with self.lock, self.db:
+			while total > max_bytes:
+				oldest = []
+				for table in ['results', 'recordings']:
+					oldest += [(last_used, table, key, size) for key, size, last_used in self.db.execute('SELECT key, size, last_used FROM '+table+' ORDER BY last_used LIMIT 1000')]
+				if oldest == []:
+					break
+				for last_used, table, key, size in sorted(oldest)[:1000]:
+					self.db.execute('DELETE FROM '+table+' WHERE key=?', (key,))
+					total -= size
+					removed += 1
+					if total <= max_bytes:
+						break
+		with self.lock:
+			self.db.execute('VACUUM')
+		return removed
+
+# SPLITTING AND JOINING ONE_SCRIPT ROWS
+
+def token_groups(rows):
+	# the rows of one_script output grouped by token (with formants(keep_all=1), a token has a row for each candidate)
+	groups = []
+	last_token_id = None
+	for row in rows:
+		token_id = row[5] if len(row) > 5 else None
+		if groups == [] or token_id != last_token_id:
+			groups.append([])
+		groups[-1].append(row)
+		last_token_id = token_id
+	return groups
+
+def split_token(rows, widths):
+
+	# the base columns and each operation's rows for the rows of one token.
+	# a token with more than one row has one operation with a row for each
+	# candidate: its first row comes after the columns of the operations
+	# before it, its other rows come right after the base columns, and the
+	# columns of the operations after it are at the end of the last row
+	base = rows[0][:BASE_COLUMNS]
+	if len(rows) == 1:
+		if len(rows[0]) != BASE_COLUMNS + sum(widths):
+			return (base, None)
+		segments = []
+		start = BASE_COLUMNS
+		for width in widths:
+			segments.append([rows[0][start:start+width]])
+			start += width
+		return (base, segments)
+	first_width = len(rows[0]) - BASE_COLUMNS
+	m = 0
+	while m < len(widths) and sum(widths[:m+1]) < first_width:
+		m += 1
+	if m == len(widths) or sum(widths[:m+1]) != first_width:
+		return (base, None)
+	segments = []
+	start = BASE_COLUMNS
+	for width in widths[:m]:
+		segments.append([rows[0][start:start+width]])
+		start += width
+	segments.append([rows[0][start:start+widths[m]]] + [row[BASE_COLUMNS:BASE_COLUMNS+widths[m]] for row in rows[1:]])
+	start = BASE_COLUMNS + widths[m]
+	for width in widths[m+1:]:
+		segments.append([rows[-1][start:start+width]])
+		start += width
+	return (base, segments)
+
+def join_token(base, segments):
+	# the rows one_script would write for a token, from its base columns and
+	# each operation's rows (None if more than one operation has several rows)
+	multi = [i for i, s in enumerate(segments) if len(s) > 1]
+	if len(multi) > 1:
+		return None
+	if multi == []:
+		return [base + [v for s in segments for v in s[0]]]
+	m = multi[0]
+	before = [v for s in segments[:m] for v in s[0]]
+	after = [v for s in segments[m+1:] for v in s[0]]
+	rows = [base + before + segments[m][0]]
+	for i, row in enumerate(segments[m][1:]):
+		rows.append(base + row + (after if i == len(segments[m]) - 2 else []))
+	return rows
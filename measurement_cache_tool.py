@@ -0,0 +1,33 @@
+import argparse, os
+import measurement_cache as MC
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='List, invalidate or shrink a one_script measurement cache made by one_script_parallel.py --cache')
+parser.add_argument('cache', help='the cache file')
+parser.add_argument('--operation', default='[none listed]', help='remove the results of this operation (e.g. formants, or formants(keep_all=1) for just those arguments)')
+parser.add_argument('--version', default='[none listed]', help='remove the results of this one_script version (e.g. 29)')
+parser.add_argument('--max_size', default='[none listed]', help='remove the least recently used results until the cache is at most this big (e.g. 500M or 20G)')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/measurement_cache_tool.py /phon/one_script_cache.sqlite
+# python /phon/scripts/measurement_cache_tool.py /phon/one_script_cache.sqlite --operation formants
+# (after changing the formants procedure without changing one_script_version$)
+
+if not os.path.exists(args.cache):
+	parser.error(args.cache+' does not exist')
+cache = MC.MeasurementCache(args.cache)
+
+print('\n########################################')
+if args.operation != '[none listed]' or args.version != '[none listed]':
+	operation = None if args.operation == '[none listed]' else args.operation
+	version = None if args.version == '[none listed]' else args.version
+	print('removed', cache.invalidate(operation, version), 'entries')
+if args.max_size != '[none listed]':
+	print('removed', cache.evict(MC.parse_size(args.max_size)), 'least recently used entries')
+
+for operation, arguments, version, entries, size in cache.summary():
+	print(operation+'('+arguments+')', 'version', version+':', entries, 'tokens,', round(size/2**20, 1), 'MB')
+print('total:', round(cache.size()/2**20, 1), 'MB')
+print('########################################\n')
+cache.close()
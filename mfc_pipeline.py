@@ -0,0 +1,93 @@
+import argparse, glob, os
+import praatmfc as MFC
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Prepare listening sessions from Praat MFC scripts in one run: select clips by response, group them, shuffle them and split them, writing only the final scripts')
+parser.add_argument('--mfc', default='[none listed]', help='path to your MFC scripts (can be a pattern like DFD469_*.praat)')
+parser.add_argument('--stages', default='shuffle,split', help='the stages to run, in order: any of filter, group, shuffle, split')
+parser.add_argument('--csv', default='[none listed]', help='filter: path to your MFC responses (can be a pattern)')
+parser.add_argument('--response', default='[none listed]', help='filter: the response to look for (or a comma-separated list)')
+parser.add_argument('--raters', default='[none listed]', help='filter: comma-separated rater names to look for in the response filenames or subject column (default: all raters)')
+parser.add_argument('--isi', default=0.25, help='group: the silence between the clips of a group (seconds)')
+parser.add_argument('--seed', default='[none listed]', help='shuffle: a random seed, to get the same order every time')
+parser.add_argument('--max', default='[none listed]', help='split: the maximum number of clips in one session')
+parser.add_argument('--word', default='False', help='split: whether to split by word')
+parser.add_argument('--output', default='[none listed]', help='the name of the output script, which gets suffixes like _1_of_3 when it is split')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/mfc_pipeline.py --mfc 'DFD469_*.praat' --stages filter,group,shuffle,split --csv '../responses/*.csv' --response NA --raters Jeff --seed 1 --max 200 --output DFD469_Jeff_NA.praat
+
+stages = args.stages.split(',')
+for stage in stages:
+	if not stage in ['filter', 'group', 'shuffle', 'split']:
+		parser.error('unknown stage '+stage+' (the stages are filter, group, shuffle and split)')
+
+mfc_filelist = sorted(glob.glob(args.mfc))
+if mfc_filelist == []:
+	parser.error('no MFC scripts match '+args.mfc)
+
+if args.output == '[none listed]':
+	output_basename = os.path.commonprefix([os.path.basename(p) for p in mfc_filelist]).replace('.praat', '').rstrip('_')+'_'+'_'.join(stages)
+else:
+	output_basename = args.output.replace('.praat', '')
+
+print('\n########################################')
+print('Preparing', ', '.join(mfc_filelist), 'with stages:', ' > '.join(stages))
+print('########################################')
+
+# READ EVERY MFC SCRIPT ONCE INTO ONE TABLE (A CLIP THAT IS IN MORE THAN ONE SCRIPT IS KEPT ONCE)
+stimuli = MFC.MFCScript()
+for filepath in mfc_filelist:
+	stimuli.read(filepath, unique=True)
+top_of_script = stimuli.top
+bottom_of_script = stimuli.bottom
+
+def selected_stimuli():
+	# marks the clips that got one of the responses (from one of the raters)
+	raters = [] if args.raters == '[none listed]' else args.raters.split(',')
+	responses = args.response.split(',')
+	selected = bytearray(len(stimuli))
+	for filepath in sorted(glob.glob(args.csv)):
+		for subject, stimulus, response, reactionTime in MFC.read_responses(filepath):
+			if raters != [] and not any([r in os.path.basename(filepath) or r == subject for r in raters]):
+				continue
+			if response in responses:
+				for i in stimuli.lookup(stimulus):
+					selected[i] = 1
+	print('...', sum(selected), 'clips got the response', args.response, 'in', args.csv)
+	return selected
+
+# CHAIN THE STAGES
+# (filter looks for single clip names, so it has to come before group, which
+# joins the clip names of a word with commas)
+if any([stage == 'filter' and 'group' in stages[:i] for i, stage in enumerate(stages)]):
+	parser.error('filter has to come before group')
+rows = stimuli.rows()
+outputs = None
+for stage in stages:
+	if outputs != None:
+		parser.error('split has to be the last stage')
+	if stage == 'filter':
+		if args.csv == '[none listed]' or args.response == '[none listed]':
+			parser.error('the filter stage needs --csv and --response')
+		rows = MFC.select_rows(rows, stimuli, selected_stimuli())
+	elif stage == 'group':
+		rows = MFC.group_rows(rows)
+		top_of_script = MFC.with_header(top_of_script, 'stimulusMedialSilenceDuration', str(args.isi)+' seconds')
+	elif stage == 'shuffle':
+		rows = MFC.shuffle_rows(rows, None if args.seed == '[none listed]' else int(args.seed))
+	elif stage == 'split':
+		outputs = MFC.split_rows(rows, None if args.max == '[none listed]' else int(args.max), args.word == 'True')
+
+if outputs == None:
+	outputs = [('', list(rows))]
+
+for suffix, output_rows in outputs:
+	if suffix == '':
+		output_name = output_basename + '.praat'
+	else:
+		output_name = output_basename + '_' + suffix + '.praat'
+	MFC.writestimuli(output_name, top_of_script, bottom_of_script, len(output_rows), output_rows)
+
+print('########################################\n')
@@ -0,0 +1,89 @@
+import argparse, csv, glob, os, time
+import numpy as np
+import responses as R
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Collect MFC response files from all raters in one store and report consensus, confusion matrices, kappas and reaction times')
+parser.add_argument('--csv', default='[none listed]', help='path to your MFC responses (can be a pattern like ../responses/*.csv)')
+parser.add_argument('--store', default='mfc_responses.npz', help='the response store to add the files to (it is made if it does not exist)')
+parser.add_argument('--raters', default='[none listed]', help='comma-separated rater names to look for in the response filenames (otherwise raters come from the subject column)')
+parser.add_argument('--output', default='mfc_responses', help='the beginning of the report filenames')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/mfc_responses.py --csv '../responses/*.csv' --raters Jeff,Griffin,Quynh,Ayumi
+# (run it again after the next labeling round: only new or changed response files are read)
+
+start_time = time.time()
+
+if args.raters == '[none listed]':
+	raters = []
+else:
+	raters = args.raters.split(',')
+
+def find_rater(filepath):
+	for rater in raters:
+		if rater in os.path.basename(filepath):
+			return rater
+	return None
+
+store = R.ResponseStore(args.store)
+
+print('\n########################################')
+added_files = 0
+added_rows = 0
+if args.csv != '[none listed]':
+	for filepath in sorted(glob.glob(args.csv)):
+		rater = find_rater(filepath)
+		if raters != [] and rater == None:
+			print('...skipping', filepath, 'because it has none of the rater names in it')
+			continue
+		rows = store.ingest(filepath, rater)
+		if rows != None:
+			added_files += 1
+			added_rows += rows
+	if added_files > 0:
+		store.save()
+print('added', added_rows, 'responses from', added_files, 'new or changed files to', args.store)
+print(args.store, 'has', len(store), 'responses to', len(store.stimuli), 'stimuli from', len(store.raters), 'raters')
+
+# CONSENSUS
+ratings = store.ratings()
+counts = store.counts(ratings)
+best, share, n = store.consensus(counts)
+with open(args.output+'_consensus.csv', 'w', newline='') as f:
+	writer = csv.writer(f, lineterminator='\n')
+	writer.writerow(['stimulus', 'consensus', 'agreement', 'raters'] + store.responses)
+	for s, stimulus in enumerate(store.stimuli):
+		writer.writerow([stimulus, store.responses[best[s]] if best[s] >= 0 else '', '%.3f' % share[s] if n[s] > 0 else '', n[s]] + list(counts[s]))
+
+# CONFUSION MATRICES AGAINST THE CONSENSUS
+with open(args.output+'_confusion.csv', 'w', newline='') as f:
+	writer = csv.writer(f, lineterminator='\n')
+	writer.writerow(['rater', 'consensus', 'response', 'count'])
+	for r, rater in enumerate(store.raters):
+		matrix = store.confusion(r, best, ratings)
+		for i, j in zip(*np.nonzero(matrix)):
+			writer.writerow([rater, store.responses[i], store.responses[j], matrix[i, j]])
+
+# AGREEMENT
+kappa, shared = store.cohen_kappa(ratings)
+with open(args.output+'_kappa.csv', 'w', newline='') as f:
+	writer = csv.writer(f, lineterminator='\n')
+	writer.writerow(['rater1', 'rater2', 'stimuli', 'kappa'])
+	for a in range(len(store.raters)):
+		for b in range(a+1, len(store.raters)):
+			writer.writerow([store.raters[a], store.raters[b], shared[a, b], '%.3f' % kappa[a, b] if shared[a, b] > 0 else ''])
+
+# REACTION TIMES
+with open(args.output+'_reaction_times.csv', 'w', newline='') as f:
+	writer = csv.writer(f, lineterminator='\n')
+	writer.writerow(['by', 'label', 'n', 'mean', 'median', 'sd', 'p10', 'p90'])
+	for by in ['rater', 'response']:
+		for row in store.reaction_times(by):
+			writer.writerow([by, row[0], row[1]] + ['%.3f' % x if not np.isnan(x) else '' for x in row[2:]])
+
+print('Fleiss kappa:', round(store.fleiss_kappa(counts), 3), 'over', int((n >= 2).sum()), 'stimuli with two or more raters')
+print(int((best < 0).sum() - (n == 0).sum()), 'stimuli have a tie for the most common response')
+print('wrote', ', '.join([args.output+'_'+s+'.csv' for s in ['consensus', 'confusion', 'kappa', 'reaction_times']]), 'in', round(time.time()-start_time, 2), 'seconds')
+print('########################################\n')
@@ -0,0 +1,119 @@
+import argparse, csv, math, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import spectra as SP
+import textgrids as TG
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Compute the MFCCs of the mfcc() operation of one_script for every token in a match list, with batches of FFTs for all of the frames of a recording, and write them to one binary array and an index instead of a text file per clip')
+parser.add_argument('--matches', default='[none listed]', help='a match list made by textgrid_matches.py')
+parser.add_argument('--operation', default='mfcc()', help='mfcc(...), with the same arguments as in one_script')
+parser.add_argument('--jobs', default=os.cpu_count(), help='how many recordings to process at the same time')
+parser.add_argument('--output', default='', help='what to call the output directory')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/mfcc_features.py --matches one_script_matches_2024Jun12_10h30m33.csv --operation 'mfcc(coefficients=12,pad=0.05)'
+# (this makes mfcc_<datestamp>/mfcc.npy, a float32 array of tokens x frames x coefficients that
+# numpy.load(..., mmap_mode='r') reads without loading it, with nan after the last frame of each token,
+# and mfcc_<datestamp>/index.csv, with a row for each token: the columns of one_script's mfcc() output and
+# the number of frames, the time of the first frame and the time step. token i, frame j, coefficient k is
+# row k of the clip's .txt file from one_script, column j, at first_frame + (j-1) * time_step seconds.
+# the clips and clip TextGrids are not written: extract_clips.py does that.)
+
+start_time = time.time()
+jobs = int(args.jobs)
+
+operation, s = SP.settings(args.operation)
+if operation != 'mfcc':
+	parser.error('the operation should be mfcc()')
+band = (s['filter_low'], s['filter_high'], 100) if s['filtering'] else None
+
+if args.output == '':
+	output_path = 'mfcc_'+time.strftime('%Y%b%d_%Hh%Mm%S')
+else:
+	output_path = args.output
+
+def praat_round(x):
+	return math.floor(1000*x + 0.5)/1000
+
+def clip_name(match, clip_start):
+	# the stimulus name the mfcc procedure gives the clip
+	timestring = SP.praat_double(clip_start).replace('.', '_')
+	if clip_start == round(clip_start):
+		timestring = timestring+'_0'
+	word_for_filename = match['word']
+	if s['sanitize'] == 1:
+		for character in ['{', '}', '<', '>', '[', ']', ' ']:
+			word_for_filename = word_for_filename.replace(character, '')
+	return match['sound']+'_'+timestring+'_'+word_for_filename
+
+with open(args.matches, newline='') as f:
+	matches = list(csv.DictReader(f))
+clip_starts = np.array([praat_round(float(match['word_start']) - s['pad']) for match in matches])
+clip_ends = np.array([praat_round(float(match['word_end']) + s['pad']) for match in matches])
+
+# GROUP THE TOKENS BY RECORDING, AND FIND OUT HOW MANY FRAMES AND COEFFICIENTS EACH ONE WILL HAVE
+# (the tokens of a recording that can't be read have no frames)
+recordings = []
+for n, match in enumerate(matches):
+	if recordings == [] or recordings[-1][0] != match['wav_file']:
+		recordings.append((match['wav_file'], []))
+	recordings[-1][1].append(n)
+
+frames = np.zeros(len(matches), dtype=np.int64)
+first_times = np.full(len(matches), np.nan)
+n_coefficients = 0
+unreadable = []
+for wav_path, tokens in recordings:
+	try:
+		recording = SP.Recording(wav_path)
+	except (OSError, ValueError) as e:
+		print('... could not read', wav_path+':', e)
+		unreadable.append((wav_path, tokens))
+		continue
+	first, n = recording.sample_ranges(clip_starts[tokens], clip_ends[tokens])
+	frames[tokens], first_times[tokens] = SP.mfcc_frames(recording.rate, first, n, s['window'], s['step'])
+	n_filters = SP.mel_filters(recording.rate, s['first_melfilter'], s['between_melfilters'], s['max_melfilter'])[2]
+	n_coefficients = max(n_coefficients, n_filters - 1 if s['coefficients'] <= 0 else min(int(s['coefficients']), n_filters - 1))
+	recording.close()
+recordings = [r for r in recordings if not r in unreadable]
+
+def measure(recording):
+	wav_path, tokens = recording
+	sound = SP.Recording(wav_path)
+	first_times, cepstra = sound.mfcc(clip_starts[tokens], clip_ends[tokens], s['coefficients'], s['window'], s['step'], s['first_melfilter'], s['between_melfilters'], s['max_melfilter'], band)
+	sound.close()
+	return (tokens, [c.astype(np.float32) for c in cepstra])
+
+print('\n########################################')
+print('Computing the MFCCs of', len(matches), 'tokens in', len(recordings), 'recordings with', jobs, 'processes')
+os.makedirs(output_path, exist_ok=True)
+array_path = os.path.join(output_path, 'mfcc.npy')
+features = np.lib.format.open_memmap(array_path+'.'+str(os.getpid()), mode='w+', dtype=np.float32, shape=(len(matches), int(frames.max(initial=0)), n_coefficients))
+features[:] = np.nan
+# forked, so the workers don't run this script again
+if 'fork' in multiprocessing.get_all_start_methods():
+	pool = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'))
+else:
+	pool = ThreadPoolExecutor(max_workers=jobs)
+with pool:
+	for tokens, cepstra in pool.map(measure, recordings):
+		for n, c in zip(tokens, cepstra):
+			features[n, :c.shape[0], :c.shape[1]] = c
+features.flush()
+del features
+os.replace(array_path+'.'+str(os.getpid()), array_path)
+
+with open(os.path.join(output_path, 'index.csv'), 'w') as out:
+	out.write(','.join(TG.MATCH_HEADER+['clip_start', 'clip_end', 'stimulus', 'frames', 'first_frame', 'time_step'])+'\n')
+	for n, match in enumerate(matches):
+		fields = [match[column] for column in TG.MATCH_HEADER]
+		fields += [SP.praat_double(clip_starts[n]), SP.praat_double(clip_ends[n]), clip_name(match, clip_starts[n])]
+		fields += [str(frames[n]), SP.praat_double(first_times[n]), SP.praat_double(s['step'])]
+		out.write(','.join(fields)+'\n')
+
+if unreadable != []:
+	print('...', sum([len(tokens) for wav_path, tokens in unreadable]), 'tokens in', len(unreadable), 'recordings that could not be read have 0 frames')
+print('wrote', array_path, '('+str(len(matches)), 'tokens x', int(frames.max(initial=0)), 'frames x', n_coefficients, 'coefficients) and', os.path.join(output_path, 'index.csv'), 'in', round(time.time()-start_time, 2), 'seconds')
+print('########################################\n')
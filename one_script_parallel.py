@@ -0,0 +1,395 @@
+import argparse, csv, json, os, subprocess, threading, time, wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import measurement_cache as MC
+import spectra as SP
+import textgrids as TG
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Run one_script on a csv file list with several Praat processes at once, and pick up where an interrupted run stopped')
+parser.add_argument('file_list', help='the csv file list (speaker,wav,textgrid,...)')
+parser.add_argument('phon_string', help='the phon_string, e.g. S/AW1/TH')
+parser.add_argument('operations', help='the operations, e.g. formants(),duration()')
+parser.add_argument('options', nargs='?', default='', help='the one_script options')
+parser.add_argument('exclude', nargs='?', default='', help='the words to exclude')
+parser.add_argument('--jobs', default=os.cpu_count(), help='how many Praat processes to run at once')
+parser.add_argument('--praat', default='praat', help='the Praat executable')
+parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'one_script.praat'), help='the one_script to run')
+parser.add_argument('--workdir', default='', help='where to keep per-recording results and the checkpoint manifest (reuse it to resume)')
+parser.add_argument('--cache', default='[none listed]', help='a measurement cache file (e.g. one_script_cache.sqlite) to take the results of earlier runs from and add this run\'s results to')
+parser.add_argument('--cache_size', default='[none listed]', help='the most the cache can hold (e.g. 500M or 20G): the least recently used results are removed after the run')
+parser.add_argument('--spectra', default='praat', help='praat, or python to measure cog, cogs, cog_pro, band_energy, band_energy_diff, spec_window and moments with spectra.py instead of Praat')
+parser.add_argument('--tapers', default=1, help='with --spectra python, how many sine tapers to average the spectrum of each window over (1 is the window shape of the procedure, as in Praat)')
+parser.add_argument('--profile', default='False', help='True to have one_script write timing events for each file, token and operation (the t option), merged into one_script_profile_<datestamp>.jsonl for one_script_profile.py')
+args = parser.parse_args()
+if not args.spectra in ['praat', 'python']:
+	parser.error('--spectra is praat or python')
+
+#EXAMPLE
+# python /phon/scripts/one_script_parallel.py /phon/Buckeye/buckeye_files.csv 'HH/AA1/COR' 'formants(),duration()' --jobs 60
+# (run the same command again after an interruption and only the unfinished recordings are processed)
+# python /phon/scripts/one_script_parallel.py /phon/Buckeye/buckeye_files.csv 'HH/AA1/COR' 'formants(),duration(),cog()' --jobs 60 --cache /phon/one_script_cache.sqlite
+# (with a cache, each token's results are kept for each operation, so adding cog() to an earlier query only
+# runs cog(), and changing the arguments of one operation only runs that operation again. queries with
+# clips(), phone_clips(), trigrams(), mfc() or mfcc() always run one_script, since they write files too)
+# python /phon/scripts/one_script_parallel.py /phon/Buckeye/buckeye_files.csv 'S/SH' 'duration(),cog(),moments()' --jobs 60 --spectra python
+# (cog() and moments() are measured with batches of FFTs in Python, and only duration() is left to Praat. with
+# only spectral operations, Praat isn't run at all: the tokens come from the TextGrids, as in textgrid_matches.py)
+# python /phon/scripts/one_script_parallel.py /phon/Buckeye/buckeye_files.csv 'HH/AA1/COR' 'formants(),duration()' --jobs 60 --profile True
+# (then python /phon/scripts/one_script_profile.py one_script_profile_<datestamp>.jsonl shows where the time went)
+
+jobs = int(args.jobs)
+file_list = os.path.abspath(args.file_list)
+script = os.path.abspath(args.script)
+praat = args.praat
+if os.sep in praat:
+	praat = os.path.abspath(praat)
+
+if args.workdir == '':
+	workdir = os.path.abspath('one_script_parallel_'+os.path.basename(file_list).replace('.csv', ''))
+else:
+	workdir = os.path.abspath(args.workdir)
+
+manifest_path = os.path.join(workdir, 'manifest.csv')
+query_path = os.path.join(workdir, 'query.txt')
+manifest_header = ['row', 'wav', 'textgrid', 'outfile', 'logfile', 'seconds']
+
+query = '\n'.join([file_list, args.phon_string, args.operations, args.options, args.exclude, script])+'\n'
+if args.spectra == 'python':
+	query += 'spectra: python, tapers: '+str(args.tapers)+'\n'
+tapers = int(args.tapers)
+
+# profiling doesn't change the results, so it isn't part of the query
+profiling = args.profile == 'True'
+praat_options = args.options
+if profiling and not 't' in praat_options:
+	praat_options += 't'
+
+def audio_duration(wav_path):
+	# used only to balance the work, so a rough answer is fine
+	try:
+		with wave.open(wav_path) as w:
+			return w.getnframes() / w.getframerate()
+	except (wave.Error, EOFError):
+		return os.path.getsize(wav_path) / 88200
+	except OSError:
+		return 0
+
+def read_manifest():
+	done = {}
+	if os.path.exists(manifest_path):
+		with open(manifest_path, newline='') as f:
+			for entry in csv.DictReader(f):
+				if os.path.exists(entry['outfile']):
+					done[int(entry['row'])] = entry
+	return done
+
+def run_one_script(row_dir, header, values, operations):
+	# each recording gets its own directory and a one-row file list, because
+	# one_script writes its output and log to the directory it is run from
+	os.makedirs(row_dir, exist_ok=True)
+	for old in os.listdir(row_dir):
+		if old.startswith('one_script_out_') or old.startswith('one_script_log_') or old.startswith('one_script_profile_'):
+			os.remove(os.path.join(row_dir, old))
+
+	row_list = os.path.join(row_dir, 'file_list.csv')
+	with open(row_list, 'w', newline='') as f:
+		writer = csv.writer(f, lineterminator='\n')
+		writer.writerow(header)
+		if values != None:
+			writer.writerow(values)
+
+	with open(os.path.join(row_dir, 'praat_output.txt'), 'w') as praat_output:
+		returncode = subprocess.call([praat, '--run', script, row_list, args.phon_string, operations, praat_options, args.exclude], cwd=row_dir, stdout=praat_output, stderr=subprocess.STDOUT)
+
+	outfiles = [os.path.join(row_dir, i) for i in os.listdir(row_dir) if i.startswith('one_script_out_') and i.endswith('.csv')]
+	logfiles = [os.path.join(row_dir, i) for i in os.listdir(row_dir) if i.startswith('one_script_log_') and i.endswith('.txt')]
+	outfile = outfiles[0] if len(outfiles) == 1 else None
+	logfile = logfiles[0] if len(logfiles) == 1 else ''
+	return (returncode, outfile, logfile)
+
+def read_rows(path):
+	# one_script output as lists of fields (one_script doesn't quote anything)
+	with open(path) as f:
+		return [line.rstrip('\r\n').split(',') for line in f]
+
+def operation_header(operation):
+	# the columns an operation writes (or the base columns, for ''), from a
+	# run of one_script on an empty file list (which only writes the header)
+	with header_lock:
+		if not operation in headers and cache != None:
+			columns = cache.get_header(operation, version)
+			if columns != None:
+				headers[operation] = columns
+		if not operation in headers:
+			returncode, outfile, logfile = run_one_script(os.path.join(workdir, 'headers'), header, None, operation)
+			if outfile == None:
+				return None
+			columns = read_rows(outfile)[0]
+			headers[''] = columns[:MC.BASE_COLUMNS]
+			headers[operation] = columns[MC.BASE_COLUMNS:] if operation != '' else headers['']
+			if cache != None:
+				cache.put_header('', version, headers[''])
+				cache.put_header(operation, version, headers[operation])
+	return headers[operation]
+
+def measure_spectra(values, tokens, operations):
+	# the rows each spectral operation writes for each token, measured with
+	# spectra.py. the times come from the TextGrid, since one_script's output
+	# only has them to the millisecond (None if its tokens aren't the ones
+	# the TextGrid index finds)
+	index = TG.TextGridIndex()
+	index.update([values[header.index('textgrid')]])
+	matches = list(index.matches(spectra_query, [dict(zip(header, values))]))
+	if tokens == None:
+		tokens = [[match[c] for c in TG.MATCH_HEADER] for match in matches]
+	elif [base[5] for base in tokens] != [match['token_id'] for match in matches]:
+		return None
+	try:
+		recording = SP.Recording(values[header.index('wav')])
+	except (OSError, ValueError):
+		# left to one_script, to report
+		return None
+	times = SP.token_times(matches)
+	results = []
+	seconds = []
+	for operation in operations:
+		start = time.time()
+		results.append([[fields] for fields in SP.measure_operation(recording, times, operation, tapers)])
+		seconds.append(time.time() - start)
+	recording.close()
+	return (tokens, results, seconds)
+
+def run_split(row_dir, values):
+
+	# measures the operations separately: takes each token's results for each
+	# operation from the cache, measures the spectral operations with
+	# spectra.py (with --spectra python), and runs one_script with just the
+	# operations that are left (or all of them, for a recording that isn't in
+	# the cache), adding its results to the cache. returns the output and
+	# log files, or None if this recording can't be split up by operation
+	operations = MC.split_operations(args.operations)
+	in_python = [args.spectra == 'python' and SP.supports(operation) for operation in operations]
+	in_praat = [i for i in range(len(operations)) if not in_python[i]]
+	headers = [SP.operation_columns(operation) if python else operation_header(operation) for operation, python in zip(operations, in_python)]
+	base_header = operation_header('') if in_praat != [] else TG.MATCH_HEADER
+	if None in headers or base_header == None:
+		return None
+
+	tokens = None
+	found = {}
+	missing = in_praat
+	if cache != None and in_praat != []:
+		wav_hash = cache.file_hash(values[header.index('wav')])
+		textgrid_hash = cache.file_hash(values[header.index('textgrid')])
+		recording_key = cache.recording_key(wav_hash, textgrid_hash, header + values, query_key, version)
+		tokens = cache.get_tokens(recording_key)
+		if tokens != None:
+			keys = [[cache.result_key(wav_hash, textgrid_hash, header + values, base, operations[i], version) for i in in_praat] for base in tokens]
+			found = cache.get_results([key for token_keys in keys for key in token_keys])
+			missing = [i for j, i in enumerate(in_praat) if any([not token_keys[j] in found for token_keys in keys])]
+
+	results = {}
+	logfile = ''
+	if in_praat != [] and (tokens == None or missing != []):
+		returncode, outfile, logfile = run_one_script(row_dir, header, values, ','.join([operations[i] for i in missing]))
+		if returncode != 0 or outfile == None:
+			return (None, logfile)
+		groups = MC.token_groups(read_rows(outfile)[1:])
+		split = [MC.split_token(rows, [len(headers[i]) for i in missing]) for rows in groups]
+		if any([segments == None for base, segments in split]):
+			return None
+		tokens = [base for base, segments in split]
+		for j, i in enumerate(missing):
+			results[i] = [segments[j] for base, segments in split]
+		if cache != None:
+			cache.put_tokens(recording_key, version, tokens)
+			entries = []
+			for base, segments in split:
+				for j, i in enumerate(missing):
+					entries.append((cache.result_key(wav_hash, textgrid_hash, header + values, base, operations[i], version), operations[i], segments[j]))
+			cache.put_results(entries, version)
+	if cache != None:
+		for i in in_praat:
+			if not i in results:
+				keys = [cache.result_key(wav_hash, textgrid_hash, header + values, base, operations[i], version) for base in tokens]
+				if any([not key in found for key in keys]):
+					return None
+				results[i] = [found[key] for key in keys]
+
+	if any(in_python):
+		spectral = [i for i in range(len(operations)) if in_python[i]]
+		measured = measure_spectra(values, tokens, [operations[i] for i in spectral])
+		if measured == None:
+			return None
+		tokens, spectral_results, seconds = measured
+		for i, rows in zip(spectral, spectral_results):
+			results[i] = rows
+		if profiling:
+			# one event for all of the recording's tokens, since they are measured together
+			os.makedirs(row_dir, exist_ok=True)
+			with open(os.path.join(row_dir, 'one_script_profile_python.jsonl'), 'w') as f:
+				for i, operation_seconds in zip(spectral, seconds):
+					name, arguments = (operations[i].strip()+'(').split('(')[:2]
+					event = {'event': 'operation', 'engine': 'python', 'operation': name, 'arguments': arguments.replace(')', '').replace(', ', ','), 'tokens': len(tokens), 'seconds': round(operation_seconds, 6)}
+					f.write(json.dumps(event)+'\n')
+
+	os.makedirs(row_dir, exist_ok=True)
+	outfile = os.path.join(row_dir, 'one_script_out_split.csv')
+	with open(outfile, 'w') as out:
+		out.write(','.join(base_header + [c for columns in headers for c in columns])+'\n')
+		for t, base in enumerate(tokens):
+			rows = MC.join_token(base, [results[i][t] for i in range(len(operations))])
+			if rows == None:
+				return None
+			for fields in rows:
+				out.write(','.join(fields)+'\n')
+	return (outfile, logfile)
+
+def run_recording(row, header, values):
+	row_dir = os.path.join(workdir, 'row_'+str(row))
+	start = time.time()
+	result = None
+	if (cache != None or args.spectra == 'python') and not MC.writes_files(args.operations):
+		result = run_split(row_dir, values)
+	if result == None:
+		returncode, outfile, logfile = run_one_script(row_dir, header, values, args.operations)
+		if returncode != 0:
+			outfile = None
+	else:
+		outfile, logfile = result
+	seconds = time.time() - start
+
+	if outfile == None:
+		return (row, None)
+	return (row, {'row': row, 'wav': values[header.index('wav')], 'textgrid': values[header.index('textgrid')], 'outfile': outfile, 'logfile': logfile, 'seconds': round(seconds, 1)})
+
+print('\n########################################')
+
+os.makedirs(workdir, exist_ok=True)
+if os.path.exists(query_path):
+	with open(query_path) as f:
+		if f.read() != query:
+			parser.error(workdir+' was used for a different query (choose another --workdir)')
+else:
+	with open(query_path, 'w') as f:
+		f.write(query)
+
+with open(file_list, newline='') as f:
+	reader = csv.reader(f)
+	header = next(reader)
+	recordings = [(row+1, values) for row, values in enumerate(reader) if len(values) == len(header)]
+
+# the Praat processes run in other directories, so relative paths need to be made absolute
+for row, values in recordings:
+	for column in ['wav', 'textgrid', 'video']:
+		if column in header and values[header.index(column)] != '':
+			values[header.index(column)] = os.path.abspath(values[header.index(column)])
+
+if args.cache != '[none listed]':
+	cache = MC.MeasurementCache(os.path.abspath(args.cache))
+	version = MC.script_version(script)
+	# what besides the audio, TextGrid and file list row decides which tokens are found
+	query_key = '\n'.join([args.phon_string, args.options, args.exclude])
+else:
+	cache = None
+headers = {}
+header_lock = threading.Lock()
+if args.spectra == 'python':
+	spectra_query = TG.Query(args.phon_string, args.options, args.exclude, os.path.dirname(script))
+
+done = read_manifest()
+todo = [(row, values) for row, values in recordings if not row in done]
+
+# LONGEST RECORDINGS FIRST, SO THE SHORT ONES FILL IN THE GAPS AT THE END
+durations = {row: audio_duration(values[header.index('wav')]) for row, values in todo}
+todo.sort(key=lambda r: durations[r[0]], reverse=True)
+
+print('Running one_script on', len(recordings), 'recordings from', args.file_list, 'with', jobs, 'Praat processes')
+if len(done) > 0:
+	print('...', len(done), 'recordings were already finished in', workdir)
+print('...', len(todo), 'recordings to process (', round(sum(durations.values())/60), 'minutes of audio)')
+print('########################################')
+
+failed = []
+if not os.path.exists(manifest_path):
+	with open(manifest_path, 'w', newline='') as f:
+		csv.writer(f, lineterminator='\n').writerow(manifest_header)
+
+with ThreadPoolExecutor(max_workers=jobs) as pool:
+	futures = [pool.submit(run_recording, row, header, values) for row, values in todo]
+	for future in as_completed(futures):
+		row, entry = future.result()
+		if entry == None:
+			failed.append(row)
+			print('FAILED: row', row, '(see', os.path.join(workdir, 'row_'+str(row), 'praat_output.txt')+')')
+		else:
+			# the manifest only gets a row once its output is complete
+			with open(manifest_path, 'a', newline='') as f:
+				csv.DictWriter(f, manifest_header, lineterminator='\n').writerow(entry)
+			done[row] = entry
+			print('finished row', row, 'of', len(recordings), '('+str(len(done))+' done)')
+
+if cache != None:
+	if args.cache_size != '[none listed]':
+		removed = cache.evict(MC.parse_size(args.cache_size))
+		if removed > 0:
+			print('removed the', removed, 'least recently used results from', args.cache)
+	cache.close()
+
+# MERGE THE PER-RECORDING OUTPUT IN FILE LIST ORDER
+datestamp = time.strftime('%Y%b%d_%Hh%Mm%S')
+outfile = 'one_script_out_'+datestamp+'.csv'
+logfile = 'one_script_log_'+datestamp+'.txt'
+
+out_header = None
+tokens = 0
+with open(outfile, 'w') as out, open(logfile, 'w') as log:
+	log.write('one_script_parallel query:\n'+query)
+	for row, values in recordings:
+		if not row in done:
+			continue
+		with open(done[row]['outfile']) as f:
+			row_header = f.readline()
+			if out_header == None:
+				out_header = row_header
+				out.write(out_header)
+			elif row_header != out_header:
+				print('WARNING: row', row, 'has different columns, so it was left out')
+				continue
+			for line in f:
+				out.write(line)
+				tokens += 1
+		if done[row]['logfile'] != '':
+			log.write('\n##### row '+str(row)+': '+done[row]['textgrid']+'\n')
+			with open(done[row]['logfile']) as f:
+				for line in f:
+					log.write(line)
+
+# WITH --profile, THE TIMING EVENTS OF THIS RUN'S RECORDINGS, WITH THEIR ROWS IN THE FILE LIST
+profilefile = 'one_script_profile_'+datestamp+'.jsonl'
+if profiling:
+	with open(profilefile, 'w') as out:
+		for row, values in recordings:
+			if not row in done:
+				continue
+			row_dir = os.path.dirname(done[row]['outfile'])
+			for name in sorted(os.listdir(row_dir)):
+				if name.startswith('one_script_profile_') and name.endswith('.jsonl'):
+					with open(os.path.join(row_dir, name)) as f:
+						for line in f:
+							try:
+								event = json.loads(line, strict=False)
+							except ValueError:
+								# the last line of a Praat process that was stopped
+								continue
+							event['row'] = row
+							out.write(json.dumps(event)+'\n')
+
+print('\n########################################')
+print('Wrote', tokens, 'tokens from', len(done), 'recordings to', outfile)
+print('Logfile is', logfile)
+if profiling:
+	print('Profile is', profilefile)
+if len(failed) > 0:
+	print(len(failed), 'recordings failed: run the same command again to retry them')
+print('########################################\n')
@@ -0,0 +1,208 @@
+import argparse, csv, json, os, sys
+import numpy as np
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Summarize the timing events one_script writes with the t option (or one_script_parallel.py --profile): time per operation and per stage of reading and scanning, throughput, the slowest files and tokens, and regressions compared with an earlier run')
+parser.add_argument('profiles', nargs='+', help='one_script_profile_*.jsonl files (or directories to find them in)')
+parser.add_argument('--compare', nargs='*', default=[], help='the profiles of an earlier run to compare with (e.g. with the last one_script_version$)')
+parser.add_argument('--slowest', default=10, help='how many of the slowest files and tokens to list')
+parser.add_argument('--tolerance', default=0.25, help='how much slower than the earlier run counts as a regression (0.25 = 25%%)')
+parser.add_argument('--output', default='', help='also write the summary of each operation to this csv file')
+args = parser.parse_args()
+
+#EXAMPLE
+# praat /phon/scripts/one_script.praat /phon/Buckeye/buckeye_files.csv 'HH/AA1/COR' 'formants(),duration()' 't'
+# python /phon/scripts/one_script_profile.py one_script_profile_2024Jun12_10h30m33.jsonl
+# python /phon/scripts/one_script_profile.py one_script_profile_2024Jul02_09h12m05.jsonl --compare one_script_profile_2024Jun12_10h30m33.jsonl
+# (an operation that takes 25% longer per token than before is listed as a regression, and the exit status is 1)
+
+slowest = int(args.slowest)
+tolerance = float(args.tolerance)
+
+# STAGES OF EACH FILE: READING THE TEXTGRID, READING THE SOUND, MEASURING
+# THE TOKENS, AND THE REST (MOSTLY LOOKING FOR MATCHES IN THE TEXTGRID)
+STAGES = ['read_textgrid', 'read_sound', 'scan', 'measure']
+OPERATION_HEADER = ['operation', 'tokens', 'seconds', 'tokens_per_second', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'max_objects']
+
+def profile_paths(paths):
+	found = []
+	for path in paths:
+		if os.path.isdir(path):
+			for directory, subdirectories, filenames in os.walk(path):
+				found += [os.path.join(directory, f) for f in sorted(filenames) if f.startswith('one_script_profile_') and f.endswith('.jsonl')]
+		else:
+			found.append(path)
+	return found
+
+def read_events(paths):
+	# the events of each profile, with the profile they came from (so the
+	# rows of different runs are kept apart)
+	events = []
+	skipped = 0
+	for path in profile_paths(paths):
+		with open(path) as f:
+			for line in f:
+				try:
+					event = json.loads(line, strict=False)
+				except ValueError:
+					# e.g. the last line of a Praat process that was stopped
+					skipped += 1
+					continue
+				event['profile'] = path
+				events.append(event)
+	if skipped > 0:
+		print('...', skipped, 'lines were not complete events')
+	return events
+
+def file_size(path):
+	try:
+		return os.path.getsize(path)
+	except OSError:
+		return None
+
+def operation_name(event):
+	return event['operation']+'('+event.get('arguments', '')+')'
+
+def summarize(events):
+
+	s = {'versions': sorted(set([e['version'] for e in events if e['event'] == 'run'])), 'seconds': 0, 'tokens': 0, 'audio_seconds': 0}
+	for e in events:
+		if e['event'] == 'run':
+			s['seconds'] += e['seconds']
+			s['tokens'] += e['tokens']
+			s['audio_seconds'] += e['audio_seconds']
+
+	# the stages, and the bytes of the files that were read (if they are still where they were)
+	files = [e for e in events if e['event'] == 'file']
+	s['files'] = len(files)
+	s['stages'] = dict([(stage, 0.0) for stage in STAGES])
+	s['bytes'] = {'read_textgrid': 0, 'read_sound': 0}
+	s['bytes_seconds'] = {'read_textgrid': 0.0, 'read_sound': 0.0}
+	s['missing'] = 0
+	for e in files:
+		e['scan'] = max(0, e['seconds'] - e['read_textgrid'] - e['read_sound'] - e['measure'])
+		for stage in STAGES:
+			s['stages'][stage] += e[stage]
+		for stage, path, read in [('read_textgrid', e['textgrid'], True), ('read_sound', e['wav'], e['wav_read'] == 1)]:
+			size = file_size(path) if read else 0
+			if size == None:
+				s['missing'] += 1
+			else:
+				s['bytes'][stage] += size
+				s['bytes_seconds'][stage] += e[stage]
+
+	# the seconds per token of each operation. operations measured in Python
+	# have one event for all of a recording's tokens, which count as that many
+	# tokens taking the same time
+	s['operations'] = {}
+	times = {}
+	objects = {}
+	for e in events:
+		if e['event'] == 'operation':
+			name = operation_name(e)
+			n = e.get('tokens', 1)
+			times.setdefault(name, []).append((e['seconds'] / max(n, 1), n))
+			objects[name] = max(objects.get(name, 0), e.get('objects', 0))
+	for name in times:
+		x = np.repeat([t for t, n in times[name]], [n for t, n in times[name]])
+		total = float(sum([t*n for t, n in times[name]]))
+		p50, p90, p99 = np.percentile(x, [50, 90, 99]) if len(x) > 0 else (0, 0, 0)
+		s['operations'][name] = {'operation': name, 'tokens': len(x), 'seconds': round(total, 6), 'tokens_per_second': round(len(x)/total, 1) if total > 0 else '',
+			'mean_ms': round(1000*total/max(len(x), 1), 3), 'p50_ms': round(1000*p50, 3), 'p90_ms': round(1000*p90, 3), 'p99_ms': round(1000*p99, 3),
+			'max_ms': round(1000*x.max(), 3) if len(x) > 0 else 0, 'max_objects': objects[name]}
+
+	# the slowest files, and the slowest tokens with their slowest operation
+	s['slowest_files'] = sorted(files, key=lambda e: e['seconds'], reverse=True)[:slowest]
+	slowest_operation = {}
+	for e in events:
+		if e['event'] == 'operation' and 'token_id' in e:
+			key = (e['profile'], e['row'], e['token_id'])
+			if not key in slowest_operation or e['seconds'] > slowest_operation[key]['seconds']:
+				slowest_operation[key] = e
+	s['slowest_tokens'] = []
+	for e in sorted([e for e in events if e['event'] == 'token'], key=lambda e: e['seconds'], reverse=True)[:slowest]:
+		s['slowest_tokens'].append((e, slowest_operation.get((e['profile'], e['row'], e['token_id']))))
+	return s
+
+def megabytes_per_second(s, stage):
+	if s['bytes_seconds'][stage] <= 0:
+		return '?'
+	return round(s['bytes'][stage] / 2**20 / s['bytes_seconds'][stage], 1)
+
+def report(s, title):
+	print('\n'+title+':', 'one_script version', ', '.join(s['versions']) if s['versions'] != [] else '?')
+	print(s['files'], 'files,', s['tokens'], 'tokens,', round(s['audio_seconds']/60), 'minutes of audio in', round(s['seconds'], 1), 'seconds of Praat time', '(%.1f tokens per second)' % (s['tokens']/s['seconds']) if s['seconds'] > 0 else '')
+	file_seconds = sum(s['stages'].values())
+	for stage in STAGES:
+		share = 100*s['stages'][stage]/file_seconds if file_seconds > 0 else 0
+		line = '  %-32s %10.3f s %5.1f%%' % (stage, s['stages'][stage], share)
+		if stage in s['bytes']:
+			line += '  %9.1f MB  %s MB/s' % (s['bytes'][stage]/2**20, megabytes_per_second(s, stage))
+		print(line)
+	if s['missing'] > 0:
+		print('  (', s['missing'], 'files are no longer where they were read from, so their bytes are left out)')
+	print('  %-32s %8s %10s %10s %9s %9s %9s %9s %7s' % ('operation', 'tokens', 'seconds', 'tokens/s', 'mean ms', 'p50 ms', 'p90 ms', 'p99 ms', 'objects'))
+	for name, o in sorted(s['operations'].items(), key=lambda item: item[1]['seconds'], reverse=True):
+		print('  %-32s %8d %10.3f %10s %9.3f %9.3f %9.3f %9.3f %7d' % (name, o['tokens'], o['seconds'], o['tokens_per_second'], o['mean_ms'], o['p50_ms'], o['p90_ms'], o['p99_ms'], o['max_objects']))
+	if s['slowest_files'] != []:
+		print('slowest files:')
+		for e in s['slowest_files']:
+			print('  row', e['row'], e['textgrid'], '%.3f s,' % e['seconds'], e['tokens'], 'tokens')
+	if s['slowest_tokens'] != []:
+		print('slowest tokens:')
+		for e, operation in s['slowest_tokens']:
+			print('  row', e['row'], e['token_id'], '%.3f s' % e['seconds'], '(mostly '+operation_name(operation)+', %.3f s)' % operation['seconds'] if operation != None else '')
+
+events = read_events(args.profiles)
+if events == []:
+	parser.error('there are no events in '+', '.join(args.profiles))
+current = summarize(events)
+
+print('\n########################################')
+report(current, 'this run')
+
+if args.output != '':
+	with open(args.output, 'w', newline='') as f:
+		writer = csv.DictWriter(f, OPERATION_HEADER, lineterminator='\n')
+		writer.writeheader()
+		for name in sorted(current['operations']):
+			writer.writerow(current['operations'][name])
+	print('\nwrote', len(current['operations']), 'operations to', args.output)
+
+# COMPARE WITH AN EARLIER RUN, PER TOKEN (SO THE RUNS DON'T HAVE TO BE THE SAME SIZE)
+
+regressions = []
+if args.compare != []:
+	earlier_events = read_events(args.compare)
+	if earlier_events == []:
+		parser.error('there are no events in '+', '.join(args.compare))
+	earlier = summarize(earlier_events)
+	report(earlier, 'earlier run')
+
+	print('\nchange per token (earlier -> this run):')
+	comparisons = []
+	for stage in STAGES:
+		if earlier['tokens'] > 0 and current['tokens'] > 0:
+			comparisons.append((stage, 1000*earlier['stages'][stage]/earlier['tokens'], 1000*current['stages'][stage]/current['tokens']))
+	for name in sorted(set(current['operations']) & set(earlier['operations'])):
+		comparisons.append((name, earlier['operations'][name]['mean_ms'], current['operations'][name]['mean_ms']))
+	for name, before, after in comparisons:
+		print('  %-32s %9.3f ms -> %9.3f ms %s' % (name, before, after, '(%+.0f%%)' % (100*(after-before)/before) if before > 0 else ''))
+		# very short times are mostly noise, so a regression also has to be 0.1 ms per token or more
+		if after > before*(1+tolerance) and after - before >= 0.1:
+			regressions.append((name, before, after))
+	for name in sorted(set(current['operations']) ^ set(earlier['operations'])):
+		print('  %-32s only in %s' % (name, 'this run' if name in current['operations'] else 'the earlier run'))
+
+print('\n########################################')
+if args.compare != []:
+	if regressions == []:
+		print('no regressions compared with', ', '.join(args.compare))
+	else:
+		print(len(regressions), 'REGRESSIONS compared with', ', '.join(args.compare)+':')
+		for name, before, after in regressions:
+			print('  '+name, '%.3f ms per token ->' % before, '%.3f ms per token' % after)
+print('########################################\n')
+
+if regressions != []:
+	sys.exit(1)
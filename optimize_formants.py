@@ -0,0 +1,162 @@
+import argparse, csv, glob, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import formant_stats as FS
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Choose formant candidates for each speaker and phone like choose_candidates_with_B2_50 and optimize_within_speaker in formant_functions.r, keeping the statistics in a store so that new recordings only update their own speakers')
+parser.add_argument('--input', default='[none listed]', help='one_script output made with formants(keep_all=1,...), or a pattern like "one_script_out_*.csv"')
+parser.add_argument('--store', default='formant_stats', help='the directory that keeps the candidates and statistics between runs')
+parser.add_argument('--speaker_col', default='speaker', help='the speaker column')
+parser.add_argument('--phone_col', default='allophone0', help='the phone column (allophone0 is the phone without stress digits)')
+parser.add_argument('--fixed', default='max_formant', help='max_formant (the candidates differ in total_formants) or total_formants (they differ in max_formant)')
+parser.add_argument('--phone_candidates', default='[none listed]', help='comma-separated candidates for choosing the best candidate of each phone (default: all of them)')
+parser.add_argument('--speaker_candidates', default='[none listed]', help='comma-separated candidates for choosing the best candidate of each speaker (default: all of them)')
+parser.add_argument('--mcols', default='F1_50,F2_50,log_B1_50,log_B2_50', help='the parameters of the Mahalanobis distances (log_X is the natural log of X)')
+parser.add_argument('--trim', default='[none listed]', help='parameters to trim outliers from before writing the phone statistics, like trimParameter')
+parser.add_argument('--sds', default=2, help='trim: the number of standard deviations from the phone mean to keep')
+parser.add_argument('--jobs', default=os.cpu_count(), help='how many speakers to optimize at the same time')
+parser.add_argument('--output', default='', help='what to call the output files')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/optimize_formants.py --input "one_script_out_*.csv" --phone_candidates 4,4.5,5,5.5,6,6.5,7,7.5 --speaker_candidates 4.5,5,5.5,6,6.5
+# (the same steps as one_script_formant_optimization.r. run it again after adding a recording session and only
+# the new file is read, and only the speakers whose rows or starting candidates changed are optimized again.)
+# python /phon/scripts/optimize_formants.py --input "one_script_out_*.csv" --trim F2_50,F1_50 --sds 2
+
+start_time = time.time()
+mcols = args.mcols.split(',')
+params = mcols + [p for p in ['log_B2_50'] if not p in mcols]
+columns = [params.index(p) for p in mcols]
+unfixed = 'max_formant' if args.fixed == 'total_formants' else 'total_formants'
+trim_params = [] if args.trim == '[none listed]' else args.trim.split(',')
+for p in trim_params:
+	if not p in mcols:
+		parser.error(p+' is not one of the mcols, so it cannot be trimmed')
+sds = float(args.sds)
+jobs = int(args.jobs)
+
+if args.output == '':
+	output_name = os.path.basename(os.path.normpath(args.store))+'_optimized'
+else:
+	output_name = args.output.replace('.csv', '')
+
+store = FS.FormantStore(args.store, params, args.speaker_col, args.phone_col, unfixed)
+
+print('\n########################################')
+input_files = sorted(glob.glob(args.input))
+if input_files == [] and store.files == []:
+	parser.error('no files match '+args.input)
+for filepath in input_files:
+	changed = store.ingest(filepath)
+	if changed == None:
+		print('...', filepath, 'has not changed')
+	else:
+		print('... read', filepath, '('+str(len(changed)), 'speakers)')
+store.save()
+
+# CHOOSE THE STARTING CANDIDATES (choose_candidates_with_B2_50)
+phone_means, speaker_means = store.summaries('log_B2_50')
+all_candidates = sorted(set([c for (what, c) in phone_means.keys()]))
+def candidate_list(value):
+	if value == '[none listed]':
+		return all_candidates
+	return [float(c) for c in value.split(',')]
+best_by_ph, phone_centered = FS.choose_bandwidths(FS.by_candidate(phone_means), candidate_list(args.phone_candidates), args.fixed)
+best_bw, best_centered = FS.choose_bandwidths(FS.by_candidate(speaker_means), candidate_list(args.speaker_candidates), args.fixed)
+unfixed_range = store.unfixed_range()
+
+speaker_phones = {}
+for (speaker, phone, candidate), rows in zip(store.moments.keys, store.moments.rows):
+	if rows > 0:
+		speaker_phones.setdefault(speaker, set()).add(phone)
+
+def initial_candidates(speaker):
+	return {phone: best_by_ph[phone] + best_centered[speaker] for phone in sorted(speaker_phones.get(speaker, []))}
+
+def signature(speaker):
+	# everything the optimization of a speaker depends on besides its rows
+	return repr((args.fixed, mcols, unfixed_range, sorted(initial_candidates(speaker).items())))
+
+def optimize(speaker):
+	data = store.speaker_data(speaker)
+	data['X'] = data['X'][:, columns]
+	new_mdist, new_best, notes = FS.optimize_speaker(data, initial_candidates(speaker), unfixed_range, args.fixed)
+	return (speaker, new_mdist, new_best, notes)
+
+# OPTIMIZE THE SPEAKERS WHOSE ROWS OR STARTING CANDIDATES CHANGED (optimize_within_speaker)
+to_optimize = [s for s in store.speakers if s in speaker_phones and store.signatures[store.speakers.index(s)] != signature(s)]
+print('optimizing', len(to_optimize), 'of', len(speaker_phones), 'speakers')
+# forked, so the workers don't run this script again
+if 'fork' in multiprocessing.get_all_start_methods():
+	pool = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'))
+else:
+	pool = ThreadPoolExecutor(max_workers=jobs)
+with pool:
+	for speaker, new_mdist, new_best, notes in pool.map(optimize, to_optimize):
+		print('...', speaker+':', ' | '.join(notes))
+		data = store.speaker_data(speaker)
+		data['new_mdist'] = new_mdist
+		data['new_best'] = new_best
+		store.save_speaker_data(speaker, data)
+		store.signatures[store.speakers.index(speaker)] = signature(speaker)
+store.save()
+
+# WRITE THE CHOSEN CANDIDATES, AND THE MEANS AND INVERSE COVARIANCE MATRICES OF EACH PHONE
+def format_value(value):
+	if np.isnan(value):
+		return 'NA'
+	return '%.15g' % value
+
+phone_stats = FS.Moments(mcols)
+trim_stats = {p: FS.Moments([p]) for p in trim_params}
+chosen = {'phone': [], 'X': []}
+with open(output_name+'.csv', 'w', newline='') as out:
+	writer = csv.writer(out, lineterminator='\n')
+	writer.writerow(['speaker', 'token_id', args.phone_col, unfixed, 'new_mdist', 'new_best_mdist'])
+	for speaker in sorted(speaker_phones.keys()):
+		data = store.speaker_data(speaker)
+		for r in range(len(data['token'])):
+			writer.writerow([speaker, data['token'][r], data['phone'][r], format_value(data['candidate'][r]), format_value(data['new_mdist'][r]), format_value(data['new_best'][r])])
+		best = data['new_best'] == 1
+		chosen['phone'] += list(data['phone'][best])
+		chosen['X'].append(data['X'][best][:, columns])
+chosen['phone'] = np.array(chosen['phone'], dtype=str)
+chosen['X'] = np.concatenate(chosen['X']) if chosen['X'] != [] else np.zeros((0, len(mcols)))
+codes = phone_stats.codes([(phone,) for phone in chosen['phone']])
+phone_stats.add(codes, chosen['X'])
+
+# trimParameter: for each parameter, drop the tokens more than sds standard
+# deviations below and then above their phone's mean, taking the rows out
+# of the phone statistics as they go
+keep = np.ones(len(codes), dtype=bool)
+for p in trim_params:
+	j = mcols.index(p)
+	trim_codes = trim_stats[p].codes([(phone,) for phone in chosen['phone']])
+	trim_stats[p].add(trim_codes[keep], chosen['X'][keep, j:j+1])
+	for tail in [-1, 1]:
+		cutoff = trim_stats[p].column_means()[trim_codes, 0] + tail * sds * np.sqrt(trim_stats[p].covariance()[trim_codes, 0, 0])
+		x = chosen['X'][:, j]
+		dropped = keep & ~(x > cutoff if tail < 0 else x < cutoff)
+		trim_stats[p].remove(trim_codes[dropped], chosen['X'][dropped, j:j+1])
+		phone_stats.remove(codes[dropped], chosen['X'][dropped])
+		keep = keep & ~dropped
+if trim_params != []:
+	print('trimmed', int((~keep).sum()), 'of', len(keep), 'tokens')
+
+with open(output_name+'_phone_stats.csv', 'w', newline='') as out:
+	writer = csv.writer(out, lineterminator='\n')
+	writer.writerow(['type', args.phone_col] + mcols)
+	means = phone_stats.column_means()
+	for k, (phone,) in enumerate(phone_stats.keys):
+		inv_cov = FS.inverse_covariance(phone_stats, k)
+		if inv_cov is None:
+			print('...', phone, 'has too few tokens for a covariance matrix')
+			continue
+		writer.writerow(['means', phone] + [format_value(v) for v in means[k]])
+		for row in inv_cov:
+			writer.writerow(['matrix', phone] + [format_value(v) for v in row])
+
+print('wrote', output_name+'.csv', 'and', output_name+'_phone_stats.csv', 'in', round(time.time()-start_time, 2), 'seconds')
+print('########################################\n')
@@ -0,0 +1,47 @@
+import os, subprocess, sys, time
+
+# the peak memory of a command run as a separate process.
+#
+# a child's ru_maxrss (from wait4) starts from the resident memory of the
+# process it was forked from, because it is kept across exec, so it mostly
+# measures the parent when the parent is big. on linux the command's own
+# high-water mark (VmHWM in /proc/<pid>/status, which starts again at exec)
+# is read while it runs instead, until it exits and before it is reaped.
+# elsewhere ru_maxrss is all there is.
+
+POLL_SECONDS = 0.005
+
+def high_water_mark(pid):
+	# VmHWM in MB, or None once the process has let go of its memory
+	try:
+		with open('/proc/'+str(pid)+'/status') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					return int(line.split()[1]) / 1024
+	except OSError:
+		pass
+	return None
+
+def run(command, cwd=None, output=None):
+	# (seconds, peak MB, exit status) of the command, with its stdout and stderr going to output
+	start = time.time()
+	process = subprocess.Popen(command, cwd=cwd, stdout=output, stderr=subprocess.STDOUT if output != None else None)
+	peak = None
+	if os.path.exists('/proc/'+str(process.pid)+'/status') and hasattr(os, 'waitid'):
+		while True:
+			mark = high_water_mark(process.pid)
+			if mark != None:
+				peak = max(peak or 0, mark)
+			if os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) != None:
+				break
+			time.sleep(POLL_SECONDS)
+	if hasattr(os, 'wait4'):
+		pid, status, usage = os.wait4(process.pid, 0)
+		process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status
+		if peak == None:
+			# ru_maxrss is in kilobytes on linux and in bytes on macos
+			peak = usage.ru_maxrss / (1024*1024 if sys.platform == 'darwin' else 1024)
+	else:
+		process.wait()
+	seconds = time.time() - start
+	return (seconds, peak if peak != None else float('nan'), process.returncode)
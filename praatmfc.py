@@ -1,46 +1,342 @@
+import random
+from array import array
 
-def readscript(script_path):
+# an MFC script is read once into a table of stimuli:
+#   names[i]          the stimulus name (first quoted field of the stimulus line:
+#                     a clip name, or the clip names of a group joined with commas)
+#   word[i]           code for the word label (second quoted field) in word_labels
+#   discourse[i]      code for the recording the clip came from in discourses
+#   clip_word[i]      code for the word at the end of the clip name in word_labels
+#   clip_start[i]     clip start time from the clip name (nan if there isn't one)
+#   file[i]           code for the script the stimulus was read from in paths
+#   offset[i], length[i]  where the stimulus line is in that file (bytes)
+# with the lines before and after the stimuli (of the last script read) kept
+# as they are. the names are kept as one block of utf-8 text, and looked up
+# through a hash table of row numbers (by the whole name, and by each clip
+# of a group), and the rows of each word label are kept in an array.
 
-	with open(script_path) as f:
-		big_script_lines = f.readlines()
+class TextColumn:
 
-	top_of_script = []
-	bottom_of_script = []
-	stimuli = []
-	reached_stimuli = False
-	finished_stimuli = False
+	# a list of strings kept as one bytearray of utf-8 text and the offset
+	# where each string ends
 
-	for line in big_script_lines:
+	def __init__(self):
+		self.text = bytearray()
+		self.ends = array('Q')
 
-		if line.startswith("numberOfDifferentStimuli"):
-			reached_stimuli = True
-			stated_number_of_stimuli = int(line.split('=')[1])
+	def __len__(self):
+		return len(self.ends)
 
-		elif line.startswith("numberOfReplicationsPerStimulus"):
-			finished_stimuli = True
+	def __getitem__(self, i):
+		if i < 0:
+			i += len(self.ends)
+		start = self.ends[i-1] if i > 0 else 0
+		return self.text[start:self.ends[i]].decode('utf-8')
 
-		if reached_stimuli == False:
-			top_of_script.append(line)
-		elif finished_stimuli:
-			bottom_of_script.append(line)
-		elif not line.startswith("numberOfDifferentStimuli"):
-			stimuli.append(line)
+	def __iter__(self):
+		for i in range(len(self.ends)):
+			yield self[i]
 
-	actual_number_of_stimuli = len(stimuli)
+	def append(self, value):
+		self.text += value.encode('utf-8')
+		self.ends.append(len(self.text))
 
-	if stated_number_of_stimuli != actual_number_of_stimuli:
-		print('WARNING: script says', stated_number_of_stimuli, 'but lists', actual_number_of_stimuli)
+class MFCScript:
 
-	return [top_of_script, bottom_of_script, stimuli]
+	def __init__(self, script_path=None):
+		self.path = script_path
+		self.paths = []
+		self.top = []
+		self.bottom = []
+		self.stated_number_of_stimuli = 0
 
-def writescript(script_path, top_of_script, bottom_of_script, stimuli):
+		self.names = TextColumn()
+		self.word = array('I')
+		self.discourse = array('I')
+		self.clip_word = array('I')
+		self.clip_start = array('d')
+		self.file = array('I')
+		self.offset = array('Q')
+		self.length = array('I')
+
+		self.word_labels = []
+		self.discourses = []
+		self.by_word = {}
+		self._word_codes = {}
+		self._discourse_codes = {}
+
+		# open addressing: slot s has a row number + 1 (0 if it is empty) and
+		# the hash of the name or clip name it was added for
+		self._slots = array('q', [0] * 8)
+		self._hashes = array('q', [0] * 8)
+		self._keys = 0
+
+		if script_path != None:
+			self.read(script_path)
+
+	def __len__(self):
+		return len(self.names)
+
+	def __contains__(self, name):
+		return self.index(name) != None
+
+	def read(self, script_path, unique=False):
+
+		# adds the stimuli of a script (with unique=True, only the ones whose
+		# name isn't in the table yet), and keeps its top and bottom
+		reached_stimuli = False
+		finished_stimuli = False
+		offset = 0
+		self.path = script_path
+		self.paths.append(script_path)
+		file = len(self.paths) - 1
+		self.top = []
+		self.bottom = []
+		n = 0
+
+		with open(script_path, 'rb') as f:
+			for raw_line in f:
+				line = raw_line.decode('utf-8')
+
+				if line.startswith("numberOfDifferentStimuli"):
+					reached_stimuli = True
+					self.stated_number_of_stimuli = int(line.split('=')[1])
+
+				elif line.startswith("numberOfReplicationsPerStimulus"):
+					finished_stimuli = True
+
+				if reached_stimuli == False:
+					self.top.append(line)
+				elif finished_stimuli:
+					self.bottom.append(line)
+				elif not line.startswith("numberOfDifferentStimuli") and line.strip() != '':
+					fields = line.split('"')
+					name = fields[1]
+					if len(fields) > 3:
+						word = fields[3]
+					else:
+						word = ''
+					n += 1
+					if not unique or self.lookup(name, clips=False) == []:
+						self.add(name, word, file, offset, len(raw_line))
+
+				offset += len(raw_line)
+
+		if self.stated_number_of_stimuli != n:
+			print('WARNING: script says', self.stated_number_of_stimuli, 'but lists', n)
+
+	def add(self, name, word, file=0, offset=0, length=0):
+
+		i = len(self.names)
+		discourse, clip_start, clip_word = parse_clip_name(name)
+
+		self.names.append(name)
+		self.word.append(self._code(word, self.word_labels, self._word_codes))
+		self.discourse.append(self._code(discourse, self.discourses, self._discourse_codes))
+		self.clip_word.append(self._code(clip_word, self.word_labels, self._word_codes))
+		self.clip_start.append(clip_start)
+		self.file.append(file)
+		self.offset.append(offset)
+		self.length.append(length)
+
+		if not word in self.by_word:
+			self.by_word[word] = array('I')
+		self.by_word[word].append(i)
+		for key in stimulus_keys(name):
+			self._insert(hash(key), i)
+
+		return i
+
+	def _code(self, label, labels, codes):
+		if not label in codes:
+			codes[label] = len(labels)
+			labels.append(label)
+		return codes[label]
+
+	def _insert(self, h, i):
+		if 2 * (self._keys + 1) > len(self._slots):
+			old = [(self._hashes[s], self._slots[s]) for s in range(len(self._slots)) if self._slots[s] != 0]
+			self._slots = array('q', [0] * (2 * len(self._slots)))
+			self._hashes = array('q', [0] * len(self._slots))
+			for old_h, slot in old:
+				self._place(old_h, slot)
+		self._place(h, i + 1)
+		self._keys += 1
+
+	def _place(self, h, slot):
+		mask = len(self._slots) - 1
+		s = h & mask
+		while self._slots[s] != 0:
+			s = (s + 1) & mask
+		self._slots[s] = slot
+		self._hashes[s] = h
+
+	def lookup(self, name, clips=True):
+		# the rows (in order) whose name is name, or (with clips=True) that have it as one of their clips
+		h = hash(name)
+		mask = len(self._slots) - 1
+		s = h & mask
+		found = []
+		while self._slots[s] != 0:
+			i = self._slots[s] - 1
+			if self._hashes[s] == h:
+				stimulus = self.names[i]
+				if stimulus == name or (clips and name in stimulus.split(',')):
+					found.append(i)
+			s = (s + 1) & mask
+		return sorted(set(found))
+
+	def index(self, name):
+		# the first row with this name or clip, or None
+		found = self.lookup(name)
+		return found[0] if found != [] else None
+
+	def rows_with_word(self, word):
+		return self.by_word.get(word, array('I'))
+
+	def mark(self, names):
+		# a bytearray with a 1 for each row that has one of the names (or clips)
+		selected = bytearray(len(self))
+		for name in names:
+			for i in self.lookup(name):
+				selected[i] = 1
+		return selected
+
+	def row(self, i):
+		return (self.names[i], self.word_labels[self.word[i]])
+
+	def rows(self, indices=None):
+		if indices == None:
+			indices = range(len(self))
+		for i in indices:
+			yield self.row(i)
+
+	def raw_line(self, i):
+		with open(self.paths[self.file[i]], 'rb') as f:
+			f.seek(self.offset[i])
+			return f.read(self.length[i]).decode('utf-8')
+
+	def header(self, key, default=None):
+		for line in self.top + self.bottom:
+			if line.startswith(key) and '=' in line:
+				return line.split('=', 1)[1].strip()
+		return default
+
+	def responses(self):
+		labels = []
+		in_responses = False
+		for line in self.bottom:
+			if line.startswith('numberOfDifferentResponses'):
+				in_responses = True
+			elif line.startswith('numberOfGoodnessCategories'):
+				in_responses = False
+			elif in_responses:
+				labels.append(line.split('"')[-2])
+		return labels
+
+	def write(self, script_path, indices=None, top=None, bottom=None):
+		if indices == None:
+			indices = range(len(self))
+		if top == None:
+			top = self.top
+		if bottom == None:
+			bottom = self.bottom
+		writestimuli(script_path, top, bottom, len(indices), self.rows(indices))
+
+def parse_clip_name(name):
+
+	# clip names are sound_name + clip start (with . replaced by _) + word
+	token_info = name.split('_')
+	clip_word = token_info[-1]
+	discourse = '_'.join(token_info[:-3])
+	try:
+		clip_start = float('.'.join(token_info[-3:-1]))
+	except ValueError:
+		clip_start = float('nan')
+	return (discourse, clip_start, clip_word)
+
+def stimulus_keys(name):
+	# a stimulus is looked up by its name, and by each clip of a group
+	clips = name.split(',')
+	if len(clips) == 1:
+		return clips
+	return [name] + clips
+
+def stimulus_line(name, word):
+	return '    "'+name+'" "'+word+'"\n'
+
+def writestimuli(script_path, top_of_script, bottom_of_script, n_stimuli, rows):
 
 	with open(script_path, 'w') as f:
 		for line in top_of_script:
 			f.write(line)
-		f.write('numberOfDifferentStimuli = '+str(len(stimuli))+'\n')
-		for stim in stimuli:
-			f.write(stim)
+		f.write('numberOfDifferentStimuli = '+str(n_stimuli)+'\n')
+		for name, word in rows:
+			f.write(stimulus_line(name, word))
 		for line in bottom_of_script:
 			f.write(line)
-	print('wrote', script_path, 'with', len(stimuli), 'clips')
\ No newline at end of file
+	print('wrote', script_path, 'with', n_stimuli, 'clips')
+
+# STAGES FOR A STREAM OF (name, word) STIMULUS ROWS
+# (each one takes rows and gives rows, so they can be chained without
+# writing the scripts in between)
+
+def with_header(top_of_script, key, value):
+	return [key+' = '+str(value)+'\n' if line.startswith(key) else line for line in top_of_script]
+
+def read_responses(filepath):
+	# the subject, stimulus, response and reaction time of each row of an MFC
+	# results file, a line at a time
+	with open(filepath) as f:
+		next(f, None)
+		for line in f:
+			if line.strip() == '':
+				continue
+			if '"' in line:
+				x1, stimulus, x2 = line.strip().split('"')
+				subject = x1.split(',')[0]
+				x2a, response, reactionTime = x2.split(',')
+			else:
+				subject, stimulus, response, reactionTime = line.strip().split(',')
+			yield subject, stimulus, response, reactionTime
+
+def select_rows(rows, script, selected):
+	# the rows whose stimulus is marked in selected (see MFCScript.mark)
+	for name, word in rows:
+		if any([selected[i] for i in script.lookup(name, clips=False)]):
+			yield (name, word)
+
+def group_rows(rows):
+	# one stimulus for each word (from the clip name) in each recording, playing all of its clips
+	groups = {}
+	for name, word in rows:
+		discourse, clip_start, clip_word = parse_clip_name(name)
+		if not discourse in groups:
+			groups[discourse] = {}
+		if not clip_word in groups[discourse]:
+			groups[discourse][clip_word] = []
+		groups[discourse][clip_word].append(name)
+	for discourse in groups:
+		for clip_word in groups[discourse]:
+			yield (','.join(groups[discourse][clip_word]), clip_word)
+
+def shuffle_rows(rows, seed=None):
+	rows = list(rows)
+	random.Random(seed).shuffle(rows)
+	return rows
+
+def split_rows(rows, max_per_script=None, by_word=False):
+	# a list of (name suffix, rows) for each script: by word label, or with
+	# no more than max_per_script rows each (suffixes like 2_of_3)
+	rows = list(rows)
+	if by_word:
+		stimulus_sets = {}
+		for name, word in rows:
+			if not word in stimulus_sets:
+				stimulus_sets[word] = []
+			stimulus_sets[word].append((name, word))
+		return list(stimulus_sets.items())
+	if max_per_script == None or len(rows) <= max_per_script:
+		return [('', rows)]
+	chunks = [rows[first:first+max_per_script] for first in range(0, len(rows), max_per_script)]
+	return [(str(n+1)+'_of_'+str(len(chunks)), chunk) for n, chunk in enumerate(chunks)]
@@ -0,0 +1,213 @@
+import csv, hashlib, json, mmap, os, struct
+import numpy as np
+
+# a *_prototypes.csv file has one "means" row per phone and one "matrix" row
+# per parameter per phone. the matrix rows are the inverted covariance matrix,
+# which one_script uses as is in the mahalanobis procedure.
+#
+# load() reads a prototypes file through a compiled binary bundle (see
+# compile_bundle) that is memory-mapped instead of parsed, and is rebuilt
+# whenever the csv file changes.
+
+BUNDLE_MAGIC = b'PROTOBIN'
+BUNDLE_VERSION = 1
+BUNDLE_EXTENSION = '.protobin'
+# magic, version, sha256 of the csv, csv size, csv mtime, phones, params, length of the names block
+BUNDLE_HEADER = struct.Struct('<8sI32sQqIIQ')
+
+class Prototypes:
+
+	def __init__(self, prototypes_path=None):
+		self.path = prototypes_path
+		self.params = []
+		self.phones = []
+		self.phone_index = {}
+		self.means = np.zeros((0, 0))
+		self.inv_cov = np.zeros((0, 0, 0))
+		self.log_scale = np.zeros(0, dtype=bool)
+		self.log_det = np.zeros(0)
+
+		if prototypes_path != None:
+			self.read(prototypes_path)
+
+	def __len__(self):
+		return len(self.phones)
+
+	def read(self, prototypes_path):
+
+		means = {}
+		matrices = {}
+		with open(prototypes_path, newline='') as f:
+			reader = csv.reader(f)
+			header = next(reader)
+			self.params = header[2:]
+			# bandwidth parameters (B1_25 etc.) are compared on a log10 scale
+			self.log_scale = np.array([p.startswith('B') for p in self.params], dtype=bool)
+			for row in reader:
+				if len(row) < 2:
+					continue
+				values = [to_float(v) for v in row[2:]]
+				if row[0] == 'means':
+					means[row[1]] = values
+				elif row[0] == 'matrix':
+					if not row[1] in matrices:
+						matrices[row[1]] = []
+					matrices[row[1]].append(values)
+
+		n = len(self.params)
+		self.phones = [p for p in means.keys() if p in matrices and len(matrices[p]) == n]
+		self.phone_index = {p: i for i, p in enumerate(self.phones)}
+		self.means = np.array([means[p] for p in self.phones], dtype=float).reshape(len(self.phones), n)
+		self.inv_cov = np.array([matrices[p] for p in self.phones], dtype=float).reshape(len(self.phones), n, n)
+
+		# log determinant of each covariance matrix (nan if the inverse isn't positive definite)
+		sign, inv_log_det = np.linalg.slogdet(self.inv_cov) if len(self.phones) > 0 else (np.zeros(0), np.zeros(0))
+		self.log_det = np.where(sign > 0, -inv_log_det, np.nan)
+
+	def phone_codes(self, phones):
+		return np.array([self.phone_index.get(p, -1) for p in phones], dtype=np.int64)
+
+	def distances(self, phone_codes, X):
+
+		# Mahalanobis distance of every row of X (tokens x params) from the
+		# prototype of its phone, following the mahalanobis procedure in
+		# one_script_procedures.praat:
+		#   - an undefined prototype mean counts as a difference of 9999
+		#   - an undefined measurement makes the distance undefined (nan)
+		#   - a phone with no prototype gets a distance of 1
+
+		phone_codes = np.asarray(phone_codes)
+		X = np.asarray(X, dtype=float)
+		dist = np.ones(len(phone_codes))
+
+		order = np.argsort(phone_codes, kind='stable')
+		codes, starts = np.unique(phone_codes[order], return_index=True)
+		ends = np.append(starts[1:], len(order))
+
+		for code, start, end in zip(codes, starts, ends):
+			if code < 0:
+				continue
+			rows = order[start:end]
+			diff = X[rows] - self.means[code]
+			diff[:, np.isnan(self.means[code])] = 9999
+			d2 = np.einsum('ij,jk,ik->i', diff, self.inv_cov[code], diff)
+			with np.errstate(invalid='ignore'):
+				dist[rows] = np.sqrt(d2)
+
+		return dist
+
+def csv_fingerprint(prototypes_path):
+	with open(prototypes_path, 'rb') as f:
+		return hashlib.sha256(f.read()).digest()
+
+def bundle_path(prototypes_path):
+	path = os.path.splitext(prototypes_path)[0] + BUNDLE_EXTENSION
+	if os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+		return path
+	cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'phonNCSU_acoustic')
+	os.makedirs(cache_dir, exist_ok=True)
+	return os.path.join(cache_dir, hashlib.sha256(os.path.abspath(prototypes_path).encode()).hexdigest()[:16] + '_' + os.path.basename(path))
+
+def compile_bundle(prototypes_path, output_path=None):
+
+	# layout: header, names block (json, padded to 8 bytes), then float64 arrays
+	# means (phones x params), inv_cov (phones x params x params), log_det (phones)
+	if output_path == None:
+		output_path = bundle_path(prototypes_path)
+
+	prototypes = Prototypes(prototypes_path)
+	stat = os.stat(prototypes_path)
+	names = json.dumps({'phones': prototypes.phones, 'params': prototypes.params}).encode('utf-8')
+	names += b' ' * (-len(names) % 8)
+	header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, csv_fingerprint(prototypes_path), stat.st_size, stat.st_mtime_ns, len(prototypes.phones), len(prototypes.params), len(names))
+
+	# write to a temporary file first so that workers never map a half-written bundle
+	temp_path = output_path + '.' + str(os.getpid())
+	with open(temp_path, 'wb') as f:
+		f.write(header)
+		f.write(b' ' * (-len(header) % 8))
+		f.write(names)
+		for a in [prototypes.means, prototypes.inv_cov, prototypes.log_det]:
+			f.write(np.ascontiguousarray(a, dtype='<f8').tobytes())
+	os.replace(temp_path, output_path)
+	return output_path
+
+def read_bundle(path):
+
+	with open(path, 'rb') as f:
+		buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	magic, version, digest, csv_size, csv_mtime, n_phones, n_params, names_length = BUNDLE_HEADER.unpack_from(buffer)
+	if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+		return None
+
+	offset = BUNDLE_HEADER.size + (-BUNDLE_HEADER.size % 8)
+	names = json.loads(bytes(buffer[offset:offset+names_length]))
+	offset += names_length
+
+	prototypes = Prototypes()
+	prototypes.path = path
+	prototypes.phones = names['phones']
+	prototypes.params = names['params']
+	prototypes.phone_index = {p: i for i, p in enumerate(prototypes.phones)}
+	prototypes.log_scale = np.array([p.startswith('B') for p in prototypes.params], dtype=bool)
+	arrays = []
+	for shape in [(n_phones, n_params), (n_phones, n_params, n_params), (n_phones,)]:
+		count = int(np.prod(shape))
+		arrays.append(np.frombuffer(buffer, dtype='<f8', count=count, offset=offset).reshape(shape))
+		offset += count * 8
+	prototypes.means, prototypes.inv_cov, prototypes.log_det = arrays
+	prototypes.bundle_info = {'sha256': digest, 'csv_size': csv_size, 'csv_mtime': csv_mtime, 'names_length': names_length}
+	return prototypes
+
+def update_bundle_stat(path, prototypes, stat):
+	info = prototypes.bundle_info
+	header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, info['sha256'], stat.st_size, stat.st_mtime_ns, len(prototypes.phones), len(prototypes.params), info['names_length'])
+	try:
+		with open(path, 'r+b') as f:
+			f.write(header)
+	except OSError:
+		# e.g. a bundle someone else compiled; it still works, it's just hashed each time
+		return
+	info['csv_size'] = stat.st_size
+	info['csv_mtime'] = stat.st_mtime_ns
+
+def load(prototypes_path):
+
+	# use the compiled bundle if it was made from this version of the csv
+	# file, and (re)compile it if not. the size and modification time are
+	# checked first so that the csv file is only hashed when it might have changed.
+	path = bundle_path(prototypes_path)
+	if os.path.exists(path):
+		try:
+			prototypes = read_bundle(path)
+		except (ValueError, struct.error):
+			# an empty or cut-off bundle (e.g. from a run that was stopped) is compiled again
+			prototypes = None
+		if prototypes != None:
+			stat = os.stat(prototypes_path)
+			info = prototypes.bundle_info
+			if info['csv_size'] == stat.st_size and info['csv_mtime'] == stat.st_mtime_ns:
+				return prototypes
+			if info['sha256'] == csv_fingerprint(prototypes_path):
+				# same contents (e.g. the file was copied or touched), so store the
+				# new size and time so that the next load doesn't hash it again
+				update_bundle_stat(path, prototypes, stat)
+				return prototypes
+	return read_bundle(compile_bundle(prototypes_path, path))
+
+def to_float(value):
+	try:
+		return float(value)
+	except ValueError:
+		return float('nan')
+
+def find_prototypes(language):
+
+	# accepts a path or a language name like the language argument of formants()
+	if os.path.exists(language):
+		return language
+	filename = language+'_prototypes.csv'
+	for directory in ['.', os.path.dirname(os.path.abspath(__file__))]:
+		if os.path.exists(os.path.join(directory, filename)):
+			return os.path.join(directory, filename)
+	return filename
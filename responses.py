@@ -0,0 +1,211 @@
+import os
+import numpy as np
+import praatmfc as MFC
+
+# a ResponseStore keeps the rows of MFC response files (subject, stimulus,
+# response, reactionTime) as columns of integer codes:
+#   rater[i], stimulus[i], response[i]  codes into raters, stimuli, responses
+#   file[i]                             code into files (the file the row came from)
+#   reaction_time[i]                    seconds (nan if it isn't a number)
+# saved as one .npz file. files that are already in the store are only read
+# again if their size or modification time changes.
+#
+# the agreement measures use each rater's last response to each stimulus.
+
+STORE_VERSION = 1
+
+class ResponseStore:
+
+	def __init__(self, store_path=None):
+		self.path = store_path
+		self.raters = []
+		self.stimuli = []
+		self.responses = []
+		self.files = []
+		self.file_size = []
+		self.file_mtime = []
+		self.rater = np.zeros(0, dtype=np.int32)
+		self.stimulus = np.zeros(0, dtype=np.int32)
+		self.response = np.zeros(0, dtype=np.int32)
+		self.file = np.zeros(0, dtype=np.int32)
+		self.reaction_time = np.zeros(0)
+		self._codes = {}
+
+		if store_path != None and os.path.exists(store_path):
+			self.load(store_path)
+
+	def __len__(self):
+		return len(self.rater)
+
+	def load(self, store_path):
+		with np.load(store_path) as saved:
+			if int(saved['version']) != STORE_VERSION:
+				return
+			for name in ['raters', 'stimuli', 'responses', 'files']:
+				setattr(self, name, [str(s) for s in saved[name]])
+			self.file_size = [int(s) for s in saved['file_size']]
+			self.file_mtime = [int(m) for m in saved['file_mtime']]
+			for name in ['rater', 'stimulus', 'response', 'reaction_time']:
+				setattr(self, name, saved[name])
+			self.file = saved['file_code']
+		self._codes = {}
+
+	def save(self, store_path=None):
+		if store_path == None:
+			store_path = self.path
+		# np.savez adds .npz to names without it, so write to a name that has it
+		temp_path = store_path + '.' + str(os.getpid()) + '.npz'
+		np.savez(temp_path, version=STORE_VERSION,
+			raters=np.array(self.raters, dtype=str), stimuli=np.array(self.stimuli, dtype=str), responses=np.array(self.responses, dtype=str),
+			files=np.array(self.files, dtype=str), file_size=np.array(self.file_size, dtype=np.int64), file_mtime=np.array(self.file_mtime, dtype=np.int64),
+			rater=self.rater, stimulus=self.stimulus, response=self.response, file_code=self.file, reaction_time=self.reaction_time)
+		os.replace(temp_path, store_path)
+
+	def code(self, label, labels):
+		codes = self._codes.setdefault(id(labels), {})
+		if len(codes) != len(labels):
+			codes.clear()
+			codes.update({l: i for i, l in enumerate(labels)})
+		if not label in codes:
+			codes[label] = len(labels)
+			labels.append(label)
+		return codes[label]
+
+	def ingest(self, filepath, rater=None):
+
+		# adds the rows of a response file (with the rater from the subject
+		# column, unless rater is given) and returns how many rows were added,
+		# or None if the file was already in the store and hasn't changed
+		key = os.path.abspath(filepath)
+		stat = os.stat(key)
+		if key in self.files:
+			f = self.files.index(key)
+			if self.file_size[f] == stat.st_size and self.file_mtime[f] == stat.st_mtime_ns:
+				return None
+			keep = self.file != f
+			for name in ['rater', 'stimulus', 'response', 'file', 'reaction_time']:
+				setattr(self, name, getattr(self, name)[keep])
+			self.file_size[f] = stat.st_size
+			self.file_mtime[f] = stat.st_mtime_ns
+		else:
+			f = self.code(key, self.files)
+			self.file_size.append(stat.st_size)
+			self.file_mtime.append(stat.st_mtime_ns)
+
+		raters, stimuli, responses, reaction_times = [], [], [], []
+		for subject, stimulus, response, reactionTime in MFC.read_responses(filepath):
+			raters.append(self.code(subject if rater == None else rater, self.raters))
+			stimuli.append(self.code(stimulus, self.stimuli))
+			responses.append(self.code(response, self.responses))
+			reaction_times.append(to_float(reactionTime))
+
+		self.rater = np.concatenate([self.rater, np.array(raters, dtype=np.int32)])
+		self.stimulus = np.concatenate([self.stimulus, np.array(stimuli, dtype=np.int32)])
+		self.response = np.concatenate([self.response, np.array(responses, dtype=np.int32)])
+		self.file = np.concatenate([self.file, np.full(len(raters), f, dtype=np.int32)])
+		self.reaction_time = np.concatenate([self.reaction_time, np.array(reaction_times, dtype=float)])
+		return len(raters)
+
+	def ratings(self):
+		# raters x stimuli matrix of each rater's last response code (-1 if none)
+		matrix = np.full((len(self.raters), len(self.stimuli)), -1, dtype=np.int32)
+		cells = self.rater.astype(np.int64) * len(self.stimuli) + self.stimulus
+		cells, last = np.unique(cells[::-1], return_index=True)
+		matrix.flat[cells] = self.response[::-1][last]
+		return matrix
+
+	def counts(self, ratings=None):
+		# stimuli x responses matrix of how many raters gave each response
+		if ratings is None:
+			ratings = self.ratings()
+		rater, stimulus = np.nonzero(ratings >= 0)
+		return np.bincount(stimulus * len(self.responses) + ratings[rater, stimulus], minlength=len(self.stimuli)*len(self.responses)).reshape(len(self.stimuli), len(self.responses))
+
+	def consensus(self, counts=None):
+		# the most common response to each stimulus (-1 if there is a tie or no
+		# response), the share of raters who gave it, and the number of raters
+		if counts is None:
+			counts = self.counts()
+		n = counts.sum(axis=1)
+		top = counts.max(axis=1) if counts.shape[1] > 0 else np.zeros(len(n), dtype=int)
+		best = counts.argmax(axis=1) if counts.shape[1] > 0 else np.zeros(len(n), dtype=int)
+		tied = (counts == top[:, None]).sum(axis=1) > 1
+		best = np.where(tied | (n == 0), -1, best)
+		with np.errstate(invalid='ignore', divide='ignore'):
+			share = np.where(n > 0, top / n, np.nan)
+		return (best, share, n)
+
+	def confusion(self, rater_code, reference=None, ratings=None):
+		# responses x responses matrix: rows are the reference (the consensus
+		# by default, or another rater's responses), columns are this rater's
+		if ratings is None:
+			ratings = self.ratings()
+		if reference is None:
+			reference = self.consensus(self.counts(ratings))[0]
+		k = len(self.responses)
+		mine = ratings[rater_code]
+		both = (mine >= 0) & (reference >= 0)
+		return np.bincount(reference[both] * k + mine[both], minlength=k*k).reshape(k, k)
+
+	def cohen_kappa(self, ratings=None):
+
+		# raters x raters matrix of Cohen's kappa over the stimuli both raters
+		# coded, and the number of those stimuli (kappa is nan with none)
+		if ratings is None:
+			ratings = self.ratings()
+		rated = (ratings >= 0).astype(float)
+		n = rated @ rated.T
+		agreements = np.zeros_like(n)
+		# chance agreement needs each rater's response distribution over the shared stimuli only
+		expected = np.zeros_like(n)
+		for k in range(len(self.responses)):
+			one_hot = (ratings == k).astype(float)
+			agreements += one_hot @ one_hot.T
+			shared_k = one_hot @ rated.T
+			expected += shared_k * shared_k.T
+		with np.errstate(invalid='ignore', divide='ignore'):
+			observed = agreements / n
+			expected = expected / (n * n)
+			kappa = (observed - expected) / (1 - expected)
+		kappa[n == 0] = np.nan
+		return (kappa, n.astype(int))
+
+	def fleiss_kappa(self, counts=None):
+		# Fleiss' kappa over the stimuli with at least two raters (with the
+		# usual generalization to different numbers of raters per stimulus)
+		if counts is None:
+			counts = self.counts()
+		n = counts.sum(axis=1)
+		counts = counts[n >= 2]
+		n = n[n >= 2]
+		if len(n) == 0:
+			return float('nan')
+		agreement = ((counts * (counts - 1)).sum(axis=1) / (n * (n - 1))).mean()
+		p = counts.sum(axis=0) / n.sum()
+		expected = (p * p).sum()
+		if expected == 1:
+			return float('nan')
+		return float((agreement - expected) / (1 - expected))
+
+	def reaction_times(self, by):
+		# n, mean, median, sd and the 10th and 90th percentiles of the reaction
+		# times for each code of a column (rater or response)
+		codes = getattr(self, by)
+		labels = {'rater': self.raters, 'response': self.responses}[by]
+		order = np.argsort(codes, kind='stable')
+		starts = np.searchsorted(codes[order], np.arange(len(labels)+1))
+		summary = []
+		for c, label in enumerate(labels):
+			rt = self.reaction_time[order[starts[c]:starts[c+1]]]
+			rt = rt[~np.isnan(rt)]
+			if len(rt) == 0:
+				summary.append((label, 0, np.nan, np.nan, np.nan, np.nan, np.nan))
+			else:
+				summary.append((label, len(rt), rt.mean(), np.median(rt), rt.std(ddof=1) if len(rt) > 1 else np.nan, np.percentile(rt, 10), np.percentile(rt, 90)))
+		return summary
+
+def to_float(value):
+	try:
+		return float(value)
+	except ValueError:
+		return float('nan')
@@ -0,0 +1,169 @@
+import argparse, csv, time
+import numpy as np
+import prototypes as P
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Choose the best formant candidate for every token in one_script output made with formants(keep_all=1), using Mahalanobis distances from a prototypes file')
+parser.add_argument('--input', default='[none listed]', help='one_script output made with formants(keep_all=1,...)')
+parser.add_argument('--prototypes', default='ral', help='a prototypes csv file, or a language name like the language argument of formants()')
+parser.add_argument('--best_only', default='False', help='whether to write only the best candidate for each token')
+parser.add_argument('--output', default='', help='what to call the output file')
+args = parser.parse_args()
+
+#EXAMPLE
+# python select_formant_candidates.py --input one_script_out_2024Jun12_10h30m33.csv --prototypes english_mfa0
+# (the measurement points in the output need to include the times used in the prototypes, e.g. 25% and 75%)
+
+if args.output == '':
+	if args.best_only == 'True':
+		output_filename = args.input.replace('.csv', '')+'_best.csv'
+	else:
+		output_filename = args.input.replace('.csv', '')+'_reselected.csv'
+else:
+	output_filename = args.output
+
+start_time = time.time()
+
+prototypes = P.load(P.find_prototypes(args.prototypes))
+
+with open(args.input, newline='') as f:
+	header = next(csv.reader(f))
+
+# with keep_all=1, only the first candidate row of a token has the columns of the
+# operations before formants(), and the other rows start the formant columns
+# right after the basic token information
+if 'speech_overlap' in header:
+	n_base = header.index('speech_overlap') + 1
+else:
+	n_base = header.index('right2') + 1
+formant_start = header.index('total_formants')
+token_id_column = header.index('token_id')
+phone_column = header.index('phone')
+
+def relative_column(name):
+	if not name in header:
+		parser.error(args.input+' has no '+name+' column, which the prototypes need (check the measurements argument of formants())')
+	return header.index(name) - formant_start
+
+param_columns = [relative_column(p) for p in prototypes.params]
+mdist_column = relative_column('mdist')
+if 'best' in header:
+	best_column = relative_column('best')
+else:
+	best_column = None
+
+def to_float(value):
+	if value == '--undefined--':
+		return float('nan')
+	return P.to_float(value)
+
+# FIRST PASS: COLLECT THE PROTOTYPE MEASUREMENTS OF EVERY CANDIDATE
+token_codes = []
+phones = []
+measurements = []
+old_best = []
+last_token_id = None
+
+with open(args.input, newline='') as f:
+	reader = csv.reader(f)
+	next(reader)
+	for row in reader:
+		if len(row) <= phone_column:
+			continue
+		token_id = row[token_id_column]
+		if token_id != last_token_id:
+			block = formant_start
+			if token_codes == []:
+				token_codes.append(0)
+			else:
+				token_codes.append(token_codes[-1] + 1)
+		else:
+			block = n_base
+			token_codes.append(token_codes[-1])
+		last_token_id = token_id
+		phones.append(row[phone_column])
+		measurements.append([to_float(row[block+c]) if block+c < len(row) else float('nan') for c in param_columns])
+		if best_column != None and block+best_column < len(row):
+			old_best.append(row[block+best_column] == '1')
+		else:
+			old_best.append(False)
+
+token_codes = np.array(token_codes, dtype=np.int64)
+X = np.array(measurements, dtype=float).reshape(len(phones), len(param_columns))
+with np.errstate(divide='ignore', invalid='ignore'):
+	X[:, prototypes.log_scale] = np.log10(X[:, prototypes.log_scale])
+
+mdist = prototypes.distances(prototypes.phone_codes(phones), X)
+
+# THE BEST CANDIDATE HAS THE SMALLEST MDIST (THE FIRST ONE IF THERE IS A TIE)
+rows = np.arange(len(mdist))
+order = np.lexsort((rows, np.where(np.isnan(mdist), np.inf, mdist), token_codes))
+first_of_token = np.ones(len(order), dtype=bool)
+first_of_token[1:] = token_codes[order][1:] != token_codes[order][:-1]
+is_best = np.zeros(len(mdist), dtype=bool)
+is_best[order[first_of_token]] = True
+
+n_tokens = int(first_of_token.sum())
+changed = int((is_best & ~np.array(old_best, dtype=bool)).sum())
+
+def format_mdist(value):
+	if np.isnan(value):
+		return '--undefined--'
+	return '%.3f' % value
+
+def best_only_row(candidates):
+	# put the best candidate's formant columns between the columns of the
+	# operations before and after formants()
+	first = candidates[0][1]
+	last = candidates[-1][1]
+	if len(candidates) == 1:
+		return first
+	width = len(first) - formant_start
+	after = last[n_base+width:]
+	for i, row in candidates:
+		if is_best[i]:
+			if row is first:
+				return first + after
+			return first[:formant_start] + row[n_base:n_base+width] + after
+
+# SECOND PASS: WRITE THE ROWS BACK WITH THE NEW MDIST AND BEST VALUES
+with open(args.input, newline='') as f, open(output_filename, 'w', newline='') as out:
+	reader = csv.reader(f)
+	writer = csv.writer(out, lineterminator='\n')
+	writer.writerow(next(reader))
+	i = 0
+	candidates = []
+	last_token_id = None
+	for row in reader:
+		if len(row) <= phone_column:
+			continue
+		token_id = row[token_id_column]
+		if token_id != last_token_id:
+			block = formant_start
+			if candidates != [] and args.best_only == 'True':
+				writer.writerow(best_only_row(candidates))
+			candidates = []
+		else:
+			block = n_base
+		last_token_id = token_id
+
+		if block+mdist_column < len(row):
+			row[block+mdist_column] = format_mdist(mdist[i])
+		if best_column != None and block+best_column < len(row):
+			row[block+best_column] = str(int(is_best[i]))
+
+		if args.best_only == 'True':
+			candidates.append((i, row))
+		else:
+			writer.writerow(row)
+		i += 1
+
+	if candidates != []:
+		writer.writerow(best_only_row(candidates))
+
+print('\n########################################')
+print('scored', len(mdist), 'candidates for', n_tokens, 'tokens using', prototypes.path, 'in', round(time.time()-start_time, 2), 'seconds')
+if best_column != None:
+	print(changed, 'tokens have a different best candidate than in', args.input)
+print('wrote', output_filename)
+print('########################################\n')
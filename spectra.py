@@ -0,0 +1,482 @@
+import math
+import numpy as np
+import wavfiles as WAV
+
+# a Recording measures the spectra of many windows of a wav file at once:
+# the windows are grouped by the FFT size Praat would use for them (the next
+# power of two), and each group is a batch of numpy FFTs. the measurements
+# follow Praat's Extract part, Filter (pass Hann band), To Spectrum (fast)
+# and Spectrum queries, so these procedures of one_script_procedures.praat
+# don't need a Sound and a Spectrum object for every window:
+#   cog, cogs, cog_pro, band_energy, band_energy_diff, spec_window, moments
+#     (operation_columns() and measure_operation() give the columns they
+#     write and their values, formatted the same way)
+#   make_Table_spectrum_info (spectrum_info())
+#   mfcc (Recording.mfcc(), which is To MFCC for each clip)
+# with tapers > 1, a window's spectrum is the mean of the spectra of that many
+# sine tapers (Riedel and Sidorenko 1995) instead of the procedure's window
+# shape, which Praat can't do.
+#
+# the power of a frequency bin is re^2 + im^2 of Praat's Spectrum (the FFT
+# times the sampling period), for bins 0 ... N/2 spaced rate/N apart.
+
+SPECTRAL_OPERATIONS = ['cog', 'cogs', 'cog_pro', 'band_energy', 'band_energy_diff', 'spec_window', 'moments']
+MOMENTS = ['cog', 'std', 'skew', 'kurt']
+TIME_COLUMNS = ['phone_start', 'phone_end', 'lastphone_start', 'nextphone_end']
+UNDEFINED = '--undefined--'
+# about how many samples go into one batch of FFTs
+BATCH_SIZE = 2**22
+
+# FORMATTING
+
+def praat_double(value):
+	# a number the way Praat writes 'x' (15 significant digits, or more if
+	# they are needed to get the same number back)
+	if not np.isfinite(value):
+		return UNDEFINED
+	for digits in [15, 16, 17]:
+		text = '%.*g' % (digits, value)
+		if float(text) == value:
+			break
+	return text
+
+def praat_fixed(value, decimals):
+	# a number the way Praat writes 'x:2'
+	if not np.isfinite(value):
+		return UNDEFINED
+	return '%.*f' % (decimals, value)
+
+def to_float(text):
+	try:
+		return float(text)
+	except ValueError:
+		return float('nan')
+
+# OPERATIONS
+
+def parse_operation(operation):
+	# (name, [(variable, value), ...]) split the way parseOperations and parseArgs do it
+	operation = operation.strip()
+	if '(' in operation:
+		name, arg_string = operation.split('(', 1)
+	else:
+		name, arg_string = operation, ''
+	arg_string = arg_string.replace(')', '').replace(', ', ',')
+	args = []
+	for part in arg_string.split(','):
+		fields = part.split('=')
+		args.append((fields[0], fields[1] if len(fields) > 1 else ''))
+	return (name.strip(), args)
+
+def settings(operation):
+	# (name, settings) with each procedure's defaults and arguments
+	name, args = parse_operation(operation)
+	s = {}
+	if name == 'cogs':
+		# window is read, but cogs always measures 30 ms windows
+		s = {'measurements': 31, 'window': 0.03, 'halfwindow': 0.015, 'lastphone': 'no', 'nextphone': 'no', 'filter_low': 0, 'filter_high': 22050, 'filtering': False}
+		for var, val in args:
+			if var in ['measurements', 'window', 'filter_low', 'filter_high']:
+				s[var] = to_float(val)
+				s['filtering'] = s['filtering'] or var in ['filter_low', 'filter_high']
+			elif var in ['lastphone', 'nextphone']:
+				s[var] = val
+	elif name in ['cog_pro', 'band_energy']:
+		s = {'from_time': 0.2, 'to_time': 0.8, 'from_freq': 750 if name == 'band_energy' else 0, 'to_freq': 11025}
+		for var, val in args:
+			if var in s:
+				s[var] = to_float(val)
+	elif name == 'spec_window':
+		s = {'num_windows': 9, 'window_size': 0.03, 'skip_band': 0, 'band_low': 500, 'band_high': 11000, 'band_smooth': 100, 'cog': 0, 'std': 0, 'skew': 0, 'kurt': 0, 'only_clips': 0}
+		for var, val in args:
+			if var == 'only_clips':
+				s[var] = 1
+			elif var in s:
+				s[var] = to_float(val)
+	elif name == 'moments':
+		s = {'minHz': 1, 'maxHz': 44100}
+		for var, val in args:
+			if var in s:
+				s[var] = to_float(val)
+	elif name == 'mfcc':
+		s = {'pad': 0.1, 'filter_low': 0, 'filter_high': 22050, 'filtering': False, 'sanitize': 1, 'coefficients': 12, 'window': 0.015, 'step': 0.005,
+			'first_melfilter': 100, 'between_melfilters': 100, 'max_melfilter': 0, 'wav': 1}
+		for var, val in args:
+			if var in s:
+				s[var] = to_float(val)
+				s['filtering'] = s['filtering'] or var in ['filter_low', 'filter_high']
+	return (name, s)
+
+def supports(operation):
+	# whether measure_operation() can do an operation (spec_window's clips,
+	# and the settings it stops the script for, are left to Praat)
+	name, s = settings(operation)
+	if not name in SPECTRAL_OPERATIONS:
+		return False
+	if name == 'cogs' and not s['measurements'] >= 1:
+		return False
+	if name == 'spec_window':
+		if s['only_clips'] == 1 or not s['num_windows'] >= 1:
+			return False
+		if s['skip_band'] == 0 and s['band_low'] >= s['band_high']:
+			return False
+	return True
+
+def operation_columns(operation):
+	# the columns the procedure writes
+	name, s = settings(operation)
+	if name in ['cog', 'cog_pro']:
+		return ['cog']
+	if name == 'cogs':
+		return ['first_measure', 'last_measure', 'step'] + ['C'+str(mp) for mp in range(1, int(s['measurements'])+1)]
+	if name == 'band_energy':
+		return ['band_energy_'+praat_double(s['from_freq'])+'_'+praat_double(s['to_freq'])]
+	if name == 'band_energy_diff':
+		return ['band_energy_diff']
+	if name == 'moments':
+		return [m+'_'+part for part in ['avg', '1', '2', '3'] for m in ['cog', 'sd', 'skew', 'kurt']]
+	if name == 'spec_window':
+		return [m+'_'+str(w) for w in range(1, int(s['num_windows'])+1) for m in MOMENTS if s[m] == 1]
+	raise ValueError(name+' is not a spectral operation')
+
+def token_times(rows):
+	# the times measure_operation() needs (TIME_COLUMNS), from the matches of
+	# a TextGridIndex or the rows of a textgrid_matches.py list
+	return {name: np.array([to_float(row[name]) for row in rows], dtype=float) for name in TIME_COLUMNS}
+
+def measure_operation(recording, times, operation, tapers=1):
+
+	# the values one of the procedures writes for each token, as lists of
+	# strings
+	name, s = settings(operation)
+	phone_start = times['phone_start']
+	phone_end = times['phone_end']
+	duration = phone_end - phone_start
+	n = len(phone_start)
+	with np.errstate(all='ignore'):
+
+		if name == 'cog':
+			measured = recording.measure(phone_start, phone_end, tapers=tapers)
+			return [[praat_fixed(v, 0)] for v in measured['cog']]
+
+		if name == 'cogs':
+			mps = int(s['measurements'])
+			first = times['lastphone_start'] if s['lastphone'] in ['yes', 'true'] else phone_start
+			last = times['nextphone_end'] if s['nextphone'] in ['yes', 'true'] else phone_end
+			step = (last - first) / (mps - 1) if mps > 1 else np.full(n, np.nan)
+			centres = first[:, None] + step[:, None] * np.arange(mps)[None, :]
+			band = (s['filter_low'], s['filter_high'], 100) if s['filtering'] else None
+			measured = recording.measure((centres - s['halfwindow']).reshape(-1), (centres + s['halfwindow']).reshape(-1), 'Hamming', band, tapers)
+			cogs = measured['cog'].reshape(n, mps)
+			return [[praat_double(first[t]), praat_double(last[t]), praat_double(step[t])] + [praat_double(v) for v in cogs[t]] for t in range(n)]
+
+		if name in ['cog_pro', 'band_energy']:
+			starts = phone_start + duration * s['from_time']
+			ends = phone_start + duration * s['to_time']
+			if name == 'cog_pro':
+				measured = recording.measure(starts, ends, band=(s['from_freq'], s['to_freq'], 100), tapers=tapers)
+				return [[praat_fixed(v, 0)] for v in measured['cog']]
+			measured = recording.measure(starts, ends, tapers=tapers, bands=[(s['from_freq'], s['to_freq'])], moments=False)
+			return [[praat_fixed(v, 0)] for v in measured['energy'][:, 0]]
+
+		if name == 'band_energy_diff':
+			measured = recording.measure(phone_start, phone_end, tapers=tapers, bands=[(1500, 2500), (3500, 5500)], moments=False)
+			difference = 10 * np.log10(measured['energy'][:, 0] / measured['energy'][:, 1])
+			return [[praat_fixed(v, 0)] for v in difference]
+
+		if name == 'moments':
+			# the whole phone, and 25 ms at its start, middle and end if it is longer than 30 ms
+			band = (s['minHz'], s['maxHz'], 100) if s['minHz'] > 1 or s['maxHz'] < 44100 else None
+			middle = phone_start + duration / 2
+			starts = np.concatenate([phone_start, phone_start, middle - 0.0125, phone_end - 0.025])
+			ends = np.concatenate([phone_end, phone_start + 0.025, middle + 0.0125, phone_end])
+			measured = recording.measure(starts, ends, 'Hanning', band, tapers)
+			values = np.stack([measured[m].reshape(4, n) for m in MOMENTS], axis=2)
+			values[1:, ~(duration > 0.03), :] = 0
+			decimals = [0, 0, 2, 2]
+			# the columns are cog, sd, skew, kurt for the whole phone, then for each part
+			return [[praat_fixed(values[part, t, m], decimals[m]) for part in range(4) for m in range(4)] for t in range(n)]
+
+		if name == 'spec_window':
+			windows = int(s['num_windows'])
+			displacement = (duration - s['window_size']) / (windows - 1) if windows > 1 else np.full(n, np.nan)
+			begins = phone_start[:, None] + np.arange(windows)[None, :] * displacement[:, None]
+			band = (s['band_low'], s['band_high'], s['band_smooth']) if s['skip_band'] == 0 else None
+			measured = recording.measure(begins.reshape(-1), (begins + s['window_size']).reshape(-1), band=band, tapers=tapers)
+			chosen = [m for m in MOMENTS if s[m] == 1]
+			values = {m: measured[m].reshape(n, windows) for m in chosen}
+			return [[praat_fixed(values[m][t, w], 0) for w in range(windows) for m in chosen] for t in range(n)]
+
+	raise ValueError(name+' is not a spectral operation')
+
+def spectrum_info(recording, left_bound, right_bound):
+
+	# the table make_Table_spectrum_info makes: 30 ms windows every 5 ms,
+	# with their centre of gravity (500-15000 Hz), the difference between the
+	# energy below 500 Hz and between 1500 and 2500 Hz (in dB) and how much it
+	# changed since the last window, and the energy of five bands
+	splits = [0, 500, 1000, 1500, 2500, 3500]
+	band_names = [(praat_double(low)+'-'+praat_double(high)).replace('000', 'k') for low, high in zip(splits[:-1], splits[1:])]
+	intervals = int(praat_fixed((right_bound - left_bound) / 0.005, 0))
+	centres = left_bound + np.arange(intervals+1) * 0.005
+	bands = [(0, 500), (1500, 2500)] + list(zip(splits[:-1], splits[1:]))
+	plain = recording.measure(centres - 0.015, centres + 0.015, bands=bands, moments=False)
+	filtered = recording.measure(centres - 0.015, centres + 0.015, band=(500, 15000, 100))
+	with np.errstate(all='ignore'):
+		band_diff = 10 * np.log10(plain['energy'][:, 0] / plain['energy'][:, 1])
+	table = {'time': centres, 'cog': filtered['cog'], 'banddiff': band_diff, 'banddiffdelta': np.concatenate([[0], np.diff(band_diff)])[:len(centres)]}
+	for b, name in enumerate(band_names):
+		table[name] = plain['energy'][:, 2+b]
+	return table
+
+# SPECTRA
+
+def fft_size(n):
+	# the number of samples To Spectrum (fast) pads n samples to
+	return max(2, 1 << (int(n) - 1).bit_length())
+
+def window_shape(shape, n, length):
+	# Sound_multiplyByWindow's windows, for rows of n samples
+	phase = (np.arange(length)[None, :] + 0.5) / np.maximum(n, 1)[:, None]
+	if shape == 'Hamming':
+		return 0.54 - 0.46 * np.cos(2 * np.pi * phase)
+	if shape == 'Hanning':
+		return 0.5 - 0.5 * np.cos(2 * np.pi * phase)
+	if shape == 'rectangular':
+		return np.ones((len(n), length))
+	raise ValueError('unknown window shape '+shape)
+
+def sine_tapers(tapers, n, length):
+	# rows x tapers x samples, each taper with a sum of squares of n (like a
+	# rectangular window) so that band energies stay comparable
+	j = np.arange(length)[None, None, :] + 1
+	k = np.arange(1, tapers+1)[None, :, None]
+	m = n[:, None, None]
+	return np.where(j <= m, np.sqrt(2 / (m + 1) * m) * np.sin(np.pi * k * j / (m + 1)), 0.0)
+
+def hann_band(frequencies, nyquist, fmin, fmax, smoothing):
+	# what Spectrum_passHannBand multiplies each frequency bin by
+	if fmax == 0:
+		fmax = nyquist
+	f1, f2, f3, f4 = fmin - smoothing, fmin + smoothing, fmax - smoothing, fmax + smoothing
+	halfpi_by_smoothing = np.pi / (2 * smoothing) if smoothing != 0 else 0
+	weights = np.where((frequencies < f1) | (frequencies > f4), 0.0, 1.0)
+	low = (frequencies < f2) & (fmin > 0)
+	high = ~low & (frequencies > f3) & (fmax < nyquist)
+	weights[low] *= 0.5 - 0.5 * np.cos(halfpi_by_smoothing * (frequencies[low] - f1))
+	weights[high] *= 0.5 + 0.5 * np.cos(halfpi_by_smoothing * (frequencies[high] - f3))
+	return weights
+
+def band_weights(n_bins, df, fmin, fmax):
+	# how much of each frequency bin is between fmin and fmax (Praat's band
+	# energy adds up whole and partial bins, and the first and last bins are half as wide)
+	nyquist = df * (n_bins - 1)
+	if fmax <= fmin:
+		fmin, fmax = 0, nyquist
+	f = np.arange(n_bins) * df
+	left = np.maximum(f - df / 2, 0)
+	right = np.minimum(f + df / 2, nyquist)
+	return np.clip(np.minimum(right, fmax) - np.maximum(left, fmin), 0, None)
+
+def spectral_moments(power, df):
+	# Get centre of gravity, standard deviation, skewness and kurtosis (power 2)
+	f = np.arange(power.shape[1]) * df
+	with np.errstate(all='ignore'):
+		total = power.sum(axis=1)
+		cog = (power * f[None, :]).sum(axis=1) / total
+		d = f[None, :] - cog[:, None]
+		m2 = (power * d**2).sum(axis=1) / total
+		m3 = (power * d**3).sum(axis=1) / total
+		m4 = (power * d**4).sum(axis=1) / total
+		spread = m2 > 0
+		return {'cog': cog, 'std': np.sqrt(m2), 'skew': np.where(spread, m3 / (m2 * np.sqrt(m2)), np.nan), 'kurt': np.where(spread, m4 / (m2 * m2) - 3, np.nan)}
+
+# MFCC
+
+# the mel filterbanks made so far, by FFT size, sampling rate and filter positions
+filterbanks = {}
+
+def hertz_to_mel(f):
+	return 2595 * np.log10(1 + f / 700)
+
+def mel_to_hertz(mel):
+	return 700 * (10**(mel / 2595) - 1)
+
+def mel_filters(rate, first_mel, between_mels, max_mel):
+	# (first filter, distance between filters, number of filters) the way
+	# To MFCC fills in its defaults (max_mel 0 is the Nyquist frequency)
+	bottom = hertz_to_mel(100)
+	ceiling = hertz_to_mel(rate / 2)
+	if max_mel <= 0 or max_mel > ceiling:
+		max_mel = ceiling
+	if max_mel <= first_mel:
+		first_mel, max_mel = bottom, ceiling
+	if first_mel <= 0:
+		first_mel = bottom
+	if between_mels <= 0:
+		between_mels = 100
+	return (first_mel, between_mels, int(math.floor((max_mel - first_mel) / between_mels + 0.5)))
+
+def mel_filterbank(size, rate, first_mel, between_mels, n_filters):
+	# frequency bins x filters: the triangular filters (in Hz, between the
+	# centres of the filters on either side) that each frame's power spectrum is multiplied by
+	key = (size, rate, first_mel, between_mels, n_filters)
+	if not key in filterbanks:
+		f = (np.arange(size // 2 + 1) * rate / size)[:, None]
+		centres = first_mel + np.arange(n_filters) * between_mels
+		low, centre, high = mel_to_hertz(centres - between_mels), mel_to_hertz(centres), mel_to_hertz(centres + between_mels)
+		with np.errstate(all='ignore'):
+			weights = np.where(f < centre, (f - low) / (centre - low), (high - f) / (high - centre))
+		filterbanks[key] = np.where((f > low) & (f < high), weights, 0.0)
+	return filterbanks[key]
+
+def mfcc_frames(rate, first, n, window, step):
+	# (frames, time of the first frame) for parts of n samples starting at
+	# sample first, as Sampled_shortTermAnalysis does it for a Gaussian
+	# window twice as long as the window length (no frames if the part is shorter than that)
+	duration = n / rate
+	window_duration = 2 * window
+	frames = np.where(duration >= window_duration, np.floor((duration - window_duration) / step) + 1, 0).astype(np.int64)
+	middle = (first + 0.5) / rate - 0.5 / rate + 0.5 * duration
+	return (frames, np.where(frames > 0, middle - 0.5 * frames * step + 0.5 * step, np.nan))
+
+class Recording:
+
+	def __init__(self, wav_path):
+		self.wav = WAV.WavFile(wav_path)
+		self.rate = self.wav.rate
+		self.samples, self.scale = self.wav.array()
+
+	def close(self):
+		self.samples = None
+		self.wav.close()
+
+	def sample_ranges(self, starts, ends):
+		# the first sample and number of samples of each window (see WavFile.sample_range)
+		valid = np.isfinite(starts) & np.isfinite(ends)
+		first = np.ceil(np.where(valid, starts, 0) * self.rate - 0.5).astype(np.int64)
+		stop = np.floor(np.where(valid, ends, 0) * self.rate - 0.5).astype(np.int64) + 1
+		return (first, np.where(valid, np.maximum(stop - first, 0), 0))
+
+	def extract(self, first, n):
+		# rows x samples, with zero samples outside the file and after the end
+		# of each window, and the channels averaged as in To Spectrum
+		length = int(n.max())
+		j = np.arange(length)
+		index = first[:, None] + j[None, :]
+		inside = (j[None, :] < n[:, None]) & (index >= 0) & (index < len(self.samples))
+		x = self.samples[np.clip(index, 0, max(len(self.samples) - 1, 0))]
+		x = x.mean(axis=2) if x.shape[2] > 1 else x[:, :, 0].astype(float)
+		return np.where(inside, x / self.scale, 0.0)
+
+	def power_spectra(self, starts, ends, shape='rectangular', band=None, tapers=1):
+
+		# yields (rows, power, df) for batches of windows with the same FFT
+		# size: the power spectrum of each window in rows (windows with no
+		# samples are left out, as Praat can't extract them)
+		first, n = self.sample_ranges(np.asarray(starts, dtype=float), np.asarray(ends, dtype=float))
+		sizes = np.array([fft_size(k) for k in n], dtype=np.int64)
+		dt = 1 / self.rate
+		for size in np.unique(sizes[n > 0]):
+			group = np.nonzero((sizes == size) & (n > 0))[0]
+			per_batch = max(1, BATCH_SIZE // (int(size) * max(tapers, 1)))
+			frequencies = np.arange(size // 2 + 1) * self.rate / size
+			for b in range(0, len(group), per_batch):
+				rows = group[b:b+per_batch]
+				x = self.extract(first[rows], n[rows])
+				length = x.shape[1]
+				if tapers > 1:
+					# the tapers take the place of the window shape, after filtering
+					if band != None:
+						x = self.pass_hann_band(x, n[rows], size, frequencies, band)
+					spectra = np.fft.rfft(x[:, None, :] * sine_tapers(tapers, n[rows], length), size, axis=2) * dt
+					power = (spectra.real**2 + spectra.imag**2).mean(axis=1)
+				else:
+					x = x * window_shape(shape, n[rows], length)
+					if band != None:
+						x = self.pass_hann_band(x, n[rows], size, frequencies, band)
+					spectrum = np.fft.rfft(x, size, axis=1) * dt
+					power = spectrum.real**2 + spectrum.imag**2
+				yield (rows, power, self.rate / size)
+
+	def pass_hann_band(self, x, n, size, frequencies, band):
+		# Filter (pass Hann band): the filtered sound has as many samples as the window
+		spectrum = np.fft.rfft(x, size, axis=1) * hann_band(frequencies, self.rate / 2, *band)[None, :]
+		filtered = np.fft.irfft(spectrum, size, axis=1)[:, :x.shape[1]]
+		return np.where(np.arange(x.shape[1])[None, :] < n[:, None], filtered, 0.0)
+
+	def mfcc(self, starts, ends, coefficients=12, window=0.015, step=0.005, first_mel=100, between_mels=100, max_mel=0, band=None):
+
+		# To MFCC for the parts from starts to ends (after Filter (pass Hann
+		# band), if band is (fmin, fmax, smoothing)): returns the time of each
+		# part's first frame, and a frames x coefficients array (c1 ... cn,
+		# like the rows of To Matrix) for each part
+		first_mel, between_mels, n_filters = mel_filters(self.rate, first_mel, between_mels, max_mel)
+		coefficients = n_filters - 1 if coefficients <= 0 else min(int(coefficients), n_filters - 1)
+		window_duration = 2 * window
+		frame_n = int(math.floor(window_duration * self.rate + 0.5))
+		size = fft_size(frame_n)
+		i = np.arange(1, frame_n + 1)
+		gaussian = (np.exp(-48 * (i - 0.5 * (frame_n + 1))**2 / (frame_n + 1)**2) - math.exp(-12)) / (1 - math.exp(-12))
+		filterbank = mel_filterbank(size, self.rate, first_mel, between_mels, n_filters)
+		cosines = np.cos(np.pi * np.arange(1, coefficients + 1)[:, None] * (np.arange(n_filters)[None, :] + 0.5) / n_filters)
+		dt = 1 / self.rate
+		df = self.rate / size
+
+		first, n = self.sample_ranges(np.asarray(starts, dtype=float), np.asarray(ends, dtype=float))
+		frames, first_times = mfcc_frames(self.rate, first, n, window, step)
+		cepstra = [np.zeros((k, coefficients)) for k in frames]
+		sizes = np.array([fft_size(k) for k in n], dtype=np.int64)
+		for clip_size in np.unique(sizes[frames > 0]):
+			group = np.nonzero((sizes == clip_size) & (frames > 0))[0]
+			per_batch = max(1, BATCH_SIZE // int(clip_size))
+			for b in range(0, len(group), per_batch):
+				rows = group[b:b+per_batch]
+				clips = self.extract(first[rows], n[rows])
+				if band != None:
+					clips = self.pass_hann_band(clips, n[rows], clip_size, np.arange(clip_size // 2 + 1) * self.rate / clip_size, band)
+				# every frame of these clips: Sound_into_Sound takes the samples
+				# from the one nearest to the start of the window (zero outside the clip)
+				clip = np.repeat(np.arange(len(rows)), frames[rows])
+				k = np.concatenate([np.arange(f) for f in frames[rows]])
+				t = first_times[rows][clip] + k * step
+				start = np.floor((t - window_duration / 2 - (first[rows][clip] + 0.5) / self.rate) * self.rate + 0.5).astype(np.int64)
+				values = []
+				per_chunk = max(1, BATCH_SIZE // size)
+				for c in range(0, len(clip), per_chunk):
+					chunk = slice(c, c+per_chunk)
+					index = start[chunk, None] + np.arange(frame_n)[None, :]
+					inside = (index >= 0) & (index < n[rows][clip[chunk], None])
+					x = np.where(inside, clips[clip[chunk, None], np.clip(index, 0, clips.shape[1] - 1)], 0.0) * gaussian[None, :]
+					# Sound_to_Spectrum_power, the mel filters, dB and the cosine transform
+					spectrum = np.fft.rfft(x, size, axis=1) * dt
+					power = (spectrum.real**2 + spectrum.imag**2) * (2 * df / window_duration)
+					power[:, 0] *= 0.5
+					power[:, -1] *= 0.5
+					mel = power @ filterbank
+					with np.errstate(all='ignore'):
+						db = np.where(mel > 0, np.maximum(10 * np.log10(mel / 4e-10), -100), -100)
+					values.append(db @ cosines.T)
+				values = np.concatenate(values)
+				ends_at = np.cumsum(frames[rows])
+				for r, row in enumerate(rows):
+					cepstra[row] = values[ends_at[r] - frames[row] : ends_at[r]]
+		return (first_times, cepstra)
+
+	def measure(self, starts, ends, shape='rectangular', band=None, tapers=1, bands=[], moments=True):
+
+		# measures the windows from starts to ends, after Extract part with
+		# the window shape and, if band is (fmin, fmax, smoothing), Filter
+		# (pass Hann band). returns cog, std, skew and kurt (power 2) if
+		# moments, and energy (windows x bands: Get band energy for each
+		# (fmin, fmax) in bands). windows with no samples are nan
+		m = len(starts)
+		measured = {name: np.full(m, np.nan) for name in MOMENTS} if moments else {}
+		measured['energy'] = np.full((m, len(bands)), np.nan)
+		for rows, power, df in self.power_spectra(starts, ends, shape, band, tapers):
+			if moments:
+				for name, values in spectral_moments(power, df).items():
+					measured[name][rows] = values
+			for b, (fmin, fmax) in enumerate(bands):
+				measured['energy'][rows, b] = 2 * (power * band_weights(power.shape[1], df, fmin, fmax)[None, :]).sum(axis=1)
+		return measured
@@ -0,0 +1,91 @@
+import argparse, csv, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import measurement_cache as MC
+import spectra as SP
+import textgrids as TG
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Measure the spectral operations of one_script (cog, cogs, cog_pro, band_energy, band_energy_diff, spec_window, moments) without Praat, with batches of FFTs for all of the tokens of a recording')
+parser.add_argument('file_list', help='the csv file list (speaker,wav,textgrid,...)')
+parser.add_argument('phon_string', help='the phon_string, e.g. S/AW1/TH')
+parser.add_argument('operations', help='the operations, e.g. cog(),moments(maxHz=11025)')
+parser.add_argument('options', nargs='?', default='', help='the one_script options')
+parser.add_argument('exclude', nargs='?', default='', help='the words to exclude')
+parser.add_argument('--tapers', default=1, help='how many sine tapers to average the spectrum of each window over (1 is the window shape of the procedure, as in Praat)')
+parser.add_argument('--jobs', default=os.cpu_count(), help='how many recordings to measure at the same time')
+parser.add_argument('--index', default='', help='where to keep the TextGrid index (default: next to the file list)')
+parser.add_argument('--output', default='', help='what to call the output file')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/spectral_measures.py /phon/Buckeye/buckeye_files.csv 'S/SH' 'cog(),moments(),spec_window(cog=1,std=1)'
+# (the output has the same columns as one_script's, and the same values to the precision it writes them with)
+# python /phon/scripts/spectral_measures.py /phon/Buckeye/buckeye_files.csv 'S/SH' 'cogs(measurements=11)' --tapers 4
+
+start_time = time.time()
+tapers = int(args.tapers)
+jobs = int(args.jobs)
+
+operations = MC.split_operations(args.operations)
+for operation in operations:
+	if not SP.supports(operation):
+		parser.error(operation+' is not a spectral operation spectra.py can measure (run it with one_script)')
+columns = [c for operation in operations for c in SP.operation_columns(operation)]
+
+if args.index == '':
+	index_path = TG.index_path(args.file_list.split(':')[0])
+else:
+	index_path = args.index
+
+if args.output == '':
+	output_filename = 'one_script_out_'+time.strftime('%Y%b%d_%Hh%Mm%S')+'.csv'
+else:
+	output_filename = args.output
+
+rows = TG.read_file_list(args.file_list)
+index = TG.TextGridIndex(index_path)
+if index.update([row['textgrid'] for row in rows]) > 0:
+	index.save()
+query = TG.Query(args.phon_string, args.options, args.exclude)
+
+# THE TOKENS OF EACH RECORDING, IN ONE_SCRIPT'S ORDER
+recordings = []
+for match in index.matches(query, rows):
+	if recordings == [] or recordings[-1][0] != match['wav_file']:
+		recordings.append((match['wav_file'], []))
+	recordings[-1][1].append(match)
+
+def measure(recording):
+	wav_path, matches = recording
+	try:
+		sound = SP.Recording(wav_path)
+	except (OSError, ValueError) as e:
+		return (wav_path, None, str(e))
+	times = SP.token_times(matches)
+	values = [[] for match in matches]
+	for operation in operations:
+		for t, fields in enumerate(SP.measure_operation(sound, times, operation, tapers)):
+			values[t] += fields
+	sound.close()
+	return (wav_path, [[match[c] for c in TG.MATCH_HEADER] + fields for match, fields in zip(matches, values)], '')
+
+print('\n########################################')
+print('measuring', sum([len(matches) for wav_path, matches in recordings]), 'tokens of', args.phon_string, 'in', len(recordings), 'recordings')
+# forked, so the workers don't run this script again
+if 'fork' in multiprocessing.get_all_start_methods():
+	pool = ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork'))
+else:
+	pool = ThreadPoolExecutor(max_workers=jobs)
+tokens = 0
+with pool, open(output_filename, 'w') as out:
+	# like one_script, nothing is quoted
+	out.write(','.join(TG.MATCH_HEADER + columns)+'\n')
+	for wav_path, measured, error in pool.map(measure, recordings):
+		if measured == None:
+			print('... could not read', wav_path+':', error)
+			continue
+		for fields in measured:
+			out.write(','.join(fields)+'\n')
+		tokens += len(measured)
+print('wrote', tokens, 'tokens to', output_filename, 'in', round(time.time()-start_time, 2), 'seconds')
+print('########################################\n')
@@ -1,5 +1,5 @@
 
-import argparse, random
+import argparse
 import praatmfc as MFC
 
 parser = argparse.ArgumentParser(description='Split a Praat MFC script into scripts that will play smaller subsets of the clips')
@@ -18,57 +18,36 @@ print('########################################')
 	
 max_per_script = int(args.max)
 
-[top_of_script, bottom_of_script, stimuli] = MFC.readscript(args.mfc)
+script = MFC.MFCScript(args.mfc)
 
+rows = list(script.rows())
 if args.shuffle == "True":
-	random.shuffle(stimuli)
+	rows = MFC.shuffle_rows(rows)
 
 output_basename = args.mfc.replace('.praat','')
 
-# MAKE THIS A DICTIONARY	!
-stimulus_sets = {}
-
 if args.word == 'True':
-	# for s in stimuli:
-	# 	print(s)
-
-	for stimulus in stimuli:
-		word = stimulus.split('"')[3]
-
-		if not word in stimulus_sets.keys():
-			stimulus_sets[word] = []
-
-		stimulus_sets[word].append(stimulus)
 
-	for stimulus_name in stimulus_sets.keys():
-		output_name = output_basename + '_' + stimulus_name + '.praat' 
-		MFC.writescript(output_name, top_of_script, bottom_of_script, stimulus_sets[stimulus_name])
+	for word, word_rows in MFC.split_rows(rows, by_word=True):
+		output_name = output_basename + '_' + word + '.praat' 
+		MFC.writestimuli(output_name, script.top, script.bottom, len(word_rows), word_rows)
 
 else:
 
-	if len(stimuli) <= max_per_script:
+	if len(rows) <= max_per_script:
 		print('Number of stimuli is less than requested maximum: nothing to do.')
-		print('To split your script, choose max less than '+str(len(stimuli))+'.')
+		print('To split your script, choose max less than '+str(len(rows))+'.')
 
 	else:
-		print (len(stimuli), 'stimuli')
-
-		stimulus_number = 1
-		stimulus_name = str(stimulus_number)
-		stimulus_sets[stimulus_name] = []
-
-		while len(stimuli) > 0:
-
-			if len(stimulus_sets[stimulus_name]) == max_per_script:
-				print(len(stimulus_sets[stimulus_name]), 'stimuli in', stimulus_name)
-				stimulus_number += 1
-				stimulus_name = str(stimulus_number)
-				stimulus_sets[stimulus_name] = []
+		print (len(rows), 'stimuli')
 
-			stimulus_sets[stimulus_name].append(stimuli.pop())
+		rows.reverse()
+		stimulus_sets = MFC.split_rows(rows, max_per_script)
+		for suffix, chunk in stimulus_sets:
+			print(len(chunk), 'stimuli in', suffix.split('_')[0])
 
-		for stimulus_name in stimulus_sets.keys():
-			output_name = output_basename + '_' + stimulus_name + '_of_' + str(len(stimulus_sets.keys())) + '.praat' 
-			MFC.writescript(output_name, top_of_script, bottom_of_script, stimulus_sets[stimulus_name])
+		for suffix, chunk in stimulus_sets:
+			output_name = output_basename + '_' + suffix + '.praat' 
+			MFC.writestimuli(output_name, script.top, script.bottom, len(chunk), chunk)
 
 print('########################################\n')
@@ -1,9 +1,14 @@
 
-import argparse, random, glob
+import argparse, random, glob, os
 import praatmfc as MFC
 
 
 '''
+# ALL RATERS AND RESPONSES IN ONE RUN (writes DFD469_<rater>_<response>.praat):
+python ~/scripts/phonNCSU/acoustic/subset_mfc_by_responses.py --batch True --mfc 'DFD469_*.praat' --csv '../responses/first43/*.csv' --raters Jeff,Griffin,Quynh,Ayumi --response NA,other
+python ~/scripts/phonNCSU/acoustic/subset_mfc_by_responses.py --batch True --mfc 'DFD469_*.praat' --csv '../responses/first43/*.csv' --output 'DFD469_{rater}_{response}.praat'
+
+# ONE RATER AND RESPONSE AT A TIME:
 python ~/scripts/phonNCSU/acoustic/subset_mfc_by_responses.py --mfc 'DFD469_*.praat' --csv '../responses/*Jeff*.csv' --response NA --output DFD469_Jeff_NA.praat
 python ~/scripts/phonNCSU/acoustic/subset_mfc_by_responses.py --mfc 'DFD469_*.praat' --csv '../responses/*Jeff*.csv' --response other --output DFD469_Jeff_other.praat
 python ~/scripts/phonNCSU/acoustic/subset_mfc_by_responses.py --mfc 'DFD469_*.praat' --csv '../drive-download-20240619T204643Z-001/*Griffin*.csv' --response NA --output DFD469_Griffin_NA.praat
@@ -67,55 +72,103 @@ python ~/scripts/phonNCSU/acoustic/subset_mfc_by_responses.py --mfc 'DFD469_*.pr
 parser = argparse.ArgumentParser(description='Split a Praat MFC script into scripts that will play smaller subsets of the clips')
 parser.add_argument('--mfc', default='[none listed]', help='path to your MFC scripts')
 parser.add_argument('--csv', default='[none listed]', help='path to your MFC responses')
-parser.add_argument('--response', default='[none listed]', help='the response to look for')
+parser.add_argument('--response', default='[none listed]', help='the response to look for (in batch mode, a comma-separated list, or leave out for all responses)')
 # parser.add_argument('--max', default=1000, help='the maximum number of clips you want to listen to in one session')
 # parser.add_argument('--word', default='False', help='whether to split by word')
 parser.add_argument('--shuffle', default='True', help='whether to shuffle the stimuli')
-parser.add_argument('--output', default='[none listed]', help='what to name the resulting script')
+parser.add_argument('--output', default='[none listed]', help='what to name the resulting script (in batch mode, a name with {rater} and {response} in it)')
+parser.add_argument('--batch', default='False', help='whether to write a script for every rater and response in one run')
+parser.add_argument('--raters', default='[none listed]', help='in batch mode, comma-separated rater names to look for in the response filenames (otherwise raters come from the subject column)')
 args = parser.parse_args()
 
-mfc_filelist = glob.glob(args.mfc)
-csv_filelist = glob.glob(args.csv)
+def find_rater(filepath, subject, raters):
+	if raters == []:
+		return subject
+	for rater in raters:
+		if rater in os.path.basename(filepath):
+			return rater
+	return None
+
+mfc_filelist = sorted(glob.glob(args.mfc))
+csv_filelist = sorted(glob.glob(args.csv))
 
 print('found',len(mfc_filelist),'matching MFC scripts and',len(csv_filelist),'matching response files')
 
-response_dict = {}
-stimlines = ''
-
-for filepath in csv_filelist:
-	# print(filepath)
-	with open(filepath) as f:
-		lines = f.readlines()
-		lines.pop(0)
-		for line in lines:
-			# print(line)
-			if '"' in line:
-				x1, stimulus, x2 = line.strip().split('"')
-				subject = x1.split(',')[0]
-				x2a, response, reactionTime = x2.split(',')
-			else:
-				subject, stimulus, response, reactionTime = line.strip().split(',')
+# READ EVERY MFC SCRIPT ONCE INTO ONE TABLE, INDEXED BY CLIP NAME
+stimuli = MFC.MFCScript()
+for filepath in mfc_filelist:
+	stimuli.read(filepath, unique=True)
+
+top_of_script = stimuli.top
+bottom_of_script = stimuli.bottom
+
+def select_stimuli(stimulus_names):
+	# keep the order the stimuli have in the MFC scripts. a grouped line
+	# (clips joined with commas) is found by its whole name or by any of its clips
+	selected = bytearray(len(stimuli))
+	for name in stimulus_names:
+		for i in stimuli.lookup(name):
+			selected[i] = 1
+	return [stimuli.row(i) for i in range(len(stimuli)) if selected[i]]
+
+if args.batch == 'True':
+
+	if args.raters == '[none listed]':
+		raters = []
+	else:
+		raters = args.raters.split(',')
+
+	# READ EVERY RESPONSE FILE ONCE
+	response_dict = {}
+	for filepath in csv_filelist:
+		for subject, stimulus, response, reactionTime in MFC.read_responses(filepath):
+			rater = find_rater(filepath, subject, raters)
+			if rater == None:
+				continue
+			if not (rater, response) in response_dict:
+				response_dict[(rater, response)] = []
+			response_dict[(rater, response)].append(stimulus)
+
+	if args.response == '[none listed]':
+		responses = sorted(set(response for rater, response in response_dict.keys()))
+	else:
+		responses = args.response.split(',')
+
+	if args.output == '[none listed]':
+		output_template = os.path.commonprefix([os.path.basename(p) for p in mfc_filelist]).replace('.praat', '').rstrip('_')+'_{rater}_{response}.praat'
+	else:
+		output_template = args.output
+
+	print('response summary:')
+	for rater, response in sorted(response_dict.keys()):
+		print(rater, response, len(response_dict[(rater, response)]))
+
+	for rater, response in sorted(response_dict.keys()):
+		if response in responses:
+			selected_stimuli = select_stimuli(response_dict[(rater, response)])
+			output_name = output_template.format(rater=rater, response=response)
+			MFC.writestimuli(output_name, top_of_script, bottom_of_script, len(selected_stimuli), selected_stimuli)
+
+else:
+
+	response_dict = {}
+
+	for filepath in csv_filelist:
+		# print(filepath)
+		for subject, stimulus, response, reactionTime in MFC.read_responses(filepath):
 			# print(response)
 			if response in response_dict.keys():
 				response_dict[response].append(stimulus)
 			else:
 				response_dict[response] = [stimulus]
 
-print('response summary:')
-for k in response_dict.keys():
-	print(k, len(response_dict[k]))
-	# if k=='NA':
-	# 	print(response_dict[k])
-target_stimuli = response_dict[args.response]
-
-selected_stimuli = []
+	print('response summary:')
+	for k in response_dict.keys():
+		print(k, len(response_dict[k]))
+		# if k=='NA':
+		# 	print(response_dict[k])
+	target_stimuli = response_dict[args.response]
 
-for filepath in mfc_filelist:
-	# print(filepath)
-	[top_of_script, bottom_of_script, stimuli] = MFC.readscript(filepath)
-	for stim_line in stimuli:
-		for stim_name in target_stimuli:
-			if stim_name in stim_line and not stim_line in selected_stimuli:
-				selected_stimuli.append(stim_line)
-# print(selected_stimuli)
-MFC.writescript(args.output, top_of_script, bottom_of_script, selected_stimuli)
+	selected_stimuli = select_stimuli(target_stimuli)
+	# print(selected_stimuli)
+	MFC.writestimuli(args.output, top_of_script, bottom_of_script, len(selected_stimuli), selected_stimuli)
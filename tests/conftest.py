@@ -0,0 +1,16 @@
+import os, subprocess, sys
+import pytest
+
+# the scripts are run from the repository directory, and import each other from there
+SCRIPTS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS)
+
+@pytest.fixture
+def run_script():
+	# runs one of the command line scripts in a directory and returns the finished process
+	def run(script, arguments, cwd, check=True):
+		process = subprocess.run([sys.executable, os.path.join(SCRIPTS, script)] + [str(a) for a in arguments], cwd=cwd, capture_output=True, text=True)
+		if check and process.returncode != 0:
+			raise AssertionError(script+' failed:\n'+process.stdout+process.stderr)
+		return process
+	return run
@@ -0,0 +1,25 @@
+HEADER = 'speaker,token_id,duration\n'
+# tok2 is measured twice in the first file, and again in the second
+FIRST = HEADER + 's01,tok1,0.1\ns01,tok2,0.2\ns01,tok2,0.25\ns01,tok3\n'
+SECOND = HEADER + 's01,tok3,0.3\ns01,tok2,0.22\n\n'
+
+def combine(run_script, directory, keep):
+	(directory / 'a.csv').write_text(FIRST)
+	(directory / 'b.csv').write_bytes(SECOND.encode('utf-16'))
+	process = run_script('combine_one_script_outs.py', ['--inputs', 'a.csv', 'b.csv', '--keep', keep, '--out', 'out.csv'], directory)
+	return (directory / 'out.csv').read_text(), process.stdout
+
+def test_keep_last(tmp_path, run_script):
+	output, log = combine(run_script, tmp_path, 'last')
+	assert output == HEADER + 's01,tok1,0.1\ns01,tok3,0.3\ns01,tok2,0.22\n'
+	assert 'reading b.csv as utf-16' in log
+	assert 'skipped 2 lines and 2 blank or incomplete lines' in log
+
+def test_keep_last_within_one_file(tmp_path, run_script):
+	(tmp_path / 'a.csv').write_text(FIRST)
+	run_script('combine_one_script_outs.py', ['--inputs', 'a.csv', '--keep', 'last', '--out', 'out.csv'], tmp_path)
+	assert (tmp_path / 'out.csv').read_text() == HEADER + 's01,tok1,0.1\ns01,tok2,0.25\n'
+
+def test_keep_first(tmp_path, run_script):
+	output, log = combine(run_script, tmp_path, 'first')
+	assert output == HEADER + 's01,tok1,0.1\ns01,tok2,0.2\ns01,tok3,0.3\n'
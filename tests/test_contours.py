@@ -0,0 +1,30 @@
+import numpy as np
+import contours as C
+
+def test_vmmin_finds_the_minimum_of_each_row():
+	centers = np.array([[1, 2], [-3, 0.5], [10, -4]])
+	def fn(B, rows):
+		return ((B - centers[rows])**2 * [1, 10]).sum(axis=1)
+	b, f, failed = C.vmmin(fn, np.zeros((3, 2)))
+	np.testing.assert_allclose(b, centers, atol=1e-6)
+	assert (f < 1e-12).all() and not failed.any()
+
+def test_vmmin_matches_r_on_rosenbrock():
+	# optim(c(-1.2, 1), fr, method='BFGS') in R gives 0.9998044 0.9996084
+	def fn(B, rows):
+		return 100*(B[:, 1] - B[:, 0]**2)**2 + (1 - B[:, 0])**2
+	b, f, failed = C.vmmin(fn, np.array([[-1.2, 1], [2, 2]]))
+	np.testing.assert_allclose(b[0], [0.9998044, 0.9996084], atol=1e-7)
+	np.testing.assert_allclose(b[1], [1, 1], atol=1e-3)
+	assert not failed.any()
+
+def test_vmmin_fails_rows_that_are_not_finite():
+	def fn(B, rows):
+		value = (B**2).sum(axis=1)
+		value[rows == 1] = np.nan
+		return value
+	b, f, failed = C.vmmin(fn, np.ones((2, 2)))
+	assert failed.tolist() == [False, True]
+	np.testing.assert_allclose(b[0], [0, 0], atol=1e-6)
+	# the row that failed is left where it started
+	assert b[1].tolist() == [1, 1]
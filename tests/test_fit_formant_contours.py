@@ -0,0 +1,48 @@
+import csv
+import numpy as np
+
+POINTS = [20, 30, 40, 50, 60, 70, 80]
+
+def write_input(path):
+	# rising F1 contours, and one token with too few measurements to fit
+	rows = []
+	for n in range(4):
+		values = [round(400 + (200 + 20*n) / (1 + np.exp(-(p - 50) / (8 + n))), 1) for p in POINTS]
+		rows.append(['t'+str(n), 's01', 'HOUSE', 'AW1'] + values)
+	rows.append(['t4', 's01', 'OUT', 'AW1'] + ['--undefined--'] * len(POINTS))
+	with open(path, 'w', newline='') as f:
+		writer = csv.writer(f, lineterminator='\n')
+		writer.writerow(['token_id', 'speaker', 'word', 'phone'] + ['F1_'+str(p) for p in POINTS])
+		writer.writerows(rows)
+
+def read_output(path):
+	with open(path, newline='') as f:
+		return list(csv.DictReader(f))
+
+def test_one_job_fits_without_a_pool(tmp_path, run_script):
+	write_input(tmp_path / 'out.csv')
+	run_script('fit_formant_contours.py', ['--input', 'out.csv', '--formants', 'F1', '--jobs', '1', '--output', 'one.csv'], tmp_path)
+	run_script('fit_formant_contours.py', ['--input', 'out.csv', '--formants', 'F1', '--jobs', '2', '--output', 'two.csv'], tmp_path)
+	one = read_output(tmp_path / 'one.csv')
+	assert [row['token_id'] for row in one] == ['t0', 't1', 't2', 't3', 't4']
+	assert one == read_output(tmp_path / 'two.csv')
+	assert abs(float(one[0]['F1_crossover']) - float(one[3]['F1_crossover'])) < 0.1
+	assert one[4]['F1_baseline'] == 'NA'
+
+def test_warm_start(tmp_path, run_script):
+	write_input(tmp_path / 'out.csv')
+	run_script('fit_formant_contours.py', ['--input', 'out.csv', '--formants', 'F1', '--jobs', '1', '--output', 'first.csv'], tmp_path)
+	result = run_script('fit_formant_contours.py', ['--input', 'out.csv', '--formants', 'F1', '--jobs', '1', '--warm_start', 'first.csv', '--output', 'second.csv'], tmp_path)
+	assert 'starting from the logistic parameters in first.csv for 5 tokens' in result.stdout
+	for first, second in zip(read_output(tmp_path / 'first.csv'), read_output(tmp_path / 'second.csv')):
+		if first['F1_baseline'] != 'NA':
+			assert abs(float(first['F1_peak']) - float(second['F1_peak'])) < 1
+
+	# an earlier run without the logistic columns of this formant
+	with open(tmp_path / 'first.csv', newline='') as f:
+		rows = list(csv.reader(f))
+	with open(tmp_path / 'dropped.csv', 'w', newline='') as f:
+		csv.writer(f, lineterminator='\n').writerows([[v for v, name in zip(row, rows[0]) if not name in ['F1_peak', 'F1_slope']] for row in rows])
+	result = run_script('fit_formant_contours.py', ['--input', 'out.csv', '--formants', 'F1', '--jobs', '1', '--warm_start', 'dropped.csv'], tmp_path, check=False)
+	assert result.returncode == 2
+	assert 'dropped.csv has no F1_peak, F1_slope columns' in result.stderr
@@ -0,0 +1,54 @@
+import numpy as np
+import formant_stats as FS
+
+# F1, F2 of two phones, with an undefined F2
+X = np.array([[700, 1200], [720, 1250], [650, np.nan], [300, 2300], [310, 2250], [690, 1190], [320, 2200]])
+PHONES = [('AA',), ('AA',), ('AA',), ('IY',), ('IY',), ('AA',), ('IY',)]
+
+def test_means_and_covariance():
+	moments = FS.Moments(['F1', 'F2'])
+	moments.add(moments.codes(PHONES), X)
+	assert moments.keys == [('AA',), ('IY',)]
+	assert moments.rows.tolist() == [4, 3]
+	# colMeans(na.rm=TRUE), and the covariance of the complete rows
+	np.testing.assert_allclose(moments.column_means()[0], [(700+720+650+690)/4, (1200+1250+1190)/3])
+	assert np.isnan(moments.column_means(na_rm=False)[0, 1])
+	np.testing.assert_allclose(moments.covariance()[0], np.cov(X[[0, 1, 5]].T))
+	np.testing.assert_allclose(moments.covariance()[1], np.cov(X[[3, 4, 6]].T))
+
+def test_remove_is_the_inverse_of_add():
+	moments = FS.Moments(['F1', 'F2'])
+	codes = moments.codes(PHONES)
+	moments.add(codes[:4], X[:4])
+	moments.add(codes[4:], X[4:])
+	moments.remove(codes[[1, 4]], X[[1, 4]])
+	kept = [0, 2, 3, 5, 6]
+	expected = FS.Moments(['F1', 'F2'])
+	expected.add(expected.codes([PHONES[i] for i in kept]), X[kept])
+	for name in ['rows', 'col_n', 'col_sum', 'n', 'mean', 'M2']:
+		np.testing.assert_allclose(getattr(moments, name), getattr(expected, name), atol=1e-9)
+
+def test_merge_and_unmerge():
+	a = FS.group_moments(np.zeros(3, dtype=np.int64), X[[0, 1, 5]])[4:]
+	b = FS.group_moments(np.zeros(2, dtype=np.int64), X[[3, 4]])[4:]
+	n, mean, M2 = FS.merge_moments(a, b)
+	rows = X[[0, 1, 5, 3, 4]]
+	assert n.tolist() == [5]
+	np.testing.assert_allclose(mean[0], rows.mean(axis=0))
+	np.testing.assert_allclose(M2[0] / 4, np.cov(rows.T))
+	for x, y in zip(FS.unmerge_moments((n, mean, M2), b), a):
+		np.testing.assert_allclose(x, y, atol=1e-9)
+	# taking everything out leaves nothing
+	n, mean, M2 = FS.unmerge_moments((n, mean, M2), (n, mean, M2))
+	assert n.tolist() == [0] and not mean.any() and not M2.any()
+
+def test_combine_and_inverse_covariance():
+	moments = FS.Moments(['F1', 'F2'])
+	moments.add(moments.codes(PHONES), X)
+	both = moments.combine({('all',): [0, 1]})
+	complete = X[~np.isnan(X).any(axis=1)]
+	np.testing.assert_allclose(both.covariance()[0], np.cov(complete.T))
+	np.testing.assert_allclose(FS.inverse_covariance(both, 0), np.linalg.inv(np.cov(complete.T)))
+	one = FS.Moments(['F1', 'F2'])
+	one.add(one.codes([('AA',)]), X[:1])
+	assert FS.inverse_covariance(one, 0) is None
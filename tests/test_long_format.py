@@ -0,0 +1,51 @@
+import numpy as np
+import long_format as LF
+
+# t1 has two candidates from formants(keep_all=1): the second row starts the
+# formant columns after right2, and has cog at the end
+WIDE = '''speaker,token_id,phone,phonestart,phoneend,right2,duration,total_formants,F1_25,F1_75,F2_25,F2_75,cog
+s01,t1,AA,1.0,1.2,#,0.2,5,700,720,1200,1250
+s01,t1,AA,1.0,1.2,#,5.5,710,730,1210,1260,3000
+s01,t2,IY,2.0,2.1,#,0.1,5,300,--undefined--,2300,2250,4000
+s02,t3,AA,3.0,3.4,#,0.4,5,650,660,1100,1150,2500
+'''
+
+def make_dataset(directory):
+	(directory / 'wide.csv').write_text(WIDE)
+	# two rows a chunk, so t1 and t3 end up in different blocks
+	assert LF.convert(str(directory / 'wide.csv'), str(directory / 'long'), chunk_rows=2) == 3
+	return LF.LongDataset(str(directory / 'long'))
+
+def test_tokens_table(tmp_path):
+	dataset = make_dataset(tmp_path)
+	assert dataset.phones() == ['AA', 'IY']
+	assert [block['phone'] for block in dataset.blocks] == ['AA', 'AA', 'IY']
+	tokens = dataset.read(phones=['AA'], table='tokens')
+	assert tokens['token_id'].tolist() == ['t1', 't1', 't3']
+	assert tokens['candidate'].tolist() == [0, 1, 0]
+	assert tokens['total_formants'].tolist() == [5, 5.5, 5]
+	# every candidate gets the duration before formants() and the cog after it
+	assert tokens['duration'].tolist() == [0.2, 0.2, 0.4]
+	assert tokens['cog'].tolist() == [3000, 3000, 2500]
+
+def test_measurements_table(tmp_path):
+	dataset = make_dataset(tmp_path)
+	iy = dataset.read(['row', 'parameter', 'formant', 'x', 'pct', 't', 'value', 'token_id'], phones=['IY'])
+	assert iy['row'].tolist() == [0, 0, 0, 0]
+	assert iy['parameter'].tolist() == ['F', 'F', 'F', 'F']
+	assert iy['formant'].tolist() == [1, 1, 2, 2]
+	assert iy['x'].tolist() == [1, 2, 1, 2]
+	assert iy['pct'].tolist() == [25, 75, 25, 75]
+	np.testing.assert_allclose(iy['t'], [2.025, 2.075, 2.025, 2.075])
+	np.testing.assert_array_equal(iy['value'], [300, np.nan, 2300, 2250])
+	assert iy['token_id'].tolist() == ['t2'] * 4
+
+	everything = dataset.read(['row', 'value'])
+	assert everything['row'].tolist() == np.repeat([0, 1, 2, 3], 4).tolist()
+	assert everything['value'][4:8].tolist() == [710, 730, 1210, 1260]
+
+def test_mixed_column_is_read_as_text(tmp_path):
+	(tmp_path / 'wide.csv').write_text(WIDE.replace('s02,t3', '2,t3'))
+	LF.convert(str(tmp_path / 'wide.csv'), str(tmp_path / 'long'), chunk_rows=2)
+	# s01 in the first block, 2 in the second
+	assert LF.LongDataset(str(tmp_path / 'long')).read(['speaker'], phones=['AA'], table='tokens')['speaker'].tolist() == ['s01', 's01', '2']
@@ -0,0 +1,75 @@
+import os, wave
+import numpy as np
+
+MFC_SCRIPT = '''"ooTextFile"
+"ExperimentMFC 5"
+stimuliAreSounds? <yes>
+stimulusFileNameHead = "clips_2024Jun12_10h30m33/"
+stimulusFileNameTail = ".wav"
+stimulusCarrierBefore = ""
+stimulusCarrierAfter = ""
+stimulusInitialSilenceDuration = 0.25 seconds
+stimulusMedialSilenceDuration = 0
+numberOfDifferentStimuli = 2
+    "rec1_1_5_HOUSE" "HOUSE"
+    "rec1_2_0_OUT,rec2_7_25_OUT" "OUT"
+numberOfReplicationsPerStimulus = 1
+breakAfterEvery = 0
+randomize = <PermuteBalancedNoDoublets>
+
+maximumNumberOfReplays = 1000
+
+responsesAreSounds? <no> "" "" "" "" 0 0
+numberOfDifferentResponses = 2
+    0.1 0.495 0.60 0.85 "A" 40 "" "A"
+    0.505 0.9 0.60 0.85 "B" 40 "" "B"
+numberOfGoodnessCategories = 0
+'''
+
+# 8-bit mono clips at 100 Hz, with odd numbers of samples
+CLIPS = {'rec1_1_5_HOUSE': bytes([10, 11, 12]), 'rec1_2_0_OUT': bytes([20, 21, 22, 23, 24]), 'rec2_7_25_OUT': bytes([30])}
+
+def write_inputs(directory, script=MFC_SCRIPT, sample_widths={}):
+	(directory / 'one_script_out_2024Jun12_10h30m33_MFC.praat').write_text(script)
+	os.makedirs(directory / 'clips_2024Jun12_10h30m33')
+	for name, samples in CLIPS.items():
+		with wave.open(str(directory / 'clips_2024Jun12_10h30m33' / (name+'.wav')), 'wb') as w:
+			w.setnchannels(1)
+			w.setsampwidth(sample_widths.get(name, 1))
+			w.setframerate(100)
+			w.writeframes(samples * sample_widths.get(name, 1))
+
+def test_bundle_has_every_clip_with_gaps(tmp_path, run_script):
+	write_inputs(tmp_path)
+	run_script('make_editor_mfc.py', ['--timestamp', '2024Jun12_10h30m33', '--gap', '0.02'], tmp_path)
+
+	bundle = tmp_path / 'one_script_out_2024Jun12_10h30m33_editor_mfc_bundle.wav'
+	with wave.open(str(bundle)) as w:
+		samples = w.readframes(w.getnframes())
+	# 8-bit samples are unsigned, so the gaps are 128s
+	assert samples == bytes([10, 11, 12, 128, 128, 20, 21, 22, 23, 24, 128, 128, 30])
+	data = bundle.read_bytes()
+	assert len(data) % 2 == 0
+	assert int.from_bytes(data[4:8], 'little') == len(data) - 8
+
+	with open(tmp_path / 'one_script_out_2024Jun12_10h30m33_editor_mfc_bundle.tsv') as f:
+		rows = [line.rstrip('\n').split('\t') for line in f]
+	assert rows == [['stimulus', 'word', 'start', 'end'], ['rec1_1_5_HOUSE', 'HOUSE', '0', '0.03'], ['rec1_2_0_OUT,rec2_7_25_OUT', 'OUT', '0.05', '0.13']]
+	script = (tmp_path / 'one_script_out_2024Jun12_10h30m33_editor_mfc.praat').read_text()
+	assert 'bundle$ = "one_script_out_2024Jun12_10h30m33_editor_mfc_bundle"' in script
+	assert 'endPause: "A", "B", 2' in script
+
+def test_empty_session_is_skipped(tmp_path, run_script):
+	write_inputs(tmp_path, MFC_SCRIPT.replace('= 2\n', '= 0\n').replace('    "rec1_1_5_HOUSE" "HOUSE"\n    "rec1_2_0_OUT,rec2_7_25_OUT" "OUT"\n', ''))
+	result = run_script('make_editor_mfc.py', ['--timestamp', '2024Jun12_10h30m33'], tmp_path)
+	assert 'has no stimuli' in result.stdout
+	assert sorted([p.name for p in tmp_path.glob('*editor_mfc*')]) == []
+
+def test_clips_that_cannot_be_bundled(tmp_path, run_script):
+	# a 16-bit clip after an 8-bit one
+	write_inputs(tmp_path, sample_widths={'rec1_2_0_OUT': 2})
+	result = run_script('make_editor_mfc.py', ['--timestamp', '2024Jun12_10h30m33'], tmp_path, check=False)
+	assert result.returncode == 2
+	assert 'rec1_2_0_OUT.wav does not have the same sampling rate and sample format' in result.stderr
+	# the unfinished bundle is removed
+	assert sorted([p.name for p in tmp_path.glob('*editor_mfc*')]) == []
@@ -0,0 +1,158 @@
+import csv, os, stat, sys
+import measurement_cache as MC
+
+BASE = ['s01', 'rec1', 'rec1', '2', 'rec1_2_HOUSE_1.000', 'rec1_2_HOUSE_AW1_1.100', 'THE', 'HOUSE', 'AND', 'AW1', '1.100', '1.250', 'DH', 'AH0', 'HH', 'S', '"#"', 'AE1', '']
+
+def test_split_operations_and_normalize():
+	assert MC.split_operations('formants(output_formants=5,bandwidths=1),duration()') == ['formants(output_formants=5,bandwidths=1)', 'duration()']
+	assert MC.split_operations(' ') == []
+	assert MC.normalize_operation('formants(output_formants=5, bandwidths=1)') == MC.normalize_operation('formants(bandwidths=1,output_formants=5)')
+
+def test_split_and_join_one_row():
+	row = BASE + ['0.12', '700', '1400', '2500']
+	base, segments = MC.split_token([row], [1, 3])
+	assert base == BASE
+	assert segments == [[['0.12']], [['700', '1400', '2500']]]
+	assert MC.join_token(base, segments) == [row]
+	assert MC.split_token([row], [1, 2]) == (BASE, None)
+
+def test_split_and_join_keep_all():
+	# duration(), formants(keep_all=1) with three candidates, then cog(): the
+	# first candidate follows duration, the others follow the base columns,
+	# and cog is at the end of the last row
+	rows = [BASE + ['0.15', '5000', '690', '1390'],
+		BASE + ['5500', '700', '1410'],
+		BASE + ['6000', '720', '1450', '4321.5']]
+	base, segments = MC.split_token(rows, [1, 3, 1])
+	assert segments == [[['0.15']], [['5000', '690', '1390'], ['5500', '700', '1410'], ['6000', '720', '1450']], [['4321.5']]]
+	assert MC.join_token(base, segments) == rows
+	# the same candidates measured on their own, joined to results from the cache
+	assert MC.join_token(base, [[['0.15']], segments[1], [['4321.5']]]) == rows
+
+def test_join_refuses_two_operations_with_candidates():
+	assert MC.join_token(BASE, [[['1'], ['2']], [['3'], ['4']]]) == None
+
+def test_token_groups():
+	other = BASE[:5] + ['rec1_2_HOUSE_S_1.250'] + BASE[6:]
+	assert [len(g) for g in MC.token_groups([BASE + ['1'], BASE + ['2'], other + ['3']])] == [2, 1]
+
+def test_parse_size():
+	assert MC.parse_size('500M') == 500 * 2**20
+	assert MC.parse_size('1.5G') == int(1.5 * 2**30)
+	assert MC.parse_size('1000') == 1000
+
+def test_writes_files():
+	assert MC.writes_files('duration(),clips(pad=0.1)')
+	assert MC.writes_files('mfcc(wav=0)')
+	assert not MC.writes_files('duration(),formants(keep_all=1)')
+
+def test_result_key_depends_on_textgrid_and_file_list_row(tmp_path):
+	cache = MC.MeasurementCache(str(tmp_path / 'cache.sqlite'))
+	row = ['s01', '/phon/rec1.wav', '/phon/rec1.TextGrid', 'female']
+	key = cache.result_key('wavhash', 'tghash', row, BASE, 'pitches()', '30')
+	cache.put_results([(key, 'pitches()', [['210.5']])], '30')
+	assert cache.get_results([key]) == {key: [['210.5']]}
+	assert cache.result_key('wavhash', 'tghash', row, BASE, 'pitches( )', '30') == key
+	changed = [cache.result_key('wavhash', 'tghash', row[:3] + ['male'], BASE, 'pitches()', '30'),
+		cache.result_key('wavhash', 'tghash2', row, BASE, 'pitches()', '30'),
+		cache.result_key('wavhash', 'tghash', row, BASE, 'pitches()', '31')]
+	assert cache.get_results(changed) == {}
+	cache.close()
+
+def test_invalidate_and_evict(tmp_path):
+	cache = MC.MeasurementCache(str(tmp_path / 'cache.sqlite'))
+	cache.put_results([('a', 'formants()', [['1']]), ('b', 'formants(keep_all=1)', [['2'], ['3']]), ('c', 'duration()', [['4']])], '30')
+	assert cache.invalidate('formants(keep_all=1)') == 1
+	assert sorted(cache.get_results(['a', 'b', 'c'])) == ['a', 'c']
+	assert cache.invalidate('formants') == 1
+	assert cache.evict(0) == 1
+	assert cache.get_results(['c']) == {}
+	cache.close()
+
+def test_invalidate_one_operation_of_a_version(tmp_path):
+	cache = MC.MeasurementCache(str(tmp_path / 'cache.sqlite'))
+	cache.put_results([('a', 'formants()', [['1']]), ('b', 'duration()', [['2']])], '30')
+	cache.put_results([('c', 'formants()', [['3']])], '31')
+	for operation, version in [('formants()', '30'), ('duration()', '30'), ('formants()', '31')]:
+		cache.put_header(operation, version, [operation.split('(')[0]])
+	assert cache.invalidate('formants', '30') == 1
+	assert cache.get_header('formants()', '30') == None
+	# the other operation of that version, and the operation in other versions, are left alone
+	assert cache.get_header('duration()', '30') == ['duration']
+	assert cache.get_header('formants()', '31') == ['formants']
+	assert sorted(cache.get_results(['a', 'b', 'c'])) == ['b', 'c']
+	cache.close()
+
+# ONE_SCRIPT_PARALLEL.PY WITH A STAND-IN FOR PRAAT
+
+# it writes one token per recording, with pitches() taking its value from the
+# gender column (as the real procedure takes its pitch range from it), and
+# clips() writing a clip. each call is logged, to see whether Praat ran
+FAKE_PRAAT = '''import csv, os, sys
+script, file_list, phon_string, operations, options, exclude = sys.argv[2:]
+with open(os.environ['FAKE_PRAAT_CALLS'], 'a') as f:
+	f.write(operations+'\\n')
+with open(file_list, newline='') as f:
+	rows = list(csv.DictReader(f))
+header = 'speaker,textgrid,sound,phonetier,word_id,token_id,leftword,word,rightword,phone,phonestart,phoneend,left2,left1,left,right,right1,right2,speech_overlap'
+columns = {'pitches': 'pitch_mean', 'duration': 'duration', 'clips': 'stimulus'}
+names = [o.split('(')[0] for o in operations.split('),')]
+with open('one_script_out_x.csv', 'w') as out:
+	out.write(header+''.join([','+columns[name] for name in names])+'\\n')
+	for row in rows:
+		sound = os.path.basename(row['wav']).replace('.wav', '')
+		values = {'pitches': row['gender']+'_pitch', 'duration': '0.1', 'clips': sound+'_1_0_HOUSE'}
+		out.write(','.join([row['speaker'], sound, sound, '2', sound+'_2_HOUSE_1.000', sound+'_2_HOUSE_AW1_1.100', 'THE', 'HOUSE', 'AND', 'AW1', '1.1', '1.25', 'DH', 'AH0', 'HH', 'S', '#', 'AE1', ''] + [values[name] for name in names])+'\\n')
+		if 'clips' in names:
+			os.makedirs('clips_x', exist_ok=True)
+			open(os.path.join('clips_x', sound+'_1_0_HOUSE.wav'), 'wb').close()
+open('one_script_log_x.txt', 'w').close()
+'''
+
+def make_corpus(directory, gender):
+	with open(directory / 'rec1.wav', 'wb') as f:
+		f.write(b'not really a wav file')
+	with open(directory / 'rec1.TextGrid', 'w') as f:
+		f.write('not really a TextGrid\n')
+	with open(directory / 'files.csv', 'w', newline='') as f:
+		csv.writer(f, lineterminator='\n').writerows([['speaker', 'wav', 'textgrid', 'gender'], ['s01', 'rec1.wav', 'rec1.TextGrid', gender]])
+	praat = directory / 'fakepraat'
+	praat.write_text('#!'+sys.executable+'\n'+FAKE_PRAAT)
+	praat.chmod(praat.stat().st_mode | stat.S_IEXEC)
+	return praat
+
+def run_parallel(run_script, directory, praat, operations, workdir):
+	run_script('one_script_parallel.py', ['files.csv', 'AW1', operations, '--praat', praat, '--jobs', 1, '--workdir', workdir, '--cache', 'cache.sqlite'], directory)
+	outputs = sorted([f for f in os.listdir(directory) if f.startswith('one_script_out_')])
+	with open(directory / outputs[-1]) as f:
+		rows = [line.rstrip('\n').split(',') for line in f]
+	os.remove(directory / outputs[-1])
+	return rows
+
+def praat_calls(directory):
+	with open(directory / 'calls.txt') as f:
+		return [line.rstrip('\n') for line in f]
+
+def test_changed_file_list_row_is_measured_again(tmp_path, run_script, monkeypatch):
+	monkeypatch.setenv('FAKE_PRAAT_CALLS', str(tmp_path / 'calls.txt'))
+	praat = make_corpus(tmp_path, 'female')
+	rows = run_parallel(run_script, tmp_path, praat, 'pitches(),duration()', 'w1')
+	assert rows[1][-2:] == ['female_pitch', '0.1']
+	rows = run_parallel(run_script, tmp_path, praat, 'pitches(),duration()', 'w2')
+	assert rows[1][-2:] == ['female_pitch', '0.1']
+	assert praat_calls(tmp_path).count('pitches(),duration()') == 1
+
+	# the speaker's gender is corrected in the file list
+	make_corpus(tmp_path, 'male')
+	rows = run_parallel(run_script, tmp_path, praat, 'pitches(),duration()', 'w3')
+	assert rows[1][-2:] == ['male_pitch', '0.1']
+	assert praat_calls(tmp_path).count('pitches(),duration()') == 2
+
+def test_operations_that_write_files_always_run_praat(tmp_path, run_script, monkeypatch):
+	monkeypatch.setenv('FAKE_PRAAT_CALLS', str(tmp_path / 'calls.txt'))
+	praat = make_corpus(tmp_path, 'female')
+	for workdir in ['w1', 'w2']:
+		rows = run_parallel(run_script, tmp_path, praat, 'duration(),clips()', workdir)
+		assert rows[1][-1] == 'rec1_1_0_HOUSE'
+		assert os.path.exists(tmp_path / workdir / 'row_1' / 'clips_x' / 'rec1_1_0_HOUSE.wav')
+	assert praat_calls(tmp_path) == ['duration(),clips()', 'duration(),clips()']
@@ -0,0 +1,64 @@
+import praatmfc as MFC
+
+TOP = '''"ooTextFile"
+"ExperimentMFC 5"
+stimuliAreSounds? <yes>
+stimulusFileNameHead = "clips/"
+stimulusFileNameTail = ".wav"
+stimulusCarrierBefore = ""
+stimulusCarrierAfter = ""
+stimulusInitialSilenceDuration = 0.25 seconds
+stimulusMedialSilenceDuration = 0
+'''
+BOTTOM = '''numberOfReplicationsPerStimulus = 1
+breakAfterEvery = 0
+randomize = <PermuteBalancedNoDoublets>
+responsesAreSounds? <no> "" "" "" "" 0 0
+numberOfDifferentResponses = 2
+    0.1 0.495 0.60 0.85 "A" 40 "" "A"
+    0.505 0.9 0.60 0.85 "NA" 40 "" "NA"
+numberOfGoodnessCategories = 0
+'''
+STIMULI = '''numberOfDifferentStimuli = 4
+    "rec1_1_5_HOUSE" "HOUSE"
+    "rec1_3_25_HOUSE" "HOUSE"
+    "rec1_4_0_OUT" "OUT"
+    "rec2_0_75_HOUSE" "HOUSE"
+'''
+RESPONSES = '''subject,stimulus,response,reactionTime
+Jeff,rec1_1_5_HOUSE,NA,1.2
+Jeff,rec1_3_25_HOUSE,NA,0.9
+Jeff,rec1_4_0_OUT,A,1.0
+Quynh,rec2_0_75_HOUSE,NA,1.4
+'''
+
+def write_inputs(directory):
+	(directory / 'session.praat').write_text(TOP+STIMULI+BOTTOM)
+	(directory / 'responses.csv').write_text(RESPONSES)
+
+def test_filter_then_group(tmp_path, run_script):
+	write_inputs(tmp_path)
+	run_script('mfc_pipeline.py', ['--mfc', 'session.praat', '--stages', 'filter,group', '--csv', 'responses.csv', '--response', 'NA', '--raters', 'Jeff', '--isi', '0.5', '--output', 'out.praat'], tmp_path)
+	script = MFC.MFCScript(str(tmp_path / 'out.praat'))
+	# Quynh's response isn't Jeff's, and rec1_4_0_OUT wasn't NA
+	assert list(script.rows()) == [('rec1_1_5_HOUSE,rec1_3_25_HOUSE', 'HOUSE')]
+	assert script.header('stimulusMedialSilenceDuration') == '0.5 seconds'
+
+def test_filter_after_group_is_refused(tmp_path, run_script):
+	write_inputs(tmp_path)
+	for stages in ['group,filter', 'filter,group,filter']:
+		process = run_script('mfc_pipeline.py', ['--mfc', 'session.praat', '--stages', stages, '--csv', 'responses.csv', '--response', 'NA', '--output', 'out.praat'], tmp_path, check=False)
+		assert process.returncode != 0
+		assert 'filter has to come before group' in process.stderr
+	assert not (tmp_path / 'out.praat').exists()
+
+def test_shuffle_with_a_seed_and_split(tmp_path, run_script):
+	write_inputs(tmp_path)
+	orders = []
+	for output in ['a.praat', 'b.praat']:
+		run_script('mfc_pipeline.py', ['--mfc', 'session.praat', '--stages', 'shuffle,split', '--seed', '3', '--max', '3', '--output', output], tmp_path)
+		parts = [MFC.MFCScript(str(tmp_path / output.replace('.praat', '_'+suffix+'.praat'))) for suffix in ['1_of_2', '2_of_2']]
+		assert [len(part) for part in parts] == [3, 1]
+		orders.append([name for part in parts for name, word in part.rows()])
+	assert orders[0] == orders[1]
+	assert sorted(orders[0]) == sorted(['rec1_1_5_HOUSE', 'rec1_3_25_HOUSE', 'rec1_4_0_OUT', 'rec2_0_75_HOUSE'])
@@ -0,0 +1,32 @@
+import csv, wave
+import numpy as np
+import textgrids as TG
+
+def write_matches(path, tokens):
+	with open(path, 'w', newline='') as f:
+		writer = csv.DictWriter(f, TG.MATCH_HEADER+TG.EXTRA_HEADER, restval='', lineterminator='\n')
+		writer.writeheader()
+		for n, (sound, word_start, word_end) in enumerate(tokens):
+			writer.writerow({'speaker': 's01', 'sound': sound, 'token_id': str(n), 'word': 'HOUSE', 'wav_file': sound+'.wav', 'word_start': word_start, 'word_end': word_end})
+
+def test_unreadable_recording_has_no_frames(tmp_path, run_script):
+	with wave.open(str(tmp_path / 'rec1.wav'), 'wb') as w:
+		w.setnchannels(1)
+		w.setsampwidth(2)
+		w.setframerate(16000)
+		w.writeframes(np.random.default_rng(1).integers(-3000, 3000, 16000, dtype='<i2').tobytes())
+	(tmp_path / 'rec2.wav').write_bytes(b'not really a wav file')
+	write_matches(tmp_path / 'matches.csv', [('rec1', '0.2', '0.5'), ('rec2', '0.2', '0.5'), ('missing', '0.1', '0.3')])
+
+	process = run_script('mfcc_features.py', ['--matches', 'matches.csv', '--jobs', '1', '--output', 'out'], tmp_path)
+	assert 'could not read rec2.wav' in process.stdout
+	assert 'could not read missing.wav' in process.stdout
+	assert '2 tokens in 2 recordings that could not be read have 0 frames' in process.stdout
+
+	features = np.load(str(tmp_path / 'out' / 'mfcc.npy'))
+	with open(tmp_path / 'out' / 'index.csv', newline='') as f:
+		index = list(csv.DictReader(f))
+	assert [row['frames'] for row in index[1:]] == ['0', '0']
+	assert int(index[0]['frames']) > 0
+	assert not np.isnan(features[0, :int(index[0]['frames'])]).any()
+	assert np.isnan(features[1:]).all()
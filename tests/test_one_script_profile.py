@@ -0,0 +1,44 @@
+import csv, json
+
+def write_profile(path, formant_seconds, duration_seconds=0.001):
+	# one file with two tokens, each measured with formants() and duration(),
+	# and a line cut off at the end
+	events = [{'event': 'file', 'row': 1, 'textgrid': 'missing.TextGrid', 'wav': 'missing.wav', 'wav_read': 1, 'seconds': 1.0, 'read_textgrid': 0.2, 'read_sound': 0.1, 'measure': 0.5, 'tokens': 2, 'objects': 3}]
+	for t, token_id in enumerate(['s1_2_CAT_AE1_0.100', 's1_2_TEAM_IY1_0.550']):
+		events.append({'event': 'operation', 'row': 1, 'token_id': token_id, 'operation': 'formants', 'arguments': '', 'seconds': formant_seconds[t], 'objects': 4})
+		events.append({'event': 'operation', 'row': 1, 'token_id': token_id, 'operation': 'duration', 'arguments': '', 'seconds': duration_seconds, 'objects': 1})
+		events.append({'event': 'token', 'row': 1, 'token_id': token_id, 'seconds': formant_seconds[t] + duration_seconds})
+	events.append({'event': 'run', 'version': '30', 'phon_string': 'VOWEL', 'operations': 'formants(),duration()', 'options': 't', 'files': 1, 'tokens': 2, 'audio_seconds': 60, 'seconds': 1.5})
+	path.write_text('\n'.join([json.dumps(e) for e in events])+'\n{"event": "tok')
+
+def test_operation_totals(tmp_path, run_script):
+	write_profile(tmp_path / 'one_script_profile_a.jsonl', [0.1, 0.3])
+	result = run_script('one_script_profile.py', [str(tmp_path), '--output', 'operations.csv'], tmp_path)
+	assert '1 lines were not complete events' in result.stdout
+	assert 'one_script version 30' in result.stdout
+	# the time in the file that isn't reading or measuring is scanning
+	assert '  %-32s %10.3f s' % ('scan', 0.2) in result.stdout
+	with open(str(tmp_path / 'operations.csv')) as f:
+		operations = dict([(row['operation'], row) for row in csv.DictReader(f)])
+	assert sorted(operations) == ['duration()', 'formants()']
+	formants = operations['formants()']
+	assert (formants['tokens'], formants['seconds'], formants['tokens_per_second'], formants['mean_ms'], formants['max_ms'], formants['max_objects']) == ('2', '0.4', '5.0', '200.0', '300.0', '4')
+	assert (operations['duration()']['tokens'], operations['duration()']['seconds']) == ('2', '0.002')
+	# the slowest token, with its slowest operation
+	assert 'row 1 s1_2_TEAM_IY1_0.550 0.301 s (mostly formants(), 0.300 s)' in result.stdout
+
+def test_regressions(tmp_path, run_script):
+	(tmp_path / 'before').mkdir()
+	(tmp_path / 'after').mkdir()
+	write_profile(tmp_path / 'before' / 'one_script_profile_a.jsonl', [0.1, 0.3])
+	# 20% slower
+	write_profile(tmp_path / 'after' / 'one_script_profile_b.jsonl', [0.12, 0.36])
+	same = run_script('one_script_profile.py', [str(tmp_path / 'after'), '--compare', str(tmp_path / 'before')], tmp_path)
+	assert 'no regressions compared with' in same.stdout
+	slower = run_script('one_script_profile.py', [str(tmp_path / 'after'), '--compare', str(tmp_path / 'before'), '--tolerance', '0.1'], tmp_path, check=False)
+	assert slower.returncode == 1
+	assert '1 REGRESSIONS compared with' in slower.stdout
+	assert '  formants() 200.000 ms per token -> 240.000 ms per token' in slower.stdout
+	# changes of less than 0.1 ms per token are not regressions, however large
+	write_profile(tmp_path / 'after' / 'one_script_profile_b.jsonl', [0.1, 0.3], duration_seconds=0.00105)
+	assert run_script('one_script_profile.py', [str(tmp_path / 'after'), '--compare', str(tmp_path / 'before'), '--tolerance', '0'], tmp_path, check=False).returncode == 0
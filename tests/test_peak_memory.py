@@ -0,0 +1,18 @@
+import sys
+import peak_memory as PM
+
+def test_peak_of_a_small_tool_does_not_include_the_parent(tmp_path):
+	seconds, small_parent, returncode = PM.run([sys.executable, '-c', 'pass'])
+	assert returncode == 0
+	# 300 MB held (and touched) by this process while the tool runs
+	held = bytearray(b'\x01') * (300 * 2**20)
+	seconds, big_parent, returncode = PM.run([sys.executable, '-c', 'pass'])
+	assert big_parent < small_parent + 50
+	del held
+
+def test_peak_of_a_big_tool_and_its_exit_status(tmp_path):
+	with open(tmp_path / 'output.txt', 'w') as output:
+		seconds, peak, returncode = PM.run([sys.executable, '-c', 'import sys, time; x = bytearray(b"\\x01") * (200 * 2**20); time.sleep(0.05); print("done"); sys.exit(3)'], str(tmp_path), output)
+	assert returncode == 3
+	assert peak >= 200
+	assert (tmp_path / 'output.txt').read_text() == 'done\n'
@@ -0,0 +1,85 @@
+import praatmfc as MFC
+
+SCRIPT = '''"ooTextFile"
+"ExperimentMFC 5"
+stimuliAreSounds? <yes>
+stimulusFileNameHead = "clips/"
+stimulusFileNameTail = ".wav"
+stimulusCarrierBefore = ""
+stimulusCarrierAfter = ""
+stimulusInitialSilenceDuration = 0.25 seconds
+stimulusMedialSilenceDuration = 0
+numberOfDifferentStimuli = 3
+    "rec1_1_5_HOUSE" "HOUSE"
+    "rec1_3_25_HOUSE" "HOUSE"
+    "s01_rec2_4_0_OUT" "OUT"
+numberOfReplicationsPerStimulus = 1
+breakAfterEvery = 0
+randomize = <PermuteBalancedNoDoublets>
+responsesAreSounds? <no> "" "" "" "" 0 0
+numberOfDifferentResponses = 2
+    0.1 0.495 0.60 0.85 "A" 40 "" "A"
+    0.505 0.9 0.60 0.85 "NA" 40 "" "NA"
+numberOfGoodnessCategories = 0
+'''
+
+def test_read_and_write(tmp_path):
+	(tmp_path / 'in.praat').write_text(SCRIPT)
+	script = MFC.MFCScript(str(tmp_path / 'in.praat'))
+	assert len(script) == script.stated_number_of_stimuli == 3
+	assert list(script.rows()) == [('rec1_1_5_HOUSE', 'HOUSE'), ('rec1_3_25_HOUSE', 'HOUSE'), ('s01_rec2_4_0_OUT', 'OUT')]
+	assert script.word_labels == ['HOUSE', 'OUT']
+	assert script.header('stimulusInitialSilenceDuration') == '0.25 seconds'
+	assert script.header('breakAfterEvery') == '0'
+	assert script.responses() == ['A', 'NA']
+
+	script.write(str(tmp_path / 'out.praat'))
+	assert (tmp_path / 'out.praat').read_text() == SCRIPT
+	script.write(str(tmp_path / 'part.praat'), [2, 0], top=MFC.with_header(script.top, 'stimulusMedialSilenceDuration', '0.5 seconds'))
+	part = MFC.MFCScript(str(tmp_path / 'part.praat'))
+	assert list(part.rows()) == [('s01_rec2_4_0_OUT', 'OUT'), ('rec1_1_5_HOUSE', 'HOUSE')]
+	assert part.header('stimulusMedialSilenceDuration') == '0.5 seconds'
+	assert part.bottom == script.bottom
+
+def test_read_responses(tmp_path):
+	(tmp_path / 'responses.csv').write_text('subject,stimulus,response,reactionTime\nJeff,rec1_1_5_HOUSE,NA,1.2\n\nQuynh,"rec1_1_5_HOUSE,rec1_3_25_HOUSE",A,0.9\n')
+	assert list(MFC.read_responses(str(tmp_path / 'responses.csv'))) == [('Jeff', 'rec1_1_5_HOUSE', 'NA', '1.2'), ('Quynh', 'rec1_1_5_HOUSE,rec1_3_25_HOUSE', 'A', '0.9')]
+
+def test_group_rows():
+	assert MFC.parse_clip_name('s01_rec2_4_0_OUT') == ('s01_rec2', 4.0, 'OUT')
+	rows = [('rec1_1_5_HOUSE', 'HOUSE'), ('s01_rec2_4_0_OUT', 'OUT'), ('rec1_3_25_HOUSE', 'HOUSE')]
+	assert list(MFC.group_rows(rows)) == [('rec1_1_5_HOUSE,rec1_3_25_HOUSE', 'HOUSE'), ('s01_rec2_4_0_OUT', 'OUT')]
+
+def test_stimulus_table_and_lookups(tmp_path):
+	(tmp_path / 'in.praat').write_text(SCRIPT)
+	script = MFC.MFCScript(str(tmp_path / 'in.praat'))
+	assert [script.discourses[d] for d in script.discourse] == ['rec1', 'rec1', 's01_rec2']
+	assert list(script.clip_start) == [1.5, 3.25, 4.0]
+	assert script.raw_line(2) == '    "s01_rec2_4_0_OUT" "OUT"\n'
+	assert list(script.rows_with_word('HOUSE')) == [0, 1]
+	assert list(script.rows_with_word('IN')) == []
+	assert script.index('rec1_3_25_HOUSE') == 1
+	assert script.index('rec1_3_25') == None
+	assert 's01_rec2_4_0_OUT' in script and not 'rec2_4_0_OUT' in script
+
+def test_grouped_stimuli_are_found_by_each_clip(tmp_path):
+	script = MFC.MFCScript()
+	for n in range(1000):
+		script.add('rec'+str(n)+'_1_0_HOUSE', 'HOUSE')
+	script.add('rec5_1_0_HOUSE,rec7_1_0_HOUSE', 'HOUSE')
+	assert len(script.names) == 1001 and script.names[-1] == 'rec5_1_0_HOUSE,rec7_1_0_HOUSE'
+	assert script.lookup('rec5_1_0_HOUSE') == [5, 1000]
+	assert script.lookup('rec5_1_0_HOUSE', clips=False) == [5]
+	assert script.lookup('rec5_1_0_HOUSE,rec7_1_0_HOUSE') == [1000]
+	assert script.lookup('rec999_1_0_HOUSE') == [999]
+	assert list(script.mark(['rec7_1_0_HOUSE', 'nothing'])).count(1) == 2
+
+def test_reading_several_scripts(tmp_path):
+	(tmp_path / 'a.praat').write_text(SCRIPT)
+	(tmp_path / 'b.praat').write_text(SCRIPT.replace('= 3', '= 2').replace('    "rec1_1_5_HOUSE" "HOUSE"\n', '').replace('s01_rec2', 's02_rec3'))
+	script = MFC.MFCScript()
+	script.read(str(tmp_path / 'a.praat'), unique=True)
+	script.read(str(tmp_path / 'b.praat'), unique=True)
+	assert list(script.names) == ['rec1_1_5_HOUSE', 'rec1_3_25_HOUSE', 's01_rec2_4_0_OUT', 's02_rec3_4_0_OUT']
+	assert script.raw_line(3) == '    "s02_rec3_4_0_OUT" "OUT"\n'
+	assert list(MFC.select_rows(script.rows(), script, script.mark(['s02_rec3_4_0_OUT', 'rec1_1_5_HOUSE']))) == [('rec1_1_5_HOUSE', 'HOUSE'), ('s02_rec3_4_0_OUT', 'OUT')]
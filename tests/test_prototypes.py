@@ -0,0 +1,67 @@
+import os
+import numpy as np
+import prototypes as PR
+
+# two parameters, so the matrix rows are 2 x 2 inverted covariance matrices.
+# UW has no F1 mean, and ER's matrix is incomplete so it isn't a prototype
+PROTOTYPES = '''type,phone,F1_50,B1_50
+means,AA,700,2
+matrix,AA,0.0001,0
+matrix,AA,0,4
+means,UW,--undefined--,2.1
+matrix,UW,0.0004,0
+matrix,UW,0,1
+means,ER,500,2
+matrix,ER,0.0001,0
+'''
+
+def test_bundle_round_trip(tmp_path):
+	(tmp_path / 'test_prototypes.csv').write_text(PROTOTYPES)
+	path = str(tmp_path / 'test_prototypes.csv')
+	parsed = PR.Prototypes(path)
+	assert parsed.phones == ['AA', 'UW']
+	assert parsed.log_scale.tolist() == [False, True]
+
+	loaded = PR.load(path)
+	assert os.path.exists(str(tmp_path / 'test_prototypes.protobin'))
+	assert loaded.phones == parsed.phones and loaded.params == parsed.params
+	np.testing.assert_array_equal(loaded.means, parsed.means)
+	np.testing.assert_array_equal(loaded.inv_cov, parsed.inv_cov)
+	np.testing.assert_allclose(loaded.log_det, [np.log(1/0.0004), np.log(1/0.0004)])
+
+	# 100 Hz and 0.5 from AA's means; UW's undefined mean counts as 9999; no prototype for ER
+	distances = loaded.distances(loaded.phone_codes(['AA', 'UW', 'ER']), [[800, 2.5], [300, 2.1], [500, 2]])
+	np.testing.assert_allclose(distances, [np.sqrt(1 + 1), 0.02*9999, 1])
+
+def test_touched_csv_is_hashed_once(tmp_path, monkeypatch):
+	(tmp_path / 'test_prototypes.csv').write_text(PROTOTYPES)
+	path = str(tmp_path / 'test_prototypes.csv')
+	PR.load(path)
+	stat = os.stat(path)
+	os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+	hashed = []
+	fingerprint = PR.csv_fingerprint
+	monkeypatch.setattr(PR, 'csv_fingerprint', lambda p: hashed.append(p) or fingerprint(p))
+	for n in range(3):
+		assert PR.load(path).phones == ['AA', 'UW']
+	assert hashed == [path]
+	assert PR.read_bundle(str(tmp_path / 'test_prototypes.protobin')).bundle_info['csv_mtime'] == stat.st_mtime_ns + 10**9
+
+	# new contents are compiled again
+	(tmp_path / 'test_prototypes.csv').write_text(PROTOTYPES.replace('means,AA,700', 'means,AA,710'))
+	assert PR.load(path).means[0, 0] == 710
+
+def test_truncated_bundle_is_compiled_again(tmp_path):
+	(tmp_path / 'test_prototypes.csv').write_text(PROTOTYPES)
+	path = str(tmp_path / 'test_prototypes.csv')
+	bundle = tmp_path / 'test_prototypes.protobin'
+	PR.load(path)
+	data = bundle.read_bytes()
+	# cut off in the arrays, in the phone names, in the header, and empty
+	for size in [len(data) - 8, PR.BUNDLE_HEADER.size + 10, 12, 0]:
+		bundle.write_bytes(data[:size])
+		loaded = PR.load(path)
+		assert loaded.phones == ['AA', 'UW']
+		np.testing.assert_array_equal(loaded.means, [[700, 2], [np.nan, 2.1]])
+		assert bundle.read_bytes() == data
@@ -0,0 +1,59 @@
+import numpy as np
+import responses as R
+
+# Jeff changes his mind about s2, and only his last response counts
+JEFF = '''subject,stimulus,response,reactionTime
+Jeff,s1,A,1.0
+Jeff,s2,NA,2.0
+Jeff,s2,A,1.5
+Jeff,s3,NA,0.5
+Jeff,s4,NA,undefined
+'''
+QUYNH = '''subject,stimulus,response,reactionTime
+Quynh,s1,A,0.8
+Quynh,s2,NA,1.1
+Quynh,s3,NA,0.9
+Quynh,"s4",NA,1.2
+'''
+
+def make_store(directory):
+	(directory / 'jeff.csv').write_text(JEFF)
+	(directory / 'quynh.csv').write_text(QUYNH)
+	store = R.ResponseStore(str(directory / 'responses.npz'))
+	assert store.ingest(str(directory / 'jeff.csv')) == 5
+	assert store.ingest(str(directory / 'quynh.csv')) == 4
+	return store
+
+def test_ratings_and_consensus(tmp_path):
+	store = make_store(tmp_path)
+	assert store.raters == ['Jeff', 'Quynh'] and store.responses == ['A', 'NA']
+	assert store.ratings().tolist() == [[0, 0, 1, 1], [0, 1, 1, 1]]
+	best, share, n = store.consensus()
+	# s2 is a tie
+	assert best.tolist() == [0, -1, 1, 1]
+	assert share.tolist() == [1, 0.5, 1, 1]
+	# Jeff's responses (columns) against Quynh's (rows)
+	assert store.confusion(0, reference=store.ratings()[1]).tolist() == [[1, 0], [1, 2]]
+
+def test_kappa(tmp_path):
+	store = make_store(tmp_path)
+	kappa, n = store.cohen_kappa()
+	# 3 of 4 agree, and chance agreement is .5 x .25 + .5 x .75
+	np.testing.assert_allclose(kappa, [[1, 0.5], [0.5, 1]])
+	assert n.tolist() == [[4, 4], [4, 4]]
+	# Fleiss: mean agreement .75, chance (3/8)^2 + (5/8)^2
+	assert np.isclose(store.fleiss_kappa(), (0.75 - 34/64) / (1 - 34/64))
+
+def test_save_load_and_ingest_again(tmp_path):
+	store = make_store(tmp_path)
+	store.save()
+	loaded = R.ResponseStore(str(tmp_path / 'responses.npz'))
+	assert loaded.stimuli == ['s1', 's2', 's3', 's4']
+	assert loaded.ratings().tolist() == store.ratings().tolist()
+	assert np.isnan(loaded.reaction_time[4]) and loaded.reaction_time[5] == 0.8
+	assert loaded.ingest(str(tmp_path / 'jeff.csv')) == None
+	# a changed file replaces its rows
+	(tmp_path / 'quynh.csv').write_text(QUYNH.replace('s2,NA', 's2,A'))
+	assert loaded.ingest(str(tmp_path / 'quynh.csv')) == 4
+	assert len(loaded) == 9
+	assert loaded.ratings().tolist() == [[0, 0, 1, 1], [0, 0, 1, 1]]
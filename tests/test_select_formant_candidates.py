@@ -0,0 +1,40 @@
+PROTOTYPES = '''type,phone,F1_50,B1_50
+means,AA,700,2
+matrix,AA,0.0001,0
+matrix,AA,0,4
+'''
+
+# duration(), formants(keep_all=1) and cog(): the first candidate of a token
+# follows duration, the others follow the basic token columns, and cog is at
+# the end of the last one. ZZ has no prototype
+KEEP_ALL = '''speaker,token_id,phone,right2,duration,total_formants,F1_50,B1_50,mdist,best,cog
+s01,t1,AA,#,0.12,5000,900,100,0,1
+s01,t1,AA,#,5500,700,100,0,0
+s01,t1,AA,#,6000,650,1000,0,0,4321
+s01,t2,ZZ,#,0.2,5000,500,50,0,0,1234
+'''
+
+def select(run_script, directory, best_only):
+	(directory / 'test_prototypes.csv').write_text(PROTOTYPES)
+	(directory / 'out.csv').write_text(KEEP_ALL)
+	process = run_script('select_formant_candidates.py', ['--input', 'out.csv', '--prototypes', 'test_prototypes.csv', '--best_only', best_only, '--output', 'selected.csv'], directory)
+	return (directory / 'selected.csv').read_text(), process.stdout
+
+def test_mahalanobis_distances_and_best_candidate(tmp_path, run_script):
+	output, log = select(run_script, tmp_path, 'False')
+	# distances of (200 Hz, 0), (0, 0) and (-50 Hz, 1) from AA's means, with B1 on a log10 scale
+	assert output == '''speaker,token_id,phone,right2,duration,total_formants,F1_50,B1_50,mdist,best,cog
+s01,t1,AA,#,0.12,5000,900,100,2.000,0
+s01,t1,AA,#,5500,700,100,0.000,1
+s01,t1,AA,#,6000,650,1000,2.062,0,4321
+s01,t2,ZZ,#,0.2,5000,500,50,1.000,1,1234
+'''
+	assert 'scored 4 candidates for 2 tokens' in log
+	assert '2 tokens have a different best candidate' in log
+
+def test_best_only(tmp_path, run_script):
+	output, log = select(run_script, tmp_path, 'True')
+	assert output == '''speaker,token_id,phone,right2,duration,total_formants,F1_50,B1_50,mdist,best,cog
+s01,t1,AA,#,0.12,5500,700,100,0.000,1,4321
+s01,t2,ZZ,#,0.2,5000,500,50,1.000,1,1234
+'''
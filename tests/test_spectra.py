@@ -0,0 +1,106 @@
+import wave
+import numpy as np
+import spectra as SP
+
+RATE = 16000
+
+def make_recording(path, x):
+	with wave.open(str(path), 'wb') as w:
+		w.setnchannels(1)
+		w.setsampwidth(2)
+		w.setframerate(RATE)
+		w.writeframes(np.round(np.asarray(x) * 32767).astype('<i2').tobytes())
+	return SP.Recording(str(path))
+
+def tone(frequency, seconds, amplitude=0.5):
+	return amplitude * np.sin(2 * np.pi * frequency * np.arange(int(round(seconds * RATE))) / RATE)
+
+def times(start, end):
+	return {name: np.array([value]) for name, value in [('phone_start', start), ('phone_end', end), ('lastphone_start', start), ('nextphone_end', end)]}
+
+def test_cog_of_a_pure_tone(tmp_path):
+	recording = make_recording(tmp_path / 'tone.wav', tone(1000, 0.5))
+	# 100 cycles in 0.1 s
+	cog = float(SP.measure_operation(recording, times(0.2, 0.3), 'cog()')[0][0])
+	assert abs(cog - 1000) < 10
+	cogs = SP.measure_operation(recording, times(0.1, 0.4), 'cogs(measurements=3)')[0]
+	np.testing.assert_allclose([float(c) for c in cogs[:3]], [0.1, 0.4, 0.15])
+	assert all([abs(float(c) - 1000) < 20 for c in cogs[3:]])
+	# cog_pro measures the middle of the phone, within its band
+	assert abs(float(SP.measure_operation(recording, times(0.1, 0.4), 'cog_pro(from_freq=500,to_freq=2000)')[0][0]) - 1000) < 20
+	recording.close()
+
+def test_band_energy_of_white_noise_is_its_energy(tmp_path):
+	x = np.random.default_rng(1).uniform(-0.5, 0.5, RATE)
+	recording = make_recording(tmp_path / 'noise.wav', x)
+	first, n = recording.sample_ranges(np.array([0.1]), np.array([0.13]))
+	samples = recording.samples[first[0]:first[0]+n[0], 0] / recording.scale
+	measured = recording.measure([0.1], [0.13], bands=[(0, RATE/2), (0, 2000), (2000, RATE/2)], moments=False)
+	# Parseval: all of the band energy is the sum of squares times the sampling period
+	energy = measured['energy'][0]
+	assert np.isclose(energy[0], (samples**2).sum() / RATE)
+	assert np.isclose(energy[1] + energy[2], energy[0])
+	# white noise has about as much energy in each Hz
+	assert 0.15 < energy[1] / energy[0] < 0.35
+	recording.close()
+
+def test_band_energy_diff(tmp_path):
+	# 1500-2500 Hz is 20 dB above 3500-5500 Hz, and then 20 dB below it
+	louder_low = tone(2000, 0.2) + tone(4500, 0.2, 0.05)
+	louder_high = tone(2000, 0.2, 0.05) + tone(4500, 0.2)
+	recording = make_recording(tmp_path / 'tones.wav', np.concatenate([louder_low, louder_high]))
+	assert SP.measure_operation(recording, times(0.05, 0.15), 'band_energy_diff()')[0] == ['20']
+	assert SP.measure_operation(recording, times(0.25, 0.35), 'band_energy_diff()')[0] == ['-20']
+	recording.close()
+
+def test_moments_of_known_spectra():
+	power = np.zeros((2, 5))
+	# the same power at 100 and 300 Hz
+	power[0, [1, 3]] = 1
+	# three times as much at 0 Hz as at 400 Hz: a Bernoulli distribution with p = .25
+	power[1, [0, 4]] = [3, 1]
+	moments = SP.spectral_moments(power, 100)
+	np.testing.assert_allclose(moments['cog'], [200, 100])
+	np.testing.assert_allclose(moments['std'], [100, np.sqrt(400**2 * 0.25 * 0.75)])
+	np.testing.assert_allclose(moments['skew'], [0, 0.5 / np.sqrt(0.1875)], atol=1e-12)
+	np.testing.assert_allclose(moments['kurt'], [-2, (1 - 6 * 0.1875) / 0.1875])
+	# no spread, no skewness or kurtosis
+	single = np.zeros((1, 5))
+	single[0, 2] = 1
+	assert np.isnan(SP.spectral_moments(single, 100)['skew'][0])
+
+def test_spec_window_windows_and_zero_padding(tmp_path):
+	# three 30 ms windows (480 samples, padded to 512), each with its own tone
+	recording = make_recording(tmp_path / 'tones.wav', np.concatenate([tone(1000, 0.03), tone(3000, 0.03), tone(5000, 0.03)]))
+	assert [SP.fft_size(n) for n in [1, 480, 512, 513]] == [2, 512, 512, 1024]
+	batches = [(list(rows), power.shape, df) for rows, power, df in recording.power_spectra([0, 0, 0.01], [0.03, 0.04, 0.04])]
+	assert batches == [([0, 2], (2, 257), RATE / 512), ([1], (1, 513), RATE / 1024)]
+	# the windows are computed over the samples of each window, not the padding
+	np.testing.assert_allclose(SP.window_shape('Hanning', np.array([4]), 6)[0, :4], 0.5 - 0.5 * np.cos(2 * np.pi * (np.arange(4) + 0.5) / 4))
+	values = SP.measure_operation(recording, times(0, 0.09), 'spec_window(num_windows=3,cog=1,std=1)')[0]
+	assert SP.operation_columns('spec_window(num_windows=3,cog=1,std=1)') == ['cog_1', 'std_1', 'cog_2', 'std_2', 'cog_3', 'std_3']
+	assert [abs(float(values[i]) - f) < 50 for i, f in [(0, 1000), (2, 3000), (4, 5000)]] == [True, True, True]
+	recording.close()
+
+def test_spectrum_info(tmp_path):
+	recording = make_recording(tmp_path / 'tone.wav', tone(2000, 0.2))
+	table = SP.spectrum_info(recording, 0.05, 0.1)
+	np.testing.assert_allclose(table['time'], 0.05 + 0.005 * np.arange(11))
+	assert sorted(table) == sorted(['time', 'cog', 'banddiff', 'banddiffdelta', '0-500', '500-1k', '1k-1500', '1500-2500', '2500-3500'])
+	assert table['banddiffdelta'][0] == 0
+	assert (abs(table['cog'] - 2000) < 50).all()
+	# all of a 2000 Hz tone's energy is in 1500-2500 Hz
+	assert (table['banddiff'] < -30).all()
+	recording.close()
+
+def test_operation_columns_and_supports():
+	assert SP.operation_columns('cog()') == ['cog']
+	assert SP.operation_columns('cogs(measurements=3)') == ['first_measure', 'last_measure', 'step', 'C1', 'C2', 'C3']
+	assert SP.operation_columns('band_energy()') == ['band_energy_750_11025']
+	assert SP.operation_columns('band_energy(from_freq=1000, to_freq=4000.5)') == ['band_energy_1000_4000.5']
+	assert SP.operation_columns('moments()')[:5] == ['cog_avg', 'sd_avg', 'skew_avg', 'kurt_avg', 'cog_1']
+	assert len(SP.operation_columns('moments()')) == 16
+	assert [SP.supports(o) for o in ['cog()', 'cogs()', 'band_energy_diff()', 'spec_window(cog=1)', 'moments(minHz=500)']] == [True] * 5
+	assert [SP.supports(o) for o in ['formants()', 'mfcc()', 'cogs(measurements=0)', 'spec_window(only_clips)', 'spec_window(band_low=5000,band_high=1000)']] == [False] * 5
+	# with skip_band, the band doesn't matter
+	assert SP.supports('spec_window(skip_band=1,band_low=5000,band_high=1000)')
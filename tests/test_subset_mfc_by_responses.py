@@ -0,0 +1,79 @@
+import praatmfc as MFC
+
+TOP = '''"ooTextFile"
+"ExperimentMFC 5"
+stimuliAreSounds? <yes>
+stimulusFileNameHead = "clips/"
+stimulusFileNameTail = ".wav"
+stimulusCarrierBefore = ""
+stimulusCarrierAfter = ""
+stimulusInitialSilenceDuration = 0.25 seconds
+stimulusMedialSilenceDuration = 0
+'''
+BOTTOM = '''numberOfReplicationsPerStimulus = 1
+breakAfterEvery = 0
+randomize = <PermuteBalancedNoDoublets>
+responsesAreSounds? <no> "" "" "" "" 0 0
+numberOfDifferentResponses = 2
+    0.1 0.495 0.60 0.85 "A" 40 "" "A"
+    0.505 0.9 0.60 0.85 "NA" 40 "" "NA"
+numberOfGoodnessCategories = 0
+'''
+# the second session has a grouped line (two clips played together)
+SESSIONS = ['''numberOfDifferentStimuli = 3
+    "rec1_1_5_HOUSE" "HOUSE"
+    "rec1_3_25_HOUSE" "HOUSE"
+    "rec1_4_0_OUT" "OUT"
+''', '''numberOfDifferentStimuli = 2
+    "rec2_0_75_HOUSE,rec2_2_0_HOUSE" "HOUSE"
+    "rec3_1_0_OUT" "OUT"
+''']
+# Quynh's file names the grouped line by its first clip
+RESPONSES = {'Jeff': '''subject,stimulus,response,reactionTime
+s1,rec1_1_5_HOUSE,NA,1.2
+s1,rec1_3_25_HOUSE,NA,0.9
+s1,rec1_4_0_OUT,A,1.0
+s1,"rec2_0_75_HOUSE,rec2_2_0_HOUSE",NA,1.4
+s1,rec3_1_0_OUT,A,0.8
+''', 'Quynh': '''subject,stimulus,response,reactionTime
+s2,rec1_1_5_HOUSE,A,1.1
+s2,rec1_3_25_HOUSE,A,0.7
+s2,rec1_4_0_OUT,A,1.3
+s2,rec2_0_75_HOUSE,NA,1.0
+s2,rec3_1_0_OUT,NA,0.6
+'''}
+
+def write_inputs(directory):
+	for n, session in enumerate(SESSIONS):
+		(directory / ('DFD469_'+str(n+1)+'.praat')).write_text(TOP+session+BOTTOM)
+	for rater in RESPONSES:
+		(directory / (rater+'_first43.csv')).write_text(RESPONSES[rater])
+
+def stimulus_names(path):
+	script = MFC.MFCScript(str(path))
+	assert script.stated_number_of_stimuli == len(script)
+	return list(script.names)
+
+def test_batch_with_raters(tmp_path, run_script):
+	write_inputs(tmp_path)
+	run_script('subset_mfc_by_responses.py', ['--batch', 'True', '--mfc', 'DFD469_*.praat', '--csv', '*.csv', '--raters', 'Jeff,Quynh'], tmp_path)
+	assert sorted([p.name for p in tmp_path.glob('DFD469_*_*.praat')]) == ['DFD469_Jeff_A.praat', 'DFD469_Jeff_NA.praat', 'DFD469_Quynh_A.praat', 'DFD469_Quynh_NA.praat']
+	# in the order of the MFC scripts, with the grouped line found by its whole name or by one of its clips
+	assert stimulus_names(tmp_path / 'DFD469_Jeff_NA.praat') == ['rec1_1_5_HOUSE', 'rec1_3_25_HOUSE', 'rec2_0_75_HOUSE,rec2_2_0_HOUSE']
+	assert stimulus_names(tmp_path / 'DFD469_Jeff_A.praat') == ['rec1_4_0_OUT', 'rec3_1_0_OUT']
+	assert stimulus_names(tmp_path / 'DFD469_Quynh_NA.praat') == ['rec2_0_75_HOUSE,rec2_2_0_HOUSE', 'rec3_1_0_OUT']
+	assert len(stimulus_names(tmp_path / 'DFD469_Quynh_A.praat')) == 3
+	assert (tmp_path / 'DFD469_Quynh_A.praat').read_text().endswith(BOTTOM)
+
+def test_batch_output_template(tmp_path, run_script):
+	write_inputs(tmp_path)
+	# without --raters, the raters are the subjects
+	run_script('subset_mfc_by_responses.py', ['--batch', 'True', '--mfc', 'DFD469_*.praat', '--csv', '*.csv', '--response', 'NA', '--output', 'subset_{response}_{rater}.praat'], tmp_path)
+	assert sorted([p.name for p in tmp_path.glob('subset_*.praat')]) == ['subset_NA_s1.praat', 'subset_NA_s2.praat']
+	assert len(stimulus_names(tmp_path / 'subset_NA_s1.praat')) == 3
+	assert len(stimulus_names(tmp_path / 'subset_NA_s2.praat')) == 2
+
+def test_one_response(tmp_path, run_script):
+	write_inputs(tmp_path)
+	run_script('subset_mfc_by_responses.py', ['--mfc', 'DFD469_*.praat', '--csv', '*Jeff*.csv', '--response', 'NA', '--output', 'Jeff_NA.praat'], tmp_path)
+	assert stimulus_names(tmp_path / 'Jeff_NA.praat') == ['rec1_1_5_HOUSE', 'rec1_3_25_HOUSE', 'rec2_0_75_HOUSE,rec2_2_0_HOUSE']
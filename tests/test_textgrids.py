@@ -0,0 +1,139 @@
+import csv, os
+import numpy as np
+import textgrids as TG
+
+WORDS = [(0, 0.3, 'CAT'), (0.3, 0.45, 'THE'), (0.45, 0.8, 'TEAM'), (0.8, 0.9, 'sp'), (0.9, 1.3, 'BELL'), (1.3, 1.6, 'REED')]
+PHONES = [(0, 0.1, 'K'), (0.1, 0.2, 'AE1'), (0.2, 0.3, 'T'), (0.3, 0.35, 'DH'), (0.35, 0.45, 'AH0'), (0.45, 0.55, 'T'), (0.55, 0.7, 'IY1'), (0.7, 0.8, 'M'), (0.8, 0.9, 'sp'),
+	(0.9, 1.0, 'B'), (1.0, 1.15, 'EH1'), (1.15, 1.3, 'L'), (1.3, 1.4, 'R'), (1.4, 1.5, 'IY1'), (1.5, 1.6, 'D')]
+# someone else talking over TEAM
+OTHER = [(0, 0.5, 'sp'), (0.5, 0.7, 'HI'), (0.7, 1.6, 'sp')]
+
+def make_tier(name, intervals):
+	tier = TG.Tier(name, 'IntervalTier', intervals[0][0], intervals[-1][1])
+	for start, end, label in intervals:
+		tier.starts.append(start)
+		tier.ends.append(end)
+		tier.labels.append(label)
+	return tier
+
+def make_corpus(directory, tiers=None, file_list='files.csv'):
+	if tiers == None:
+		tiers = [make_tier('words', WORDS), make_tier('phones', PHONES), make_tier('other words', OTHER)]
+	TG.write_textgrid(str(directory / 's1.TextGrid'), tiers)
+	(directory / file_list).write_text('speaker,wav,textgrid\ns1,'+str(directory / 's1.wav')+','+str(directory / 's1.TextGrid')+'\n')
+	rows = TG.read_file_list(str(directory / file_list))
+	index = TG.TextGridIndex()
+	index.update([row['textgrid'] for row in rows])
+	return index, rows
+
+def find(index, rows, *query):
+	return list(index.matches(TG.Query(*query), rows))
+
+def test_word_boundaries(tmp_path):
+	index, rows = make_corpus(tmp_path)
+	cat, team = find(index, rows, 'T')
+	assert (cat['word'], cat['left'], cat['left1'], cat['left2'], cat['right'], cat['right1'], cat['right2']) == ('CAT', 'AE1', 'K', '"#"', '"#"', 'DH', 'AH0')
+	assert (team['word'], team['left'], team['left1'], team['left2'], team['right'], team['right1'], team['right2']) == ('TEAM', '"#"', 'AH0', 'DH', 'IY1', 'M', '"#"')
+	assert (team['leftword'], team['rightword'], team['lastphone_start'], team['nextphone_end']) == ('THE', 'sp', '0.45', '0.7')
+	assert [m['word'] for m in find(index, rows, '#/T/VOWEL')] == ['TEAM']
+	assert [m['word'] for m in find(index, rows, 'VOWEL/T/#')] == ['CAT']
+	# without word boundaries (w), the phones of the next word are the context
+	assert find(index, rows, '#/T/VOWEL', 'w') == []
+	assert [(m['word'], m['left'], m['left1']) for m in find(index, rows, 'AH0/T/IY1', 'w')] == [('TEAM', 'AH0', 'DH')]
+
+def test_wildcards_and_liquids(tmp_path):
+	index, rows = make_corpus(tmp_path)
+	assert [(m['word'], m['phone']) for m in find(index, rows, 'STOP/VOWEL/')] == [('CAT', 'AE1'), ('TEAM', 'IY1'), ('BELL', 'EH1')]
+	assert [(m['word'], m['phone']) for m in find(index, rows, '/IY1/CONS')] == [('TEAM', 'IY1'), ('REED', 'IY1')]
+	# l joins a vowel to the liquid after it, r to the liquid before it
+	assert find(index, rows, 'EH1L') == []
+	bell, = find(index, rows, 'EH1L', 'l')
+	assert (bell['phone'], bell['phonestart'], bell['phoneend'], bell['right']) == ('EH1L', '1.000', '1.300', '"#"')
+	reed, = find(index, rows, 'RIY1', 'r')
+	assert (reed['phone'], reed['phonestart'], reed['phoneend'], reed['left']) == ('RIY1', '1.300', '1.500', '"#"')
+	# the joined phones are no longer vowels
+	assert [m['phone'] for m in find(index, rows, 'VOWEL', 'lr')] == ['AE1', 'AH0', 'IY1']
+
+def test_excluded_words_and_speech_overlap(tmp_path):
+	index, rows = make_corpus(tmp_path)
+	assert [m['word'] for m in find(index, rows, 'T', '', 'CAT')] == ['TEAM']
+	assert [m['word'] for m in find(index, rows, 'T', 'W', 'CAT;BELL')] == ['CAT']
+	assert [m['word'] for m in find(index, rows, 'DH')] == ['THE']
+	# THE is a function word
+	assert find(index, rows, 'DH', 'f') == []
+	# as in one_script, " sp " is never found in its comma-separated list of silences
+	assert [m['word'] for m in find(index, rows, 'sp')] == ['sp']
+	# the other word tier's labels during each phone, without its pauses
+	assert [(m['phone'], m['speech_overlap']) for m in find(index, rows, 'VOWEL')] == [('AE1', ''), ('AH0', ''), ('IY1', 'HI'), ('EH1', ''), ('IY1', '')]
+	assert [m['speech_overlap'] for m in find(index, rows, 'T')] == ['', 'HI']
+
+def test_default_and_listed_tiers(tmp_path):
+	index, rows = make_corpus(tmp_path)
+	match = find(index, rows, 'M')[0]
+	assert (match['phonetier'], match['wordtier'], match['token_id'], match['word_id']) == ('2', '1', 's1_2_TEAM_M_0.700', 's1_2_TEAM_0.450')
+	# with the phones first, the word tier is the one after the listed tier
+	index, rows = make_corpus(tmp_path, [make_tier('phones', PHONES), make_tier('words', WORDS)])
+	(tmp_path / 'files.csv').write_text('speaker,wav,textgrid,tier\ns1,s1.wav,'+str(tmp_path / 's1.TextGrid')+',1\n')
+	rows = TG.read_file_list(str(tmp_path / 'files.csv'))
+	match = find(index, rows, 'M')[0]
+	assert (match['phonetier'], match['wordtier'], match['word']) == ('1', '2', 'TEAM')
+
+def test_trigram_candidates_match_a_full_scan(tmp_path):
+	# a long TextGrid of random words made of random phones
+	random = np.random.default_rng(3)
+	labels = ['P', 'T', 'K', 'S', 'L', 'R', 'AE1', 'IY1', 'UW1', 'AH0', 'EH1']
+	words, phones = [], []
+	t = 0
+	for w in range(400):
+		start = t
+		for p in range(random.integers(1, 6)):
+			phones.append((t, t + 0.05, str(random.choice(labels))))
+			t += 0.05
+		words.append((start, t, 'W'+str(w)))
+	index, rows = make_corpus(tmp_path, [make_tier('words', words), make_tier('phones', phones)])
+	tiers = index.tiers(rows[0]['textgrid'])
+	for phon_string in ['T/AE1/K', 'STOP/VOWEL/S', 'L/IY1/R', 'P/UW1/#', 'VOWEL/T/VOWEL']:
+		query = TG.Query(phon_string, 'w' if phon_string == 'VOWEL/T/VOWEL' else '')
+		scan = [p for p in range(1, len(tiers[1])+1) if TG.transport(query, tiers[1], tiers[0], p) != None]
+		assert [int(m['phone_interval']) for m in index.matches(query, rows)] == scan
+	# the trigram postings are used, and narrow the candidates down
+	query = TG.Query('T/AE1/K')
+	assert len(TG.candidate_intervals(tiers[1], query)) < len(tiers[1].unigrams['AE1'])
+
+def test_index_is_reused_until_a_textgrid_changes(tmp_path):
+	index, rows = make_corpus(tmp_path)
+	path = str(tmp_path / 'files.tgindex')
+	assert TG.index_path(str(tmp_path / 'files.csv')) == path
+	index.save(path)
+	tg_path = rows[0]['textgrid']
+	# saved documents are reused as they are
+	reloaded = TG.TextGridIndex(path)
+	assert reloaded.update([tg_path]) == 0
+	assert reloaded.tiers(tg_path)[1].labels == [label for start, end, label in PHONES]
+	# a new modification time, with the same size
+	stat = os.stat(tg_path)
+	os.utime(tg_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+	assert reloaded.update([tg_path]) == 1
+	assert reloaded.update([tg_path]) == 0
+	# a new size, with the same modification time
+	stat = os.stat(tg_path)
+	TG.write_textgrid(tg_path, [make_tier('words', WORDS), make_tier('phones', PHONES[:-1] + [(1.5, 1.6, 'T')])])
+	os.utime(tg_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+	assert os.stat(tg_path).st_size != stat.st_size
+	assert reloaded.update([tg_path]) == 1
+	assert reloaded.tiers(tg_path)[1].labels[-1] == 'T'
+
+def test_textgrid_matches(tmp_path, run_script):
+	make_corpus(tmp_path)
+	first = run_script('textgrid_matches.py', [str(tmp_path / 'files.csv'), 'T', '', 'CAT', '--output', 'first.csv'], tmp_path)
+	assert 'indexed 1 of 1 TextGrids' in first.stdout
+	assert os.path.exists(str(tmp_path / 'files.tgindex'))
+	second = run_script('textgrid_matches.py', [str(tmp_path / 'files.csv'), 'T', '', 'CAT', '--output', 'second.csv'], tmp_path)
+	assert 'all 1 TextGrids were already in' in second.stdout
+	with open(str(tmp_path / 'second.csv')) as f:
+		matches = list(csv.DictReader(f))
+	assert list(matches[0]) == TG.MATCH_HEADER + TG.EXTRA_HEADER
+	assert [(m['word'], m['phonestart'], m['speech_overlap']) for m in matches] == [('TEAM', '0.450', 'HI')]
+	assert (tmp_path / 'first.csv').read_text() == (tmp_path / 'second.csv').read_text()
+	rebuilt = run_script('textgrid_matches.py', [str(tmp_path / 'files.csv'), 'T', '--rebuild', 'True', '--output', 'third.csv'], tmp_path)
+	assert 'indexed 1 of 1 TextGrids' in rebuilt.stdout
@@ -0,0 +1,47 @@
+import os, struct, wave
+import numpy as np
+import pytest
+import wavfiles as WAV
+
+def write_wav(path, rate, sample_width, frames):
+	with wave.open(str(path), 'wb') as w:
+		w.setnchannels(1)
+		w.setsampwidth(sample_width)
+		w.setframerate(rate)
+		w.writeframes(frames)
+
+def test_odd_sized_clip_has_a_pad_byte_and_a_matching_riff_size(tmp_path):
+	# 8-bit mono, 101 samples from 0.1 to 0.2 s
+	write_wav(tmp_path / 'source.wav', 1000, 1, bytes(range(256)) * 2)
+	source = WAV.WavFile(str(tmp_path / 'source.wav'))
+	WAV.write_clip(str(tmp_path / 'clip.wav'), source, 0.1, 0.201)
+	source.close()
+	data = open(tmp_path / 'clip.wav', 'rb').read()
+	assert len(data) % 2 == 0
+	assert struct.unpack_from('<I', data, 4)[0] == len(data) - 8
+	with wave.open(str(tmp_path / 'clip.wav')) as w:
+		assert w.getnframes() == 101
+		assert w.readframes(101) == bytes(range(100, 201))
+
+def test_clip_outside_the_file_is_padded_with_silence(tmp_path):
+	samples = np.arange(1, 11, dtype='<i2')
+	write_wav(tmp_path / 'source.wav', 100, 2, samples.tobytes())
+	source = WAV.WavFile(str(tmp_path / 'source.wav'))
+	assert source.sample_range(0.0, 0.1) == (0, 10)
+	x = source.samples(source.part(-0.02, 0.12))
+	source.close()
+	assert x[:, 0].tolist() == [0, 0] + [v / 32768 for v in range(1, 11)] + [0, 0]
+
+def test_scale_peak(tmp_path):
+	write_wav(tmp_path / 'source.wav', 100, 2, np.array([0, 1000, -2000, 500], dtype='<i2').tobytes())
+	source = WAV.WavFile(str(tmp_path / 'source.wav'))
+	WAV.write_clip(str(tmp_path / 'clip.wav'), source, 0, 0.04, scale_peak=True)
+	source.close()
+	with wave.open(str(tmp_path / 'clip.wav')) as w:
+		clip = np.frombuffer(w.readframes(4), dtype='<i2')
+	assert clip.tolist() == [0, round(0.99*32768/2), round(-0.99*32768), round(0.99*32768/4)]
+
+def test_too_much_for_a_wav_file():
+	with pytest.raises(ValueError, match='4 GB'):
+		WAV.wav_header(WAV.pcm16_fmt_chunk(1, 16000), 2**32 - 20)
+	assert len(WAV.wav_header(WAV.pcm16_fmt_chunk(1, 16000), 2**32 - 60)) == 44
@@ -0,0 +1,61 @@
+import argparse, csv, os, time
+import textgrids as TG
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='List the tokens one_script would measure for a phon_string, using an index of the TextGrids in a file list that is only updated when they change')
+parser.add_argument('file_list', help='the csv file list (speaker,wav,textgrid,...)')
+parser.add_argument('phon_string', help='the phon_string, e.g. S/AW1/TH')
+parser.add_argument('options', nargs='?', default='', help='the one_script options')
+parser.add_argument('exclude', nargs='?', default='', help='the words to exclude')
+parser.add_argument('--index', default='', help='where to keep the TextGrid index (default: next to the file list)')
+parser.add_argument('--rebuild', default='False', help='whether to parse every TextGrid again')
+parser.add_argument('--output', default='', help='what to call the match list')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/textgrid_matches.py /phon/Buckeye/buckeye_files.csv 'HH/AA1/COR' 'f' 'YEAH;OKAY'
+# (the match list has one_script's token columns, plus the times the acoustic measurements need)
+
+start_time = time.time()
+
+if args.index == '':
+	index_path = TG.index_path(args.file_list.split(':')[0])
+else:
+	index_path = args.index
+
+if args.output == '':
+	output_filename = 'one_script_matches_'+time.strftime('%Y%b%d_%Hh%Mm%S')+'.csv'
+else:
+	output_filename = args.output
+
+rows = TG.read_file_list(args.file_list)
+
+if args.rebuild == 'True':
+	index = TG.TextGridIndex()
+	index.path = index_path
+else:
+	index = TG.TextGridIndex(index_path)
+
+updated = index.update([row['textgrid'] for row in rows])
+if updated > 0:
+	index.save()
+index_time = time.time()
+
+query = TG.Query(args.phon_string, args.options, args.exclude)
+
+tokens = 0
+with open(output_filename, 'w', newline='') as out:
+	writer = csv.DictWriter(out, TG.MATCH_HEADER+TG.EXTRA_HEADER, lineterminator='\n')
+	writer.writeheader()
+	for match in index.matches(query, rows):
+		writer.writerow(match)
+		tokens += 1
+
+print('\n########################################')
+if updated > 0:
+	print('indexed', updated, 'of', len(rows), 'TextGrids in', round(index_time-start_time, 2), 'seconds (saved to', index_path+')')
+else:
+	print('all', len(rows), 'TextGrids were already in', index_path)
+print('found', tokens, 'tokens of', args.phon_string, 'in', round(1000*(time.time()-index_time)), 'ms')
+print('wrote', output_filename)
+print('########################################\n')
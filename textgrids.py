@@ -0,0 +1,678 @@
+import bisect, csv, itertools, os, pickle, re
+
+# a TextGridIndex keeps the parsed tiers of every TextGrid in a file list in
+# one pickled file (next to the file list by default), so that one_script
+# queries can be answered without reading the TextGrids again. a TextGrid is
+# only parsed again when its size or modification time changes.
+#
+# Query and TextGridIndex.matches() follow the transport procedure in
+# one_script.praat (version 30), including its word boundary, liquid (l and r
+# options) and excluded word handling. the wildcards (CONS, COR, NONSIB, etc.)
+# are read from one_script.praat and one_script_procedures.praat, so they are
+# always the same as the ones one_script uses.
+
+INDEX_VERSION = 1
+INDEX_EXTENSION = '.tgindex'
+
+# one_script's word boundary symbol includes the quotes
+BOUNDARY = '"#"'
+UNDEFINED = '--undefined--'
+LIQUIDS = ['L', 'R', 'r', 'l', 'ɻ', 'ɽ', 'ɾ', 'ɭ']
+SILENCES = ',,sp,sil,{sl},{SL},'
+
+MATCH_HEADER = ['speaker', 'textgrid', 'sound', 'phonetier', 'word_id', 'token_id', 'leftword', 'word', 'rightword', 'phone', 'phonestart', 'phoneend', 'left2', 'left1', 'left', 'right', 'right1', 'right2', 'speech_overlap']
+EXTRA_HEADER = ['wav_file', 'tg_file', 'wordtier', 'phone_interval', 'word_interval', 'phone_start', 'phone_end', 'duration', 'word_start', 'word_end', 'lastphone_start', 'nextphone_end', 'lastword_start', 'nextword_end']
+
+class Tier:
+
+	def __init__(self, name, kind, xmin, xmax):
+		self.name = name
+		self.kind = kind
+		self.xmin = xmin
+		self.xmax = xmax
+		self.starts = []
+		self.ends = []
+		self.labels = []
+		self.unigrams = {}
+		self.trigrams = {}
+
+	def __len__(self):
+		return len(self.labels)
+
+	def interval_at(self, t):
+		# like Get interval at time: 1-based, and 0 if t is outside the tier.
+		# the intervals of a tier never overlap, so a binary search over their
+		# start times finds the one containing t
+		if len(self.starts) == 0 or t < self.xmin or t > self.xmax:
+			return 0
+		return max(bisect.bisect_right(self.starts, t), 1)
+
+	def intervals_between(self, t1, t2):
+		return range(max(self.interval_at(t1), 1), self.interval_at(t2)+1)
+
+	def label(self, i):
+		return self.labels[i-1]
+
+	def start(self, i):
+		return self.starts[i-1]
+
+	def end(self, i):
+		return self.ends[i-1]
+
+	def make_postings(self):
+		# 1-based interval numbers of every label and of every label trigram
+		# (keyed by the label before, the label and the label after)
+		self.unigrams = {}
+		self.trigrams = {}
+		for i, label in enumerate(self.labels):
+			self.unigrams.setdefault(label, []).append(i+1)
+		for i in range(1, len(self.labels)-1):
+			self.trigrams.setdefault((self.labels[i-1], self.labels[i], self.labels[i+1]), []).append(i+1)
+
+	def copy(self):
+		tier = Tier(self.name, self.kind, self.xmin, self.xmax)
+		tier.starts = list(self.starts)
+		tier.ends = list(self.ends)
+		tier.labels = list(self.labels)
+		return tier
+
+	def remove_boundary(self, i):
+		# like Remove right boundary (the labels are joined, as in Praat)
+		self.ends[i-1] = self.ends[i]
+		self.labels[i-1] = self.labels[i-1] + self.labels[i]
+		del self.starts[i], self.ends[i], self.labels[i]
+
+	def extract_part(self, start, end, preserve_times=False):
+		# like Extract part: the intervals (or points) between start and end,
+		# cut off at start and end, and shifted to start at 0 unless preserve_times
+		start = max(start, self.xmin)
+		end = min(end, self.xmax)
+		shift = 0 if preserve_times else start
+		tier = Tier(self.name, self.kind, start-shift, end-shift)
+		first = bisect.bisect_left(self.ends, start)
+		for i in range(first, len(self.labels)):
+			if self.kind == 'IntervalTier':
+				if self.starts[i] >= end:
+					break
+				if self.ends[i] <= start:
+					continue
+				tier.starts.append(max(self.starts[i], start)-shift)
+				tier.ends.append(min(self.ends[i], end)-shift)
+				tier.labels.append(self.labels[i])
+			else:
+				if self.starts[i] > end:
+					break
+				if self.starts[i] >= start:
+					tier.starts.append(self.starts[i]-shift)
+					tier.ends.append(self.starts[i]-shift)
+					tier.labels.append(self.labels[i])
+		return tier
+
+# TEXTGRID FILES
+
+TOKEN = re.compile(r'"((?:[^"]|"")*)"|\[\s*\d+\s*\]|<\w+>|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+
+def read_text(path):
+	with open(path, 'rb') as f:
+		data = f.read()
+	if data.startswith(b'\xff\xfe') or data.startswith(b'\xfe\xff'):
+		return data.decode('utf-16')
+	if data.startswith(b'\xef\xbb\xbf'):
+		return data.decode('utf-8-sig')
+	try:
+		return data.decode('utf-8')
+	except UnicodeDecodeError:
+		return data.decode('latin-1')
+
+def read_textgrid(path):
+
+	# reads the long and short text formats: both have the same values in the
+	# same order, and only the long format labels them (xmin = ..., etc.)
+	values = []
+	for m in TOKEN.finditer(read_text(path)):
+		if m.group(1) != None:
+			values.append(m.group(1).replace('""', '"'))
+		elif m.group(2) != None:
+			values.append(float(m.group(2)))
+	if len(values) < 5 or values[1] != 'TextGrid':
+		raise ValueError(path+' is not a text TextGrid file')
+
+	tiers = []
+	n_tiers = int(values[4])
+	v = 5
+	for t in range(n_tiers):
+		kind, name, xmin, xmax, size = values[v:v+5]
+		v += 5
+		tier = Tier(name, kind, xmin, xmax)
+		if kind == 'IntervalTier':
+			for i in range(int(size)):
+				tier.starts.append(values[v])
+				tier.ends.append(values[v+1])
+				tier.labels.append(values[v+2])
+				v += 3
+		else:
+			for i in range(int(size)):
+				tier.starts.append(values[v])
+				tier.ends.append(values[v])
+				tier.labels.append(values[v+1])
+				v += 2
+		tiers.append(tier)
+	return tiers
+
+def praat_number(value):
+	# numbers the way Praat writes them (shortest form, and whole numbers without .0)
+	if value == None:
+		return UNDEFINED
+	if value == int(value):
+		return str(int(value))
+	return repr(value)
+
+def praat_quote(text):
+	return '"'+text.replace('"', '""')+'"'
+
+def write_textgrid(path, tiers):
+
+	# writes the tiers as a TextGrid in Praat's long text format
+	xmin = min([tier.xmin for tier in tiers])
+	xmax = max([tier.xmax for tier in tiers])
+	lines = ['File type = "ooTextFile"', 'Object class = "TextGrid"', '', 'xmin = '+praat_number(xmin)+' ', 'xmax = '+praat_number(xmax)+' ', 'tiers? <exists> ', 'size = '+str(len(tiers))+' ', 'item []: ']
+	for t, tier in enumerate(tiers):
+		lines += ['    item ['+str(t+1)+']:', '        class = '+praat_quote(tier.kind)+' ', '        name = '+praat_quote(tier.name)+' ', '        xmin = '+praat_number(tier.xmin)+' ', '        xmax = '+praat_number(tier.xmax)+' ']
+		if tier.kind == 'IntervalTier':
+			lines.append('        intervals: size = '+str(len(tier))+' ')
+			for i in range(len(tier)):
+				lines += ['        intervals ['+str(i+1)+']:', '            xmin = '+praat_number(tier.starts[i])+' ', '            xmax = '+praat_number(tier.ends[i])+' ', '            text = '+praat_quote(tier.labels[i])+' ']
+		else:
+			lines.append('        points: size = '+str(len(tier))+' ')
+			for i in range(len(tier)):
+				lines += ['        points ['+str(i+1)+']:', '            number = '+praat_number(tier.starts[i])+' ', '            mark = '+praat_quote(tier.labels[i])+' ']
+	with open(path, 'w', encoding='utf-8') as f:
+		f.write('\n'.join(lines)+'\n')
+
+def join_textgrids(parts, xmax):
+
+	# one TextGrid from TextGrids laid end to end, like Concatenate: parts are
+	# (offset, duration, tiers), tiers with the same name and class are joined
+	# in the order they first appear, and the time that no part covers (or
+	# that a part without the tier covers) is an empty interval
+	joined = []
+	by_key = {}
+	for offset, duration, tiers in parts:
+		for tier in tiers:
+			key = (tier.name, tier.kind)
+			if not key in by_key:
+				by_key[key] = Tier(tier.name, tier.kind, 0, xmax)
+				joined.append(by_key[key])
+			new_tier = by_key[key]
+			for i in range(len(tier)):
+				start = min(tier.starts[i] - tier.xmin, duration) + offset
+				end = min(tier.ends[i] - tier.xmin, duration) + offset
+				if tier.kind == 'IntervalTier' and end <= start:
+					continue
+				new_tier.starts.append(start)
+				new_tier.ends.append(end)
+				new_tier.labels.append(tier.labels[i])
+
+	for tier in joined:
+		if tier.kind != 'IntervalTier':
+			continue
+		starts, ends, labels = [], [], []
+		t = 0
+		for start, end, label in zip(tier.starts, tier.ends, tier.labels):
+			if start - t > 1e-9:
+				starts.append(t)
+				ends.append(start)
+				labels.append('')
+			starts.append(t if start < t + 1e-9 else start)
+			ends.append(end)
+			labels.append(label)
+			t = end
+		if xmax - t > 1e-9:
+			starts.append(t)
+			ends.append(xmax)
+			labels.append('')
+		elif len(ends) > 0:
+			ends[-1] = xmax
+		tier.starts, tier.ends, tier.labels = starts, ends, labels
+	return joined
+
+# ONE_SCRIPT QUERIES
+
+def praat_procedure(path, name):
+	lines = []
+	inside = False
+	with open(path, encoding='utf-8') as f:
+		for line in f:
+			line = line.strip()
+			if line.startswith('procedure ') and line.split()[1] == name:
+				inside = True
+			elif inside and line == 'endproc':
+				break
+			elif inside:
+				lines.append(line)
+	return lines
+
+PRAAT_TERM = r'(?:"(?:[^"]|"")*"|\w+\$)'
+ASSIGNMENT = re.compile(r'^(\w+)\$ = ('+PRAAT_TERM+r'(?:\s*\+\s*'+PRAAT_TERM+r')*)$')
+REPLACEMENT = re.compile(r'^phonefield\$ = replace\$\s*\(phonefield\$, ('+PRAAT_TERM+'), ('+PRAAT_TERM+r'), 0\)$')
+SUFFIX = re.compile(r'^phonefield\$ = phonefield\$ - ('+PRAAT_TERM+')$')
+
+def praat_terms(expression):
+	return re.findall(PRAAT_TERM, expression)
+
+def praat_value(term, variables):
+	if term.startswith('"'):
+		return term[1:-1].replace('""', '"')
+	return variables.get(term[:-1], '')
+
+def wildcard_steps(lines, custom_steps=[]):
+
+	# turns the statements of handleWildcards and handleCustomWildcards into
+	# steps to apply to a phone field (other statements are ignored)
+	steps = []
+	variables = {}
+	for line in lines:
+		if line.startswith('#'):
+			continue
+		if line in ['@handleCustomWildcards', 'call handleCustomWildcards']:
+			steps += custom_steps
+			continue
+		m = REPLACEMENT.match(line)
+		if m:
+			steps.append(('replace', praat_value(m.group(1), variables), praat_value(m.group(2), variables)))
+			continue
+		m = SUFFIX.match(line)
+		if m:
+			steps.append(('suffix', praat_value(m.group(1), variables)))
+			continue
+		m = ASSIGNMENT.match(line)
+		if m and m.group(1) == 'phonefield':
+			steps.append(('concat', praat_terms(m.group(2))))
+		elif m:
+			variables[m.group(1)] = ''.join([praat_value(term, variables) for term in praat_terms(m.group(2))])
+	return steps
+
+wildcards = {}
+
+def load_wildcards(script_directory=None):
+	if script_directory == None:
+		script_directory = os.path.dirname(os.path.abspath(__file__))
+	if not script_directory in wildcards:
+		custom_steps = wildcard_steps(praat_procedure(os.path.join(script_directory, 'one_script_procedures.praat'), 'handleCustomWildcards'))
+		wildcards[script_directory] = wildcard_steps(praat_procedure(os.path.join(script_directory, 'one_script.praat'), 'handleWildcards'), custom_steps)
+	return wildcards[script_directory]
+
+def handle_wildcards(phonefield, steps):
+	for step in steps:
+		if step[0] == 'replace':
+			phonefield = phonefield.replace(step[1], step[2])
+		elif step[0] == 'suffix':
+			if phonefield.endswith(step[1]):
+				phonefield = phonefield[:-len(step[1])]
+		else:
+			phonefield = ''.join([phonefield if term == 'phonefield$' else praat_value(term, {}) for term in step[1]])
+	if phonefield.startswith(' '):
+		phonefield = phonefield[1:]
+	return phonefield
+
+def parse_string(string_to_parse):
+	# the parseString procedure, including its empty string at the end
+	remaining = string_to_parse+' '
+	strings = []
+	while ' ' in remaining and len(remaining) > 1:
+		space = remaining.index(' ')
+		strings.append(remaining[:space])
+		remaining = remaining[space+1:]
+	if '  ' in string_to_parse+' ':
+		strings.append('')
+	return strings
+
+def function_words(script_directory=None):
+	if script_directory == None:
+		script_directory = os.path.dirname(os.path.abspath(__file__))
+	variables = {}
+	for line in praat_procedure(os.path.join(script_directory, 'one_script.praat'), 'functionwords'):
+		m = ASSIGNMENT.match(line)
+		if m:
+			variables[m.group(1)] = ''.join([praat_value(term, variables) for term in praat_terms(m.group(2))])
+	return variables.get('functionwords', '').replace('  ', ' ')
+
+class Query:
+
+	def __init__(self, phon_string, options='', exclude='', script_directory=None):
+		self.phon_string = phon_string
+		self.options = options
+		self.exclude = exclude
+
+		self.consider_word_boundaries = not 'w' in options
+		self.min_duration = 0.05 if 'd' in options else 0
+		self.vl = 'l' in options
+		self.lv = 'r' in options
+		self.one_match_per_word_token = 'o' in options
+		self.selected_words_only = 'W' in options
+
+		self.excluded_words = function_words(script_directory) if 'f' in options else ''
+		self.included_words = ''
+		if self.selected_words_only:
+			words = exclude.replace(';', ' ').replace(',', ' ').replace('  ', ' ')
+			self.included_words = (' '+words+' ').replace('  ', ' ')
+		elif exclude != '':
+			# as in one_script, only the double spaces are taken out
+			self.excluded_words = (self.excluded_words+' '+exclude.replace('  ', ' ')+' ').replace('  ', ' ')
+
+		parts = phon_string.split('/')
+		if len(parts) == 1:
+			fields = ['', '', parts[0], '', '']
+		elif len(parts) == 3:
+			fields = [''] + parts + ['']
+		else:
+			fields = (parts + ['']*5)[:5]
+
+		# each context is a set of labels, or None if anything matches
+		steps = load_wildcards(script_directory)
+		self.preceding1, self.preceding0, self.targets, self.following0, self.following1 = [self.labels(handle_wildcards(field, steps)) for field in fields]
+
+	def labels(self, phonefield):
+		strings = parse_string(phonefield)
+		if strings == [] or strings[0] == '':
+			return None
+		return set(strings)
+
+	def exclude_word(self, word):
+		testword = ' '+word+' '
+		if self.selected_words_only:
+			return not testword in self.included_words
+		if testword in SILENCES:
+			return True
+		return self.excluded_words != '' and testword in self.excluded_words
+
+# THE CORPUS INDEX
+
+def index_path(file_list):
+	return os.path.splitext(file_list)[0] + INDEX_EXTENSION
+
+def read_file_list(file_list):
+	# accepts one_script's file_list.csv:first_row:last_row form
+	starting_row, ending_row = 1, 0
+	parts = file_list.split(':')
+	if len(parts) > 1 and parts[1].isdigit():
+		file_list = parts[0]
+		starting_row = int(parts[1])
+		if len(parts) > 2:
+			ending_row = int(parts[2])
+	with open(file_list, newline='', encoding='utf-8-sig') as f:
+		rows = list(csv.DictReader(f))
+	if ending_row == 0 or ending_row > len(rows):
+		ending_row = len(rows)
+	return rows[max(starting_row, 1)-1:ending_row]
+
+def file_name(path, extensions):
+	name = path.split('/')[-1]
+	for extension in extensions:
+		if name.endswith(extension):
+			name = name[:-len(extension)]
+	return name.replace('.', '_').replace("'", '_').replace(' ', '_')
+
+class TextGridIndex:
+
+	def __init__(self, path=None):
+		self.path = path
+		self.documents = {}
+		if path != None and os.path.exists(path):
+			self.load(path)
+
+	def load(self, path):
+		with open(path, 'rb') as f:
+			saved = pickle.load(f)
+		if saved.get('version') == INDEX_VERSION:
+			self.documents = saved['documents']
+
+	def save(self, path=None):
+		if path == None:
+			path = self.path
+		temp_path = path + '.' + str(os.getpid())
+		with open(temp_path, 'wb') as f:
+			pickle.dump({'version': INDEX_VERSION, 'documents': self.documents}, f, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(temp_path, path)
+
+	def update(self, tg_paths):
+		# (re)parses the TextGrids that are new or have changed, and returns how many
+		updated = 0
+		for tg_path in tg_paths:
+			key = os.path.abspath(tg_path)
+			stat = os.stat(key)
+			document = self.documents.get(key)
+			if document != None and document['size'] == stat.st_size and document['mtime'] == stat.st_mtime_ns:
+				continue
+			tiers = read_textgrid(key)
+			for tier in tiers:
+				if tier.kind == 'IntervalTier':
+					tier.make_postings()
+			self.documents[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'tiers': tiers}
+			updated += 1
+		return updated
+
+	def tiers(self, tg_path):
+		return self.documents[os.path.abspath(tg_path)]['tiers']
+
+	def matches(self, query, rows):
+
+		# yields a dictionary (MATCH_HEADER and EXTRA_HEADER) for every token
+		# one_script would measure, in the same order
+		self.lastword_id = 'XXXXXXXXXX'
+		self.word_tier = 0
+		for row in rows:
+			for match in self.textgrid_matches(query, row):
+				yield match
+
+	def textgrid_matches(self, query, row):
+
+		tiers = self.tiers(row['textgrid'])
+		textgrid_name = file_name(row['textgrid'], ['.TextGrid', '.textgrid', '.Textgrid'])
+		sound_name = file_name(row['wav'], ['.wav'])
+		speaker = row['speaker'] if 'speaker' in row else textgrid_name
+		all_word_tiers = [i+1 for i, tier in enumerate(tiers) if 'word' in tier.name or 'Word' in tier.name]
+		tier_names = [tier.name for tier in tiers] + ['', '']
+
+		# FIND THE PHONE AND WORD TIERS
+		phone_tier = int(float(row['tier'])) if row.get('tier', '') != '' else 0
+		if phone_tier == 0:
+			for i, name in enumerate(tier_names[:len(tiers)]):
+				if name in [speaker+' - phones', speaker+' - phone']:
+					phone_tier = i+1
+				elif name in [speaker+' - words', speaker+' - word']:
+					self.word_tier = i+1
+		elif 'ord' in tier_names[0] and 'hone' in tier_names[1]:
+			self.word_tier = phone_tier - 1
+		else:
+			self.word_tier = phone_tier + 1
+		if phone_tier == 0:
+			self.word_tier = 1
+			phone_tier = 2
+		word_tier = self.word_tier
+
+		phones = tiers[phone_tier-1]
+		words = tiers[word_tier-1]
+		if query.vl or query.lv:
+			phones = phones.copy()
+			if query.vl:
+				remove_vl_boundaries(phones, words)
+			if query.lv:
+				remove_lv_boundaries(phones, words)
+			candidates = range(1, len(phones)+1)
+			if query.targets != None:
+				candidates = [p for p in candidates if phones.label(p) in query.targets]
+		else:
+			candidates = candidate_intervals(phones, query)
+
+		for p in candidates:
+			match = transport(query, phones, words, p)
+			if match == None:
+				continue
+			word_id = textgrid_name+'_'+str(phone_tier)+'_'+match['word']+'_'+'%.3f' % match['word_start']
+			token_id = textgrid_name+'_'+str(phone_tier)+'_'+match['word']+'_'+match['phone']+'_'+'%.3f' % match['phone_start']
+			if query.one_match_per_word_token and self.lastword_id == word_id:
+				continue
+			self.lastword_id = word_id
+
+			overlapping_speech = []
+			for i in all_word_tiers:
+				if i != word_tier:
+					for j in tiers[i-1].intervals_between(match['phone_start'], match['phone_end']):
+						if tiers[i-1].label(j) != 'sp':
+							overlapping_speech.append(tiers[i-1].label(j))
+
+			yield {'speaker': speaker, 'textgrid': textgrid_name, 'sound': sound_name, 'phonetier': str(phone_tier), 'word_id': word_id, 'token_id': token_id,
+				'leftword': match['lastword'], 'word': match['word'], 'rightword': match['nextword'], 'phone': match['phone'],
+				'phonestart': '%.3f' % match['phone_start'], 'phoneend': '%.3f' % match['phone_end'],
+				'left2': match['lastphone2'], 'left1': match['lastphone1'], 'left': match['lastphone'],
+				'right': match['nextphone'], 'right1': match['nextphone1'], 'right2': match['nextphone2'],
+				'speech_overlap': ' '.join(overlapping_speech),
+				'wav_file': row['wav'], 'tg_file': row['textgrid'], 'wordtier': str(word_tier), 'phone_interval': str(p), 'word_interval': str(match['w']),
+				'phone_start': praat_number(match['phone_start']), 'phone_end': praat_number(match['phone_end']),
+				'duration': praat_number(match['phone_end'] - match['phone_start']), 'word_start': praat_number(match['word_start']), 'word_end': praat_number(match['word_end']),
+				'lastphone_start': praat_number(match['lastphone_start']), 'nextphone_end': praat_number(match['nextphone_end']),
+				'lastword_start': praat_number(match['lastword_start']), 'nextword_end': praat_number(match['nextword_end'])}
+
+def candidate_intervals(phones, query):
+
+	# the phone intervals that could match: every interval with a target label,
+	# narrowed down with the trigram postings when both neighbouring phones
+	# have to have particular labels (a word boundary or a missing phone can't
+	# be looked up that way)
+	if query.targets == None:
+		return range(1, len(phones)+1)
+	plain_contexts = all([c != None and not BOUNDARY in c and not UNDEFINED in c for c in [query.preceding0, query.following0]])
+	if plain_contexts and len(query.preceding0)*len(query.targets)*len(query.following0) <= len(phones.trigrams):
+		postings = phones.trigrams
+		keys = itertools.product(query.preceding0, query.targets, query.following0)
+	else:
+		postings = phones.unigrams
+		keys = query.targets
+	candidates = set()
+	for key in keys:
+		candidates.update(postings.get(key, []))
+	return sorted(candidates)
+
+def remove_vl_boundaries(phones, words):
+	# the removeVLboundaries procedure
+	p = 1
+	while p < len(phones):
+		w = words.interval_at((phones.start(p)+phones.end(p))/2)
+		if any([digit in phones.label(p) for digit in '012']) and phones.label(p+1) in LIQUIDS:
+			if w > 0 and phones.end(p+1) <= words.end(w):
+				phones.remove_boundary(p)
+		p += 1
+
+def remove_lv_boundaries(phones, words):
+	# the removeLVboundaries procedure
+	p = 2
+	while p < len(phones):
+		w = words.interval_at((phones.start(p)+phones.end(p))/2)
+		if any([digit in phones.label(p) for digit in '012']) and phones.label(p-1) in LIQUIDS:
+			if w > 0 and phones.start(p-1) >= words.start(w):
+				phones.remove_boundary(p-1)
+		p += 1
+
+def transport(query, phones, words, p):
+
+	# one pass of the phone loop in the transport procedure: returns the
+	# token information if phone interval p matches the query, or None
+	final_p = len(phones)
+	phone_start = phones.start(p)
+	phone_end = phones.end(p)
+	phone_mid = (phone_start+phone_end)/2
+	if phone_mid > words.end(len(words)):
+		return None
+	w = words.interval_at(phone_mid)
+	if w == 0:
+		return None
+
+	phone = phones.label(p)
+	word = words.label(w).replace(',', '')
+	word_start = words.start(w)
+	word_end = words.end(w)
+	if word_end - word_start <= 0.001:
+		startphone = phones.interval_at((word_start+word_end)/2)
+		endphone = startphone
+	else:
+		startphone = phones.interval_at(word_start+0.001)
+		endphone = phones.interval_at(word_end-0.001)
+
+	if query.targets != None and not phone in query.targets:
+		return None
+
+	label = phones.label
+	if query.consider_word_boundaries:
+		if p == 1:
+			last = [BOUNDARY, UNDEFINED, UNDEFINED]
+		elif p == 2:
+			if p == startphone:
+				last = [BOUNDARY, label(p-1), UNDEFINED]
+			elif p == startphone + 1:
+				last = [label(p-1), BOUNDARY, UNDEFINED]
+			else:
+				last = [label(p-1), UNDEFINED, UNDEFINED]
+		elif p == startphone:
+			last = [BOUNDARY, label(p-1), label(p-2)]
+		elif p == startphone + 1:
+			last = [label(p-1), BOUNDARY, label(p-2)]
+		elif p == startphone + 2:
+			last = [label(p-1), label(p-2), BOUNDARY]
+		else:
+			last = [label(p-1), label(p-2), label(p-3)]
+
+		if p == final_p:
+			following = [BOUNDARY, UNDEFINED, UNDEFINED]
+		elif p == final_p - 1:
+			if p == endphone:
+				following = [BOUNDARY, label(p+1), UNDEFINED]
+			elif p == endphone - 1:
+				following = [label(p+1), BOUNDARY, UNDEFINED]
+			else:
+				following = [label(p+1), UNDEFINED, UNDEFINED]
+		elif p == endphone:
+			following = [BOUNDARY, label(p+1), label(p+2)]
+		elif p == endphone - 1:
+			following = [label(p+1), BOUNDARY, label(p+2)]
+		elif p == endphone - 2:
+			following = [label(p+1), label(p+2), BOUNDARY]
+		else:
+			following = [label(p+1), label(p+2), label(p+3)]
+	else:
+		if p == 1:
+			last = [UNDEFINED, UNDEFINED, UNDEFINED]
+		elif p == 2:
+			last = [label(p-1), UNDEFINED, UNDEFINED]
+		elif p == 3:
+			# (sic) as in one_script
+			last = [label(p-1), label(p-2), '--undefined']
+		else:
+			last = [label(p-1), label(p-2), label(p-3)]
+
+		if p == final_p:
+			following = [UNDEFINED, UNDEFINED, UNDEFINED]
+		elif p == final_p - 1:
+			following = [label(p+1), UNDEFINED, UNDEFINED]
+		elif p == final_p - 2:
+			following = [label(p+1), label(p+2), UNDEFINED]
+		else:
+			following = [label(p+1), label(p+2), label(p+3)]
+
+	for labels, value in [(query.preceding0, last[0]), (query.preceding1, last[1]), (query.following0, following[0]), (query.following1, following[1])]:
+		if labels != None and not value in labels:
+			return None
+
+	if query.exclude_word(word) or phone_end - phone_start < query.min_duration:
+		return None
+
+	return {'phone': phone, 'word': word, 'w': w, 'phone_start': phone_start, 'phone_end': phone_end,
+		'word_start': word_start, 'word_end': word_end,
+		'lastphone': last[0], 'lastphone1': last[1], 'lastphone2': last[2],
+		'nextphone': following[0], 'nextphone1': following[1], 'nextphone2': following[2],
+		'lastphone_start': phone_start if last[0] in [BOUNDARY, UNDEFINED] else phones.start(p-1),
+		'nextphone_end': phone_end if following[0] in [BOUNDARY, UNDEFINED] else phones.end(p+1),
+		'lastword': words.label(w-1).replace(',', '') if w > 1 else '',
+		'lastword_start': words.start(w-1) if w > 1 else None,
+		'nextword': words.label(w+1).replace(',', '') if w < len(words) else '',
+		'nextword_end': words.end(w+1) if w < len(words) else None}
@@ -0,0 +1,172 @@
+import math, mmap, os, struct
+import numpy as np
+
+# a WavFile memory-maps a wav file, so a clip is a slice of the file that can
+# be written to a new wav file without decoding or copying the samples.
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class WavFile:
+
+	def __init__(self, wav_path):
+		self.path = wav_path
+		with open(wav_path, 'rb') as f:
+			self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		self.view = memoryview(self.buffer)
+		if self.buffer[0:4] != b'RIFF' or self.buffer[8:12] != b'WAVE':
+			raise ValueError(wav_path+' is not a wav file')
+
+		self.fmt_chunk = None
+		self.data_offset = None
+		offset = 12
+		while offset + 8 <= len(self.buffer):
+			chunk_id = self.buffer[offset:offset+4]
+			chunk_size = struct.unpack_from('<I', self.buffer, offset+4)[0]
+			if chunk_id == b'fmt ':
+				self.fmt_chunk = bytes(self.buffer[offset:offset+8+chunk_size])
+			elif chunk_id == b'data':
+				self.data_offset = offset + 8
+				# some recorders leave the size at 0 or too big if they were interrupted
+				self.data_size = min(chunk_size, len(self.buffer) - self.data_offset)
+				if chunk_size == 0:
+					self.data_size = len(self.buffer) - self.data_offset
+				break
+			offset += 8 + chunk_size + chunk_size % 2
+		if self.fmt_chunk == None or self.data_offset == None:
+			raise ValueError(wav_path+' has no fmt or data chunk')
+
+		self.format, self.channels, self.rate, byte_rate, self.block_align, self.bits = struct.unpack_from('<HHIIHH', self.fmt_chunk, 8)
+		if self.format == WAVE_FORMAT_EXTENSIBLE:
+			self.format = struct.unpack_from('<H', self.fmt_chunk, 32)[0]
+		self.n_samples = self.data_size // self.block_align
+		self.duration = self.n_samples / self.rate
+
+	def close(self):
+		self.view.release()
+		self.buffer.close()
+
+	def sample_range(self, start, end):
+		# the samples Praat's Extract part keeps: the ones whose centres
+		# (at (i + 0.5) / rate) are between start and end
+		first = math.ceil(start * self.rate - 0.5)
+		last = math.floor(end * self.rate - 0.5)
+		return (first, last + 1)
+
+	def part(self, start, end):
+		# a list of buffers with the samples from start to end (zero samples
+		# outside the file, as in Praat), which are views of the file otherwise
+		first, stop = self.sample_range(start, end)
+		parts = []
+		if first < 0:
+			parts.append(bytes(self.block_align * min(-first, stop - first)))
+		inside = (max(first, 0), min(stop, self.n_samples))
+		if inside[1] > inside[0]:
+			parts.append(self.view[self.data_offset + inside[0]*self.block_align : self.data_offset + inside[1]*self.block_align])
+		if stop > self.n_samples:
+			parts.append(bytes(self.block_align * (stop - max(first, self.n_samples))))
+		return parts
+
+	def samples(self, parts):
+		# the samples of a part as floats between -1 and 1 (samples x channels)
+		data = b''.join([bytes(p) for p in parts])
+		if self.format == WAVE_FORMAT_IEEE_FLOAT:
+			x = np.frombuffer(data, dtype='<f%d' % (self.bits // 8)).astype(float)
+		elif self.bits == 8:
+			x = (np.frombuffer(data, dtype=np.uint8).astype(float) - 128) / 128
+		elif self.bits == 24:
+			b = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+			x = ((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8) / 8388608
+		else:
+			x = np.frombuffer(data, dtype='<i%d' % (self.bits // 8)).astype(float) / 2**(self.bits-1)
+		return x.reshape(-1, self.channels)
+
+	def array(self):
+		# all of the samples (samples x channels) and what to divide them by
+		# to get floats between -1 and 1. 16 and 32-bit and float samples are
+		# a view of the file, so only the samples that are used get read (and
+		# the array has to be gone before close())
+		data = self.view[self.data_offset : self.data_offset + self.n_samples*self.block_align]
+		if self.format == WAVE_FORMAT_IEEE_FLOAT:
+			return (np.frombuffer(data, dtype='<f%d' % (self.bits // 8)).reshape(-1, self.channels), 1.0)
+		if self.bits in [16, 32]:
+			return (np.frombuffer(data, dtype='<i%d' % (self.bits // 8)).reshape(-1, self.channels), float(2**(self.bits-1)))
+		return (self.samples([data]), 1.0)
+
+def wav_header(fmt_chunk, data_size):
+	# the RIFF size counts the pad byte after an odd-sized data chunk, and
+	# the sizes are 32-bit, so a wav file can't have 4 GB of samples
+	riff_size = 4 + len(fmt_chunk) + 8 + data_size + (data_size & 1)
+	if riff_size >= 2**32:
+		raise ValueError('a wav file can only have up to 4 GB of samples, not '+str(data_size)+' bytes')
+	return b'RIFF' + struct.pack('<I', riff_size) + b'WAVE' + fmt_chunk + b'data' + struct.pack('<I', data_size)
+
+class WavWriter:
+
+	# writes a wav file a buffer at a time, so whatever the samples come from
+	# can be closed as soon as they are written, and fills in the sizes in
+	# the header when it is closed
+	def __init__(self, path, fmt_chunk):
+		self.path = path
+		self.fmt_chunk = fmt_chunk
+		self.data_size = 0
+		self.file = open(path, 'wb')
+		self.file.write(wav_header(fmt_chunk, 0))
+
+	def fits(self, size):
+		# whether size more bytes of samples still fit in the 32-bit sizes of the header
+		return 4 + len(self.fmt_chunk) + 8 + self.data_size + size + 1 < 2**32
+
+	def write(self, data):
+		if not self.fits(len(data)):
+			raise ValueError(self.path+' would have more than 4 GB of samples')
+		self.file.write(data)
+		self.data_size += len(data)
+
+	def close(self):
+		if self.data_size % 2 == 1:
+			self.file.write(b'\x00')
+		self.file.seek(0)
+		self.file.write(wav_header(self.fmt_chunk, self.data_size))
+		self.file.close()
+
+def pcm16_fmt_chunk(channels, rate):
+	return b'fmt ' + struct.pack('<IHHIIHH', 16, WAVE_FORMAT_PCM, channels, rate, rate*channels*2, channels*2, 16)
+
+def write_parts(path, fmt_chunk, parts):
+	# one write for the header and all of the sample buffers
+	data_size = sum([len(p) for p in parts])
+	buffers = [wav_header(fmt_chunk, data_size)] + parts
+	if data_size % 2 == 1:
+		buffers.append(b'\x00')
+	fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+	try:
+		if hasattr(os, 'writev'):
+			# writev takes at most IOV_MAX buffers (1024 on Linux) at a time
+			for first in range(0, len(buffers), 1024):
+				batch = buffers[first:first+1024]
+				written = os.writev(fd, batch)
+				if written < sum([len(b) for b in batch]):
+					os.write(fd, b''.join([bytes(b) for b in batch])[written:])
+		else:
+			for b in buffers:
+				os.write(fd, b)
+	finally:
+		os.close(fd)
+
+def write_clip(path, wav, start, end, scale_peak=False):
+
+	# writes the samples from start to end, in the same format as the source
+	# file, or (like Scale peak: 0.99 before Write to WAV file) as 16-bit
+	# samples scaled to a peak of 0.99
+	parts = wav.part(start, end)
+	if not scale_peak:
+		write_parts(path, wav.fmt_chunk, parts)
+		return
+	x = wav.samples(parts)
+	peak = np.abs(x).max() if x.size > 0 else 0
+	if peak > 0:
+		x = x * (0.99 / peak)
+	pcm = np.clip(np.round(x * 32768), -32768, 32767).astype('<i2')
+	write_parts(path, pcm16_fmt_chunk(wav.channels, wav.rate), [pcm.tobytes()])
@@ -0,0 +1,64 @@
+import argparse, csv, os, time
+import numpy as np
+import long_format as LF
+
+#PARSE ARGUMENTS
+parser = argparse.ArgumentParser(description='Convert wide one_script output to a compressed long-format dataset (token x candidate x formant x measurement point) a chunk at a time, or write some of the columns and phones of a dataset to a csv file')
+parser.add_argument('--input', default='[none listed]', help='one_script output to convert, or a dataset made by this script to read from')
+parser.add_argument('--output', default='', help='what to call the dataset directory (or the csv file when reading a dataset)')
+parser.add_argument('--chunk_rows', default=5000, help='about how many rows of the wide file to hold in memory at a time')
+parser.add_argument('--level', default=6, help='the zlib compression level (1 is fastest, 9 is smallest)')
+parser.add_argument('--columns', default='[none listed]', help='reading: comma-separated columns to write (default: all of them)')
+parser.add_argument('--phones', default='[none listed]', help='reading: comma-separated phones to write (default: all of them)')
+parser.add_argument('--table', default='measurements', help='reading: measurements (one row per measurement) or tokens (one row per token and candidate)')
+args = parser.parse_args()
+
+#EXAMPLE
+# python /phon/scripts/wide_to_long.py --input one_script_out_2024Jul27_12h34m56.csv
+# python /phon/scripts/wide_to_long.py --input one_script_out_2024Jul27_12h34m56_long --columns speaker,token_id,candidate,parameter,formant,x,t,value --phones AA1,AE1
+# (the second one writes one_script_out_2024Jul27_12h34m56_long.csv, for read.csv(..., na.strings='--undefined--').
+# x and t are the same as long_format_formants makes for one token.)
+
+start_time = time.time()
+print('\n########################################')
+
+if not os.path.isdir(args.input):
+	if args.output == '':
+		output_path = args.input.replace('.csv', '')+'_long'
+	else:
+		output_path = args.output
+	n_tokens = LF.convert(args.input, output_path, int(args.chunk_rows), int(args.level))
+	size = os.path.getsize(os.path.join(output_path, 'data.bin'))
+	print('wrote', n_tokens, 'tokens from', args.input, 'to', output_path, '('+str(round(size/2**20, 1)), 'MB, compared to', str(round(os.path.getsize(args.input)/2**20, 1)), 'MB)')
+
+else:
+	dataset = LF.LongDataset(args.input)
+	if args.output == '':
+		output_filename = os.path.normpath(args.input)+'.csv'
+	else:
+		output_filename = args.output
+	columns = None if args.columns == '[none listed]' else args.columns.split(',')
+	phones = None if args.phones == '[none listed]' else args.phones.split(',')
+	try:
+		data = dataset.read(columns, phones, args.table)
+	except ValueError as e:
+		parser.error(str(e))
+	columns = list(data.keys())
+	with open(output_filename, 'w', newline='') as out:
+		writer = csv.writer(out, lineterminator='\n')
+		writer.writerow(columns)
+		n_rows = len(data[columns[0]]) if columns != [] else 0
+		# write a block of rows at a time, so the text of the whole table is never in memory
+		for first in range(0, n_rows, 100000):
+			text = []
+			for name in columns:
+				values = data[name][first:first+100000]
+				if values.dtype.kind == 'f':
+					text.append([LF.format_value(v) for v in values])
+				else:
+					text.append([str(v) for v in values])
+			writer.writerows(zip(*text))
+	print('wrote', n_rows, 'rows of', args.input, 'to', output_filename)
+
+print('in', round(time.time()-start_time, 2), 'seconds')
+print('########################################\n')